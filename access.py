@@ -0,0 +1,77 @@
+"""Access decisions, independent of any UI.
+
+Both the desktop app (AccessFrame) and the headless daemon call
+check_code() with what was typed or scanned; callers only decide how to
+show or signal the outcome.
+"""
+from datetime import date, datetime
+
+from access_log import (OUTCOME_GRANTED, OUTCOME_FROZEN, OUTCOME_EXPIRED, OUTCOME_NOT_FOUND,
+                        OUTCOME_OUT_OF_HOURS, OUTCOME_NO_VISITS, OUTCOME_REVOKED)
+from plans import minute_of_week
+
+
+def decide(info, today=None, plan=None, minute=None, visits_used=0):
+    """Returns the outcome for get_access_info() output (None for an unknown ID).
+
+    today is a proleptic ordinal. The expiry date is exclusive: the
+    membership runs out at the start of that day. plan is the member's
+    CompiledPlan (None: no restrictions), minute the minute of the week
+    (plans.minute_of_week) and visits_used the entries granted in the
+    current period, which only plans with a visit quota look at.
+    """
+    if info is None:
+        return OUTCOME_NOT_FOUND
+    end_ord, is_frozen = info[1], info[2]
+    if is_frozen:
+        return OUTCOME_FROZEN
+    if plan is None:
+        return OUTCOME_GRANTED if end_ord > (today or date.today().toordinal()) else OUTCOME_EXPIRED
+    if end_ord + plan.grace_days <= (today or date.today().toordinal()):
+        return OUTCOME_EXPIRED
+    if plan.minutes is not None and not plan.minutes[minute_of_week(datetime.now()) if minute is None else minute]:
+        return OUTCOME_OUT_OF_HOURS
+    if plan.visits is not None and visits_used >= plan.visits:
+        return OUTCOME_NO_VISITS
+    return OUTCOME_GRANTED
+
+
+def check(db, user_id, today=None, now=None):
+    """Looks user_id up in the access cache and returns (outcome, info).
+
+    The member's plan comes precompiled from db.access_plans(); visits are
+    only counted for plans with a quota, and a granted one is counted right
+    away (db.count_visit).
+    """
+    info = db.get_access_info(user_id)
+    if now is not None and today is None:
+        today = now.toordinal()
+    if info is None or info[3] is None:
+        return decide(info, today), info
+    now = now or datetime.now()
+    plan = db.access_plans().get(info[3])
+    if plan is None or plan.visits is None:
+        return decide(info, today or now.toordinal(), plan, minute_of_week(now)), info
+    since_ord = plan.period_start(info[1])
+    outcome = decide(info, today or now.toordinal(), plan, minute_of_week(now), db.visits_used(user_id, since_ord))
+    if outcome == OUTCOME_GRANTED:
+        db.count_visit(user_id, since_ord)
+    return outcome, info
+
+
+def check_code(db, code, today=None, now=None):
+    """Decides on a typed or scanned code and returns (user_id, outcome, info).
+
+    A card UID (db.resolve_credential) stands for its member; any other code
+    is taken as the member's ID, as typed at the desk. A revoked card is
+    denied whatever the member's status; info still names its member.
+    """
+    code = code.strip()
+    card = db.resolve_credential(code)
+    if card is None:
+        return (code,) + check(db, code, today, now)
+    user_id, is_revoked = card
+    if is_revoked:
+        info = db.get_access_info(user_id)
+        return user_id, OUTCOME_REVOKED if info else OUTCOME_NOT_FOUND, info
+    return (user_id,) + check(db, user_id, today, now)
@@ -0,0 +1,104 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from logging_setup import log_access_event
+
+# Outcomes stored in access_events.outcome
+OUTCOME_GRANTED = "granted"
+OUTCOME_FROZEN = "frozen"
+OUTCOME_EXPIRED = "expired"
+OUTCOME_NOT_FOUND = "not_found"
+OUTCOME_OUT_OF_HOURS = "out_of_hours"  # the member's plan does not allow this day or time
+OUTCOME_NO_VISITS = "no_visits"  # the plan's visits for this period are used up
+OUTCOME_REVOKED = "revoked"  # a card that was reported lost or returned
+
+SOURCE_KEYBOARD = "keyboard"
+
+
+class AccessEventWriter:
+    """Records access events on a background thread using group commits.
+
+    record() only puts a tuple on a queue, so the access decision never waits
+    for the disk. The writer thread collects events for up to flush_interval
+    seconds (or batch_size events) and inserts them in a single transaction.
+    """
+
+    def __init__(self, db, batch_size=500, flush_interval=0.2, max_pending=100000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.queue = queue.SimpleQueue()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="access-event-writer", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        """Flushes pending events and stops the writer thread."""
+        if not self.running:
+            return
+        self.running = False
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def record(self, member_id, outcome, source, terminal=None, ts=None, latency_ms=None):
+        if ts is None:
+            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.queue.put((member_id, ts, outcome, source, terminal, latency_ms))
+
+    def _run(self):
+        pending = []
+        stopping = False
+        while not stopping or pending:
+            if not stopping:
+                collected = len(pending)
+                stopping = self._collect(pending)
+                # JSON-lines access log (if enabled), written from this thread rather than the scan path
+                for event in pending[collected:]:
+                    log_access_event(*event)
+            if not pending:
+                continue
+            try:
+                self.db.add_access_events(pending)
+                pending = []
+            except (sqlite3.Error, ConnectionError) as e:
+                # Keep the batch and retry (database is locked, server unreachable), but never grow without bound
+                logging.error(f"Failed to write {len(pending)} access events: {e}")
+                if len(pending) > self.max_pending:
+                    del pending[:len(pending) - self.max_pending]
+                if stopping:
+                    break
+                time.sleep(self.flush_interval)
+        self.db.close_thread_connection()
+
+    def _collect(self, pending):
+        # Blocks for the first event, then gathers more until the batch window closes.
+        # Returns True once the stop sentinel has been seen.
+        try:
+            item = self.queue.get(timeout=1)
+        except queue.Empty:
+            return False
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is None:
+                return True
+            pending.append(item)
+            if len(pending) >= self.batch_size:
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                return False
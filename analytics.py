@@ -0,0 +1,177 @@
+"""Attendance analytics backed by rollup tables.
+
+The rollups (attendance_hourly, attendance_daily, attendance_member_daily)
+are updated in the same transaction that stores each batch of access
+events, so reports never scan access_events. Use
+
+    python analytics.py rebuild [--db gym.db]
+
+to recompute them from the raw events after a backfill.
+"""
+import argparse
+import logging
+from collections import Counter
+from datetime import date, timedelta
+
+from access_log import OUTCOME_GRANTED
+
+ROLLUP_TABLES = ("attendance_hourly", "attendance_daily", "attendance_member_daily")
+
+
+def create_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_hourly (
+            day TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            granted INTEGER NOT NULL DEFAULT 0,
+            denied INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, hour)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_daily (
+            day TEXT PRIMARY KEY,
+            granted INTEGER NOT NULL DEFAULT 0,
+            denied INTEGER NOT NULL DEFAULT 0,
+            unique_members INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_member_daily (
+            day TEXT NOT NULL,
+            member_id TEXT NOT NULL,
+            visits INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, member_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+def apply_events(conn, events):
+    """Folds a batch of (member_id, ts, outcome, source, terminal, latency_ms) events into the rollups.
+
+    Must run inside the caller's transaction. Only granted scans count as visits.
+    """
+    hourly = Counter()
+    member_daily = Counter()
+    for member_id, ts, outcome, *_ in events:
+        granted = outcome == OUTCOME_GRANTED
+        hourly[(ts[:10], int(ts[11:13]), granted)] += 1
+        if granted:
+            member_daily[(ts[:10], member_id)] += 1
+
+    conn.executemany('''
+        INSERT INTO attendance_hourly (day, hour, granted, denied) VALUES (?, ?, ?, ?)
+        ON CONFLICT (day, hour) DO UPDATE SET granted = granted + excluded.granted, denied = denied + excluded.denied
+    ''', [(day, hour, n if granted else 0, 0 if granted else n) for (day, hour, granted), n in hourly.items()])
+    conn.executemany('''
+        INSERT INTO attendance_member_daily (day, member_id, visits) VALUES (?, ?, ?)
+        ON CONFLICT (day, member_id) DO UPDATE SET visits = visits + excluded.visits
+    ''', [(day, member_id, n) for (day, member_id), n in member_daily.items()])
+
+    daily = Counter()
+    for (day, _, granted), n in hourly.items():
+        daily[(day, granted)] += n
+    days = {day for day, _ in daily}
+    conn.executemany('''
+        INSERT INTO attendance_daily (day, granted, denied, unique_members)
+        VALUES (?1, ?2, ?3, (SELECT COUNT(*) FROM attendance_member_daily WHERE day = ?1))
+        ON CONFLICT (day) DO UPDATE SET granted = granted + excluded.granted, denied = denied + excluded.denied,
+                                        unique_members = excluded.unique_members
+    ''', [(day, daily[(day, True)], daily[(day, False)]) for day in days])
+
+
+def rebuild(db):
+    """Recomputes every rollup from access_events (set-based, one transaction)."""
+    with db.transaction() as conn:
+        for table in ROLLUP_TABLES:
+            conn.execute(f'DELETE FROM {table}')
+        conn.execute(f'''
+            INSERT INTO attendance_hourly (day, hour, granted, denied)
+            SELECT substr(ts, 1, 10), CAST(substr(ts, 12, 2) AS INTEGER),
+                   SUM(outcome = '{OUTCOME_GRANTED}'), SUM(outcome != '{OUTCOME_GRANTED}')
+            FROM access_events GROUP BY 1, 2
+        ''')
+        conn.execute(f'''
+            INSERT INTO attendance_member_daily (day, member_id, visits)
+            SELECT substr(ts, 1, 10), member_id, COUNT(*)
+            FROM access_events WHERE outcome = '{OUTCOME_GRANTED}' GROUP BY 1, 2
+        ''')
+        conn.execute('''
+            INSERT INTO attendance_daily (day, granted, denied, unique_members)
+            SELECT h.day, SUM(h.granted), SUM(h.denied),
+                   (SELECT COUNT(*) FROM attendance_member_daily m WHERE m.day = h.day)
+            FROM attendance_hourly h GROUP BY h.day
+        ''')
+    days = db.execute('SELECT COUNT(*) FROM attendance_daily').fetchone()[0]
+    logging.info(f"Attendance rollups rebuilt ({days} days)")
+    return days
+
+
+def _window(days, today=None):
+    today = today or date.today()
+    return (today - timedelta(days=days - 1)).isoformat(), (today + timedelta(days=1)).isoformat()
+
+
+def daily_visits(db, days=30, today=None):
+    """[(day, granted, denied, unique_members)] for the last `days` days, oldest first."""
+    start, end = _window(days, today)
+    return db.execute(
+        'SELECT day, granted, denied, unique_members FROM attendance_daily WHERE day >= ? AND day < ? ORDER BY day',
+        (start, end)).fetchall()
+
+
+def peak_hours(db, days=28, today=None):
+    """7x24 matrix of granted entries by weekday (0 = Monday) and hour over the last `days` days."""
+    start, end = _window(days, today)
+    heatmap = [[0] * 24 for _ in range(7)]
+    rows = db.execute('''
+        SELECT (CAST(strftime('%w', day) AS INTEGER) + 6) % 7, hour, SUM(granted)
+        FROM attendance_hourly WHERE day >= ? AND day < ? GROUP BY 1, 2
+    ''', (start, end))
+    for weekday, hour, granted in rows:
+        heatmap[weekday][hour] = granted
+    return heatmap
+
+
+def active_member_ratio(db, days=30, today=None):
+    """(members who visited in the last `days` days, members with a current membership)."""
+    today = today or date.today()
+    start, end = _window(days, today)
+    visited = db.execute(
+        'SELECT COUNT(DISTINCT member_id) FROM attendance_member_daily WHERE day >= ? AND day < ?', (start, end)).fetchone()[0]
+    current = db.execute(
+        'SELECT COUNT(*) FROM members WHERE is_frozen = 0 AND end_ord > ?', (today.toordinal(),)).fetchone()[0]
+    return visited, current
+
+
+def churn(db, days=30, today=None):
+    """(members who visited in the previous window but not the last one, visitors of the previous window)."""
+    today = today or date.today()
+    recent_start, end = _window(days, today)
+    previous_start = (today - timedelta(days=2 * days - 1)).isoformat()
+    previous = db.execute(
+        'SELECT COUNT(DISTINCT member_id) FROM attendance_member_daily WHERE day >= ? AND day < ?',
+        (previous_start, recent_start)).fetchone()[0]
+    lost = db.execute('''
+        SELECT COUNT(DISTINCT member_id) FROM attendance_member_daily
+        WHERE day >= ? AND day < ? AND member_id NOT IN (
+            SELECT member_id FROM attendance_member_daily WHERE day >= ? AND day < ?)
+    ''', (previous_start, recent_start, recent_start, end)).fetchone()[0]
+    return lost, previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GymBase attendance analytics")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--db", default="gym.db")
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    db = DatabaseManager(args.db)
+    days = rebuild(db)
+    db.close()
+    print(f"Rollups rebuilt for {days} days")
+
+
+if __name__ == "__main__":
+    main()
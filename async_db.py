@@ -0,0 +1,70 @@
+"""Non-blocking database access for the Tk screens.
+
+AsyncDatabase wraps a DatabaseManager (or RemoteDatabase): every method
+returns a concurrent.futures.Future right away and the query runs on a small
+worker pool. then() hands the result back on the Tk thread via after(), so
+the main loop never waits on SQLite or the network.
+
+    future = self.adb.get_member(user_id)
+    self.adb.then(future, self, self.show_member)
+"""
+import logging
+import tkinter
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox
+
+
+class AsyncDatabase:
+    WORKERS = 2
+
+    def __init__(self, db, workers=WORKERS):
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-worker")
+        # One thread for calls whose results must arrive in order (access checks)
+        self.ordered = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-ordered")
+
+    def submit(self, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) on the pool; for work that spans several calls."""
+        return self.executor.submit(func, *args, **kwargs)
+
+    def submit_ordered(self, func, *args, **kwargs):
+        """Like submit(), on a thread of its own: calls run and complete in the order submitted."""
+        return self.ordered.submit(func, *args, **kwargs)
+
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+        if not callable(method):
+            return method
+        return lambda *args, **kwargs: self.executor.submit(method, *args, **kwargs)
+
+    def then(self, future, widget, on_result, on_error=None):
+        """Calls on_result(result) or on_error(exception) on the Tk thread once future is done.
+
+        Nothing is called if widget was destroyed in the meantime. Without
+        on_error, failures are logged and shown in an error dialog.
+        """
+        def deliver():
+            if not widget.winfo_exists():
+                return
+            error = future.exception()
+            if error is None:
+                on_result(future.result())
+            elif on_error:
+                on_error(error)
+            else:
+                logging.error(f"Database call failed: {error}")
+                messagebox.showerror("Error", f"Error de base de datos: {error}")
+
+        def done(_):
+            try:
+                widget.after(0, deliver)
+            except (RuntimeError, tkinter.TclError):
+                pass  # the window is gone or the main loop has stopped
+
+        future.add_done_callback(done)
+        return future
+
+    def shutdown(self):
+        """Waits for queued calls; close the database afterwards."""
+        self.executor.shutdown(wait=True)
+        self.ordered.shutdown(wait=True)
@@ -0,0 +1,70 @@
+"""Per-lookup latency of DatabaseManager.get_member, before and after
+persistent connections.
+
+"before" reproduces the old connect-per-call pattern (sqlite3.connect, query,
+close); "after" goes through the current DatabaseManager.
+
+    python benchmarks/bench_db_lookup.py [--sizes 10000 100000] [--lookups 5000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import DatabaseManager
+
+
+def populate(db, count):
+    conn = db.connect()
+    with conn:
+        conn.executemany(
+            "INSERT INTO members (id, name, age, address, phone, registration_date, membership_end_date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((str(10000000 + i), f"Miembro {i}", 30, "", "", "2024-01-01", "2030-01-01") for i in range(count)),
+        )
+    conn.close()
+
+
+def lookup_old(db_name, user_id):
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM members WHERE id = ?', (user_id,))
+    member = cursor.fetchone()
+    conn.close()
+    return member
+
+
+def measure(fn, ids):
+    start = time.perf_counter()
+    for user_id in ids:
+        fn(user_id)
+    return (time.perf_counter() - start) / len(ids) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'members':>10} {'before (us)':>12} {'after (us)':>12} {'speedup':>8}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseManager(os.path.join(tmp, "bench.db"))
+            populate(db, size)
+            ids = [str(10000000 + rng.randrange(size)) for _ in range(args.lookups)]
+
+            before = measure(lambda uid: lookup_old(db.db_name, uid), ids)
+            after = measure(db.get_member, ids)
+            db.close()
+        print(f"{size:>10} {before:>12.1f} {after:>12.1f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
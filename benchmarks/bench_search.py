@@ -0,0 +1,62 @@
+"""Member search latency with the FTS5 index versus the old LIKE '%q%' scan.
+
+    python benchmarks/bench_search.py [--members 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import DatabaseManager
+
+FIRST = ["José", "María", "Juan", "Ana", "Luis", "Carmen", "Andrés", "Lucía", "Sofía", "Martín", "Raúl", "Inés"]
+LAST = ["Pérez", "Gómez", "Rodríguez", "Fernández", "López", "Martínez", "Sánchez", "Jiménez", "Núñez", "Castro"]
+QUERIES = ["jose", "perez", "jose perez", "nun", "sofia castro", "12345", "xyz"]
+
+
+def populate(db, count, rng):
+    conn = db.connect()
+    with conn:
+        conn.executemany(
+            "INSERT INTO members (id, name, membership_end_date) VALUES (?, ?, '2030-01-01')",
+            ((str(10000000 + i), f"{rng.choice(FIRST)} {rng.choice(LAST)} {rng.choice(LAST)}") for i in range(count)),
+        )
+    conn.close()
+
+
+def timed(fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "bench.db"))
+        populate(db, args.members, random.Random(42))
+        conn = db._conn()
+
+        print(f"{args.members} members, FTS5 enabled: {db.fts_enabled}")
+        print(f"{'query':<14} {'matches':>8} {'count (ms)':>11} {'page (ms)':>10} {'LIKE (ms)':>10}")
+        for query in QUERIES:
+            count_ms, matches = timed(lambda: db.count_members(query))
+            page_ms, _ = timed(lambda: db.get_members_page(0, 50, query))
+            like = '%' + query + '%'
+            like_ms, _ = timed(lambda: conn.execute(
+                "SELECT id, name, membership_end_date, is_frozen FROM members WHERE name LIKE ? OR id LIKE ? LIMIT 50",
+                (like, like)).fetchall(), repeat=3)
+            print(f"{query:<14} {matches:>8} {count_ms:>11.2f} {page_ms:>10.2f} {like_ms:>10.2f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
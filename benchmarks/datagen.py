@@ -0,0 +1,141 @@
+"""Seeded synthetic gym data: members, config, cards and access history.
+
+The same seed, sizes and reference day always produce the same database,
+so benchmark runs can be compared.
+
+    python benchmarks/datagen.py --db bench.db [--members 50000] [--events 1000000] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import DatabaseManager
+from access_log import OUTCOME_GRANTED, OUTCOME_FROZEN, OUTCOME_EXPIRED, OUTCOME_NOT_FOUND
+
+FIRST = ["José", "María", "Juan", "Ana", "Luis", "Carmen", "Andrés", "Lucía", "Sofía", "Martín", "Raúl", "Inés",
+         "Camila", "Mateo", "Valentina", "Santiago", "Ximena", "Diego", "Renata", "Nicolás"]
+LAST = ["Pérez", "Gómez", "Rodríguez", "Fernández", "López", "Martínez", "Sánchez", "Jiménez", "Núñez", "Castro",
+        "Díaz", "Torres", "Ramírez", "Flores", "Muñoz", "Rojas", "Vargas", "Herrera", "Ortiz", "Peña"]
+STREETS = ["Av. Libertador", "Calle 10", "Carrera 7", "Av. Bolívar", "Calle Real", "Pasaje Sucre"]
+# Share of members by membership state
+MIX = (("active", 0.70), ("expiring", 0.05), ("expired", 0.20), ("frozen", 0.05))
+# Relative traffic per opening hour (6:00-22:00), morning and evening peaks
+HOURS = {6: 6, 7: 9, 8: 7, 9: 4, 10: 3, 11: 3, 12: 4, 13: 3, 14: 2, 15: 2, 16: 3, 17: 7, 18: 10, 19: 9, 20: 6, 21: 3}
+ID_BASE = 10000000
+# Card UIDs as the readers send them (decimal); every CARD_EVERY-th member has one
+CARD_BASE = 4000000000
+CARD_EVERY = 2
+CHUNK = 5000
+
+
+def member_ids(count):
+    return [str(ID_BASE + i) for i in range(count)]
+
+
+def generate_members(count, rng, today):
+    """Yields member tuples in DatabaseManager.MEMBER_COLUMNS order."""
+    states, weights = zip(*MIX)
+    for user_id in member_ids(count):
+        state = rng.choices(states, weights)[0]
+        registered = today - timedelta(days=rng.randrange(30, 1500))
+        if state == "active":
+            end = today + timedelta(days=rng.randrange(8, 365))
+        elif state == "expiring":
+            end = today + timedelta(days=rng.randrange(1, 8))
+        elif state == "expired":
+            end = today - timedelta(days=rng.randrange(0, 700))
+        else:
+            end = today + timedelta(days=rng.randrange(1, 200))
+        frozen = state == "frozen"
+        frozen_date = (today - timedelta(days=rng.randrange(1, 60))).isoformat() if frozen else None
+        name = f"{rng.choice(FIRST)} {rng.choice(LAST)} {rng.choice(LAST)}"
+        yield (user_id, name, rng.randrange(16, 75), f"{rng.choice(STREETS)} #{rng.randrange(1, 999)}",
+               f"3{rng.randrange(10 ** 8, 10 ** 9)}", registered.isoformat(), end.isoformat(), int(frozen), frozen_date)
+
+
+def generate_events(count, members, rng, today, days=365):
+    """Yields (member_id, ts, outcome, source, terminal, latency_ms) over the last `days` days, oldest first."""
+    hours, weights = zip(*HOURS.items())
+    per_day = max(count // days, 1)
+    start = today - timedelta(days=days - 1)
+    produced = 0
+    for day_offset in range(days):
+        day = start + timedelta(days=day_offset)
+        n = per_day if day_offset < days - 1 else count - produced
+        stamps = sorted(datetime(day.year, day.month, day.day, rng.choices(hours, weights)[0],
+                                 rng.randrange(60), rng.randrange(60)) for _ in range(n))
+        for ts in stamps:
+            roll = rng.random()
+            if roll < 0.90:
+                outcome, member_id = OUTCOME_GRANTED, str(ID_BASE + rng.randrange(members))
+            elif roll < 0.95:
+                outcome, member_id = OUTCOME_EXPIRED, str(ID_BASE + rng.randrange(members))
+            elif roll < 0.97:
+                outcome, member_id = OUTCOME_FROZEN, str(ID_BASE + rng.randrange(members))
+            else:
+                outcome, member_id = OUTCOME_NOT_FOUND, str(rng.randrange(10 ** 6))
+            terminal = rng.choice(("entrada-1", "entrada-2"))
+            yield (member_id, ts.strftime("%Y-%m-%d %H:%M:%S"), outcome, f"/dev/ttyUSB{terminal[-1]}", terminal,
+                   round(rng.uniform(2, 25), 2))
+        produced += n
+        if produced >= count:
+            break
+
+
+def card_uid(index):
+    return f"{CARD_BASE + index:010d}"
+
+
+def populate(db, members=50000, events=100000, seed=42, today=None):
+    """Fills db through the DatabaseManager write paths (change log and rollups included)."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    db.set_config("gym_name", "GymBase Bench")
+    db.set_config("terminal_name", "bench")
+    db.set_config("serial_ports", '[{"port": "/dev/ttyUSB1", "baud": 9600, "terminal": "entrada-1"}]')
+
+    chunk = []
+    for line_no, values in enumerate(generate_members(members, rng, today), start=1):
+        chunk.append((line_no, values))
+        if len(chunk) >= CHUNK:
+            db.bulk_add_members(chunk)
+            chunk = []
+    if chunk:
+        db.bulk_add_members(chunk)
+
+    batch = []
+    for event in generate_events(events, members, rng, today):
+        batch.append(event)
+        if len(batch) >= 4 * CHUNK:
+            db.add_access_events(batch)
+            batch = []
+    if batch:
+        db.add_access_events(batch)
+
+    for i in range(0, members, CARD_EVERY):
+        db.assign_credential(card_uid(i), str(ID_BASE + i))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--members", type=int, default=50000)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--today", type=date.fromisoformat, help="reference day (default: today)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    db = DatabaseManager(args.db)
+    populate(db, args.members, args.events, args.seed, args.today)
+    db.close()
+    print(f"{args.members} members, {args.events} events written to {args.db} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Access checks per second against remote.py on localhost.
+
+Starts a server process on a temporary database with --members members
+(or uses --address), then runs --clients terminals, each with its own
+connection, sending get_access_info requests --pipeline at a time.
+
+    python benchmarks/load_test_server.py [--members 100000] [--clients 4] [--pipeline 1 32] [--seconds 3]
+"""
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from database import DatabaseManager
+from remote import RemoteDatabase
+
+
+def populate(path, count):
+    db = DatabaseManager(path)
+    conn = db.connect()
+    with conn:
+        conn.executemany(
+            "INSERT INTO members (id, name, age, address, phone, registration_date, membership_end_date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((str(10000000 + i), f"Miembro {i}", 30, "", "", "2024-01-01", "2030-01-01") for i in range(count)),
+        )
+    conn.close()
+    db.close()
+
+
+def start_server(db_path):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "remote.py"), "--db", db_path, "--host", "127.0.0.1", "--port", "0",
+         "--log", os.devnull],
+        stdout=subprocess.PIPE, text=True)
+    # "Listening on 127.0.0.1:PORT"
+    address = server.stdout.readline().split()[-1]
+    return server, address
+
+
+def client(address, members, pipeline, deadline, results):
+    remote = RemoteDatabase(address)
+    rng = random.Random(threading.get_ident())
+    done, latencies = 0, []
+    while time.perf_counter() < deadline:
+        ids = [str(10000000 + rng.randrange(members)) for _ in range(pipeline)]
+        start = time.perf_counter()
+        remote.call_many([("get_access_info", (user_id,), {}) for user_id in ids])
+        latencies.append(time.perf_counter() - start)
+        done += pipeline
+    remote.close()
+    results.append((done, latencies))
+
+
+def run(address, members, clients, pipeline, seconds):
+    results = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client, args=(address, members, pipeline, deadline, results))
+               for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    total = sum(done for done, _ in results)
+    latencies = sorted(l for _, batch in results for l in batch)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{clients:>8} {pipeline:>9} {total / elapsed:>12.0f} {p50:>10.3f} {p99:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--address", help="existing server HOST:PORT (members must use the ids generated here)")
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--pipeline", type=int, nargs="+", default=[1, 32])
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = None
+        address = args.address
+        if not address:
+            db_path = os.path.join(tmp, "load.db")
+            populate(db_path, args.members)
+            server, address = start_server(db_path)
+        try:
+            print(f"{'clients':>8} {'pipeline':>9} {'checks/s':>12} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+            for clients in args.clients:
+                for pipeline in args.pipeline:
+                    run(address, args.members, clients, pipeline, args.seconds)
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""Reproducible GymBase benchmark suite.
+
+Builds a seeded synthetic database (benchmarks/datagen.py), times the main
+DatabaseManager operations (also with the member snapshot), card
+resolution, the access decision with precompiled plan rules, the serial frame parser and the data path of MembersFrame.refresh_list /
+AccessFrame.check_access without a display, and
+writes the results as JSON. With --baseline, any benchmark whose median got
+slower than the threshold fails the run (exit status 1).
+
+    python benchmarks/suite.py [--members 50000] [--events 200000] [--seed 42]
+                               [--output results.json] [--baseline previous.json] [--threshold 0.25]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from types import SimpleNamespace
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import DatabaseManager
+from serial_manager import FrameParser
+import access
+import plans
+import datagen
+
+SEARCH_QUERIES = ["jose", "perez", "jose perez", "nun", "sofia castro", "1000123", "xyz"]
+# Ignore differences below this many microseconds when comparing with a baseline
+MIN_DELTA_US = 2.0
+
+
+def summarize(samples_ns, per=1):
+    """Latency summary in microseconds; per divides each sample (e.g. frames per chunk)."""
+    samples = sorted(s / 1000 / per for s in samples_ns)
+    return {
+        "n": len(samples),
+        "p50_us": round(statistics.median(samples), 3),
+        "p95_us": round(samples[int(len(samples) * 0.95) - 1 if len(samples) > 1 else 0], 3),
+        "p99_us": round(samples[int(len(samples) * 0.99) - 1 if len(samples) > 1 else 0], 3),
+        "mean_us": round(statistics.fmean(samples), 3),
+    }
+
+
+def measure(fn, calls, per=1, warmup=True):
+    samples = []
+    clock = time.perf_counter_ns
+    if warmup:
+        fn(*calls[0])  # page cache and statement cache
+    for args in calls:
+        start = clock()
+        fn(*args)
+        samples.append(clock() - start)
+    return summarize(samples, per)
+
+
+class _Widget:
+    """Stand-in for the entries and labels the frame methods touch."""
+
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def delete(self, *args):
+        self.value = ""
+
+    def configure(self, **kwargs):
+        pass
+
+
+def bench_database(db, members, rng):
+    results = {}
+    ids = [str(datagen.ID_BASE + rng.randrange(members)) for _ in range(5000)]
+    results["db.get_member"] = measure(db.get_member, [(i,) for i in ids])
+    results["db.get_access_info"] = measure(db.get_access_info, [(i,) for i in ids])
+    cards = [datagen.card_uid(rng.randrange(0, members, datagen.CARD_EVERY)) for _ in range(5000)]
+    results["db.resolve_credential"] = measure(db.resolve_credential, [(c,) for c in cards])
+    results["access.check_code[card]"] = measure(lambda c: access.check_code(db, c), [(c,) for c in cards])
+    results["access.check_code[id]"] = measure(lambda i: access.check_code(db, i), [(i,) for i in ids])
+    for query in SEARCH_QUERIES:
+        results[f"db.search_members[{query}]"] = measure(db.search_members, [(query,)] * 20)
+        results[f"db.get_members_page[{query}]"] = measure(lambda q: (db.count_members(q), db.get_members_page(0, 100, q)),
+                                                         [(query,)] * 20)
+    results["db.count_by_status"] = measure(db.count_by_status, [()] * 20)
+    results["db.get_all_members"] = measure(db.get_all_members, [()] * 5)
+    # Freeze then unfreeze the same members so the dataset is unchanged afterwards
+    toggled = [str(datagen.ID_BASE + rng.randrange(members)) for _ in range(200)]
+    results["db.toggle_freeze"] = measure(db.toggle_freeze, [(i,) for i in toggled + toggled],
+                                          warmup=False)
+    # The same writes from WRITERS threads at once; per-write cost, so it shows what group commit buys
+    results["db.toggle_freeze[concurrent]"] = measure(lambda: concurrent_toggles(db, sorted(set(toggled))), [()] * 5,
+                                                      per=2 * len(set(toggled)))
+    return results
+
+
+def concurrent_toggles(db, ids, writers=8):
+    # Each member is toggled twice by the same thread, leaving the dataset unchanged
+    def work(part):
+        for user_id in part + part:
+            db.toggle_freeze(user_id)
+
+    threads = [threading.Thread(target=work, args=(ids[k::writers],)) for k in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def bench_snapshot(db_path, snapshot_path, members, rng):
+    """Warm start from a memory-mapped member snapshot, and lookups served by it."""
+    db = DatabaseManager(db_path)
+    db.use_snapshot(snapshot_path)  # builds the file
+    db.close()
+
+    def warm_start():
+        started = DatabaseManager(db_path)
+        started.use_snapshot(snapshot_path)
+        started.close()
+
+    results = {"snapshot.warm_start": measure(warm_start, [()] * 10)}
+    db = DatabaseManager(db_path)
+    db.use_snapshot(snapshot_path)
+    ids = [str(datagen.ID_BASE + rng.randrange(members)) for _ in range(5000)]
+    results["db.get_access_info[snapshot]"] = measure(db.get_access_info, [(i,) for i in ids])
+    db.close()
+    return results
+
+
+# Rules of the plans bench_rules decides with; None is a member without a plan
+BENCH_PLANS = {
+    "none": None,
+    "hours": {"hours": [["06:00", "12:00"], ["20:00", "23:00"]], "weekdays": [0, 1, 2, 3, 4]},
+    "visits": {"visits": 10},
+    "grace": {"grace_days": 3},
+}
+
+
+def bench_rules(db, members, rng, chunk=1000):
+    """Access decisions per plan kind, in chunks of `chunk` scans; also reported as decisions/s.
+
+    access.decide is the rule engine alone; access.check adds the cache lookup
+    and, for quota plans, the visit count, against members given each plan
+    in place of their own (the dataset is not modified).
+    """
+    compiled = {name: rules and plans.compile_plan(n, name, 1, 0, rules)
+                for n, (name, rules) in enumerate(BENCH_PLANS.items(), 1)}
+    ids = [str(datagen.ID_BASE + rng.randrange(members)) for _ in range(chunk)]
+    infos = [db.get_access_info(i) for i in ids]
+    moments = [datetime(2025, 1, 13) + (datetime(2025, 1, 20) - datetime(2025, 1, 13)) * rng.random()
+               for _ in range(chunk)]
+    today = moments[0].toordinal()
+    minutes = [plans.minute_of_week(m) for m in moments]
+    results = {}
+
+    def rate(summary):
+        summary["decisions_per_s"] = round(1e6 / summary["p50_us"]) if summary["p50_us"] else None
+        return summary
+
+    for name, plan in compiled.items():
+        def decide_all(plan=plan):
+            for info, minute in zip(infos, minutes):
+                access.decide(info, today, plan, minute, 3)
+        results[f"access.decide[{name}]"] = rate(measure(decide_all, [()] * 50, per=chunk))
+
+        by_id = {plan.plan_id: plan} if plan else {}
+
+        def lookup(user_id, plan=plan):
+            info = db.get_access_info(user_id)
+            return info and info[:3] + (plan and plan.plan_id,)
+
+        view = SimpleNamespace(get_access_info=lookup, access_plans=lambda by_id=by_id: by_id,
+                               visits_used=db.visits_used, count_visit=db.count_visit)
+
+        def check_all(view=view):
+            for user_id, moment in zip(ids, moments):
+                access.check(view, user_id, now=moment)
+        results[f"access.check[{name}]"] = rate(measure(check_all, [()] * 20, per=chunk))
+    return results
+
+
+def bench_serial(rng, frames=100000):
+    codes = [str(rng.randrange(10 ** 9)) for _ in range(frames)]
+    stream = b"".join(b"*" + c.encode() + b"#" for c in codes)
+    chunks, pos = [], 0
+    while pos < len(stream):
+        size = rng.randint(1, 512)
+        chunks.append(stream[pos:pos + size])
+        pos += size
+
+    def feed_all():
+        parser = FrameParser()
+        count = 0
+        for chunk in chunks:
+            count += len(parser.feed(chunk))
+        assert count == frames
+
+    # Per-frame cost over the whole stream, repeated
+    return {"serial.FrameParser.feed": measure(feed_all, [()] * 10, per=frames)}
+
+
+def bench_frames(db, members, rng):
+    """Times the UI methods' data path with widget stand-ins (no Tk root needed)."""
+    try:
+        import views
+    except Exception as e:  # customtkinter/tkcalendar missing
+        return {"ui": {"skipped": str(e)}}
+
+    results = {}
+    members_frame = SimpleNamespace(
+        db=db, search_generation=1, member_list=SimpleNamespace(PAGE_SIZE=views.VirtualMemberList.PAGE_SIZE),
+        after=lambda ms, fn: fn(), apply_search=lambda *args: None)
+    for query in ["", "jose perez", "1000123"]:
+        results[f"ui.MembersFrame.refresh_list[{query}]"] = measure(
+            lambda q: views.MembersFrame.run_search(members_frame, 1, q, None), [(query,)] * 20)
+
+    # adb=None: the decision runs inline, so the whole data path is timed
+    access_frame = SimpleNamespace(db=db, adb=None, event_writer=None, terminal="bench", entry_id=_Widget(),
+                                   status_label=_Widget(), info_label=_Widget())
+    access_frame.decide = lambda *args: views.AccessFrame.decide(access_frame, *args)
+    access_frame.show_decision = lambda decision: views.AccessFrame.show_decision(access_frame, decision)
+
+    def check(user_id):
+        access_frame.entry_id.value = user_id
+        views.AccessFrame.check_access(access_frame)
+
+    ids = [str(datagen.ID_BASE + rng.randrange(members)) for _ in range(5000)]
+    results["ui.AccessFrame.check_access"] = measure(check, [(i,) for i in ids])
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Returns [(name, baseline_p50, current_p50)] for benchmarks slower than threshold allows."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or "p50_us" not in previous or "p50_us" not in current:
+            continue
+        before, after = previous["p50_us"], current["p50_us"]
+        if after > before * (1 + threshold) and after - before > MIN_DELTA_US:
+            regressions.append((name, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=50000)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--today", type=date.fromisoformat, default=date(2025, 1, 15),
+                        help="reference day for generated dates (fixed so runs compare)")
+    parser.add_argument("--data-dir", help="keep generated databases here and reuse them")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown of the median (0.25 = 25%%)")
+    args = parser.parse_args()
+    # Keep the access log calls on the timed path, but out of the terminal
+    logging.getLogger().addHandler(logging.NullHandler())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        db_path = os.path.join(data_dir, f"bench-{args.members}-{args.events}-{args.seed}-{args.today}.db")
+        if not os.path.exists(db_path):
+            start = time.perf_counter()
+            db = DatabaseManager(db_path)
+            datagen.populate(db, args.members, args.events, args.seed, args.today)
+            db.close()
+            print(f"Generated {os.path.basename(db_path)} in {time.perf_counter() - start:.1f} s")
+
+        db = DatabaseManager(db_path)
+        db.warm_access_cache()
+        rng = random.Random(args.seed)
+        results = {}
+        results.update(bench_database(db, args.members, rng))
+        results.update(bench_rules(db, args.members, rng))
+        results.update(bench_serial(rng))
+        results.update(bench_frames(db, args.members, rng))
+        db.close()
+        results.update(bench_snapshot(db_path, os.path.join(tmp, "members.snap"), args.members, rng))
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "members": args.members,
+            "events": args.events,
+            "seed": args.seed,
+            "today": args.today.isoformat(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"{'benchmark':<44} {'p50 (us)':>12} {'p95 (us)':>12} {'p99 (us)':>12}")
+    for name, r in results.items():
+        if "p50_us" in r:
+            print(f"{name:<44} {r['p50_us']:>12.1f} {r['p95_us']:>12.1f} {r['p99_us']:>12.1f}")
+        else:
+            print(f"{name:<44} skipped: {r.get('skipped')}")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("members") != args.members or baseline["meta"].get("events") != args.events:
+            print("Warning: baseline was recorded at a different scale")
+        regressions = compare(results, baseline["results"], args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.1f} -> {after:.1f} us (+{100 * (after / before - 1):.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {100 * args.threshold:.0f}% against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
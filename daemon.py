@@ -0,0 +1,140 @@
+"""Headless access control for turnstile boxes without a display.
+
+Reads codes from the configured serial readers, decides with the same
+access module as the desktop app, answers the turnstile and records the
+event. No Tk is imported.
+
+    python daemon.py [--db gym.db] [--log gymbase-daemon.log] [--metrics gymbase-metrics.txt]
+                     [--snapshot gym-members.snap]
+"""
+import argparse
+import asyncio
+import logging
+import signal
+import socket
+import time
+
+import access
+from access_log import AccessEventWriter, OUTCOME_GRANTED
+from database import DatabaseManager
+from logging_setup import setup_logging, ROTATE_SIZE, ROTATE_DAILY
+from metrics import METRICS, ScanTimer
+from serial_manager import SerialHub, load_port_config
+
+
+class AccessDaemon:
+    # How often to look for member changes made by other processes (the desktop app)
+    CACHE_CHECK_INTERVAL = 30
+
+    def __init__(self, db_path="gym.db", metrics_path=None, snapshot_path=None):
+        self.db_path = db_path
+        self.metrics_path = metrics_path
+        self.snapshot_path = snapshot_path
+        self.loop = None
+        self.stopping = None
+        self.db = None
+        self.event_writer = None
+        self.hub = None
+        self.terminal_name = None
+
+    async def serve(self):
+        """Runs until stop() is called or SIGINT/SIGTERM arrives."""
+        started = time.perf_counter()
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self.stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows, or not the main thread
+
+        self.db = DatabaseManager(self.db_path)
+        if self.snapshot_path:
+            # Warm start: map the member snapshot instead of loading every member
+            self.db.use_snapshot(self.snapshot_path)
+        else:
+            self.db.warm_access_cache()
+        self.terminal_name = self.db.get_config("terminal_name", socket.gethostname())
+        self.event_writer = AccessEventWriter(self.db)
+        self.event_writer.start()
+        self.hub = SerialHub(self.on_code)
+        self.hub.configure(load_port_config(self.db))
+        if not self.hub.ports:
+            logging.warning("Daemon: no serial readers configured")
+        self.hub.start()
+        logging.info(f"Daemon ready in {1000 * (time.perf_counter() - started):.0f} ms "
+                     f"({len(self.hub.ports)} readers)")
+
+        watcher = asyncio.create_task(self.watch_members())
+        try:
+            await self.stopping.wait()
+        finally:
+            watcher.cancel()
+            self.hub.stop()
+            self.event_writer.stop()
+            self.db.close()
+            self.write_metrics()
+            logging.info("Daemon stopped")
+
+    def stop(self):
+        """Thread-safe shutdown request."""
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.stopping.set)
+
+    def on_code(self, code, port, received_at):
+        # Runs on the hub thread; decide on the event loop
+        timer = ScanTimer(code, received_at)
+        timer.mark("serial")
+        self.loop.call_soon_threadsafe(self.handle_code, code, port, received_at, timer)
+
+    def handle_code(self, code, port, received_at, timer=None):
+        timer = timer or ScanTimer(code, received_at)
+        timer.mark("queue")
+        user_id, outcome, info = access.check_code(self.db, code)
+        timer.mark("lookup")
+        latency_ms = self.hub.respond(port, outcome == OUTCOME_GRANTED, received_at)
+        timer.mark("relay")
+        self.event_writer.record(user_id, outcome, port.port, port.terminal or self.terminal_name, latency_ms=latency_ms)
+        card = "" if user_id == code.strip() else f" (card {code.strip()})"
+        logging.info(f"Access {outcome} for ID: {user_id}{card} on {port.terminal}")
+        timer.mark("record")
+        timer.finish(outcome)
+
+    async def watch_members(self):
+        # The access cache is only written through by this process; pick up
+        # changes committed by other processes (data_changed also fires for our
+        # own commits, but a refresh only reads what changed)
+        self.db.data_changed()
+        while True:
+            await asyncio.sleep(self.CACHE_CHECK_INTERVAL)
+            if self.db.data_changed():
+                await asyncio.to_thread(self.db.refresh_access_cache)
+            self.write_metrics()
+
+    def write_metrics(self):
+        # Stage histograms for a box without a screen, refreshed with the cache check
+        if not self.metrics_path:
+            return
+        try:
+            METRICS.write(self.metrics_path)
+        except OSError as e:
+            logging.error(f"Daemon: could not write metrics to {self.metrics_path}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GymBase headless access control")
+    parser.add_argument("--db", default="gym.db")
+    parser.add_argument("--log", default="gymbase-daemon.log")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--log-rotate", choices=[ROTATE_SIZE, ROTATE_DAILY], default=ROTATE_SIZE)
+    parser.add_argument("--access-json", metavar="PATH", help="also write every access event as a JSON line to PATH")
+    parser.add_argument("--metrics", help="write per-stage latency histograms to this file every 30 s")
+    parser.add_argument("--snapshot", metavar="PATH", help="serve lookups from a memory-mapped member snapshot kept at PATH")
+    args = parser.parse_args()
+
+    setup_logging(args.log, level=args.log_level.upper(), rotate=args.log_rotate, access_json=args.access_json)
+    asyncio.run(AccessDaemon(args.db, args.metrics, args.snapshot).serve())
+
+
+if __name__ == "__main__":
+    main()
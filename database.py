@@ -1,72 +1,829 @@
 import sqlite3
+import json
 import logging
-from datetime import datetime, timedelta
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+import analytics
+from access_log import OUTCOME_GRANTED
+import plans
+import snapshot
+
+
+def date_to_ordinal(date_str):
+    """Converts a 'YYYY-MM-DD' string to a proleptic ordinal (0 if missing/invalid)."""
+    try:
+        return date.fromisoformat(date_str).toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+
+def normalize_uid(code):
+    """Card UIDs are stored and looked up trimmed and upper-case, whatever the reader sends."""
+    return code.strip().upper()
+
+
+STATUS_ACTIVE = "active"
+STATUS_EXPIRING = "expiring"
+STATUS_EXPIRED = "expired"
+STATUS_FROZEN = "frozen"
+# Status of a members row; the expiry date itself is exclusive (bind today's ordinal)
+STATUS_SQL = (f"CASE WHEN members.is_frozen THEN '{STATUS_FROZEN}' "
+              f"WHEN members.end_ord > ? THEN '{STATUS_ACTIVE}' ELSE '{STATUS_EXPIRED}' END")
+
+# Days between the proleptic ordinal (date.toordinal) and SQLite's julianday()
+JULIAN_OFFSET = 1721424.5
+END_ORD_SQL = f"CAST(julianday(membership_end_date) - {JULIAN_OFFSET} AS INTEGER)"
+
+
+def _migrate_end_ord(conn):
+    # v1: comparable expiry ordinal kept in sync by triggers, indexed with is_frozen
+    conn.execute('ALTER TABLE members ADD COLUMN end_ord INTEGER NOT NULL DEFAULT 0')
+    conn.execute(f'UPDATE members SET end_ord = COALESCE({END_ORD_SQL}, 0)')
+    conn.execute(f'''
+        CREATE TRIGGER members_end_ord_insert AFTER INSERT ON members BEGIN
+            UPDATE members SET end_ord = COALESCE({END_ORD_SQL}, 0) WHERE rowid = new.rowid;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER members_end_ord_update AFTER UPDATE OF membership_end_date ON members BEGIN
+            UPDATE members SET end_ord = COALESCE({END_ORD_SQL}, 0) WHERE rowid = new.rowid;
+        END
+    ''')
+    conn.execute('CREATE INDEX idx_members_status ON members (is_frozen, end_ord)')
+
+
+def _migrate_access_latency(conn):
+    # v2: scan-to-relay latency of serial responses, NULL for keyboard entries
+    conn.execute('ALTER TABLE access_events ADD COLUMN latency_ms REAL')
+
+
+# Settings that belong to one terminal and are never replicated
+LOCAL_CONFIG_KEYS = ("node_id", "terminal_name", "serial_ports", "serial_port", "serial_baud", "sync_peer")
+MEMBER_JSON_SQL = "json_array(m.id, m.name, m.age, m.address, m.phone, m.registration_date, " \
+                  "m.membership_end_date, m.is_frozen, m.frozen_date)"
+
+
+def _now_version():
+    # Change versions are wall-clock milliseconds, bumped to stay strictly increasing
+    return int(time.time() * 1000)
+
+
+def _migrate_changelog(conn):
+    # v3: replication change log, one row per (entity, key) holding its latest state.
+    # AUTOINCREMENT keeps seq strictly increasing even when the newest row is replaced.
+    conn.execute('''
+        CREATE TABLE changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            key TEXT NOT NULL,
+            data TEXT,
+            version INTEGER NOT NULL,
+            node TEXT NOT NULL,
+            UNIQUE (entity, key)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE sync_peers (
+            node TEXT PRIMARY KEY,
+            pulled INTEGER NOT NULL DEFAULT 0,
+            pushed INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    node = uuid.uuid4().hex
+    conn.execute("INSERT OR IGNORE INTO config (key, value) VALUES ('node_id', ?)", (node,))
+    node = conn.execute("SELECT value FROM config WHERE key = 'node_id'").fetchone()[0]
+    # Existing rows become changes, so a new peer receives the whole database once
+    version = _now_version()
+    conn.execute(f"INSERT INTO changelog (entity, key, data, version, node) "
+                 f"SELECT 'member', m.id, {MEMBER_JSON_SQL}, ?, ? FROM members m", (version, node))
+    conn.execute(f"INSERT INTO changelog (entity, key, data, version, node) "
+                 f"SELECT 'config', key, value, ?, ? FROM config "
+                 f"WHERE key NOT IN ({', '.join('?' * len(LOCAL_CONFIG_KEYS))})", (version, node) + LOCAL_CONFIG_KEYS)
+
+
+def _migrate_plans(conn):
+    # v4: membership plans with their access rules; members without a plan keep the plain rule
+    conn.execute('''
+        CREATE TABLE plans (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            months INTEGER NOT NULL DEFAULT 0,
+            days INTEGER NOT NULL DEFAULT 0,
+            rules TEXT NOT NULL DEFAULT '{}'
+        )
+    ''')
+    conn.executemany('INSERT INTO plans (name, months, days) VALUES (?, ?, ?)', plans.DEFAULT_PLANS)
+    conn.execute('ALTER TABLE members ADD COLUMN plan_id INTEGER REFERENCES plans (id) ON DELETE SET NULL')
+
+
+def _migrate_credentials(conn):
+    # v5: cards/tags that identify a member at the readers, several per member;
+    # revoked cards stay so a lost card is recognized (and denied) when scanned
+    conn.execute('''
+        CREATE TABLE credentials (
+            uid TEXT PRIMARY KEY,
+            member_id TEXT NOT NULL REFERENCES members (id) ON DELETE CASCADE,
+            label TEXT NOT NULL DEFAULT '',
+            is_revoked INTEGER NOT NULL DEFAULT 0,
+            assigned_date TEXT,
+            revoked_date TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_credentials_member ON credentials (member_id)')
+
+
+def _migrate_table_versions(conn):
+    # v6: a counter per table bumped by every change to it, so a process can tell
+    # whether plans or cards changed without reloading them
+    conn.execute('''
+        CREATE TABLE table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for table in ("plans", "credentials"):
+        conn.execute('INSERT INTO table_versions (name) VALUES (?)', (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f'''
+                CREATE TRIGGER {table}_{event.lower()}_version AFTER {event} ON {table} BEGIN
+                    UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+                END
+            ''')
+
+
+# Schema migrations, applied in order; PRAGMA user_version records how many ran
+MIGRATIONS = [
+    _migrate_end_ord,
+    _migrate_access_latency,
+    _migrate_changelog,
+    _migrate_plans,
+    _migrate_credentials,
+    _migrate_table_versions,
+]
+
+
+class WriteQueue:
+    """One writer thread for a DatabaseManager, committing queued writes in groups.
+
+    submit(func, *args) queues func(conn, *args) and returns a Future for its
+    result. The writer takes every write queued up while it was busy (at most
+    MAX_BATCH, collected for at most WINDOW seconds), runs them in one
+    transaction, each in its own savepoint so a failing call is rolled back
+    alone, and completes all of their futures with a single commit. Groups
+    grow with the load on their own: a lone write is committed straight away,
+    and writers in this process never compete for the SQLite write lock.
+    """
+    MAX_BATCH = 500
+    WINDOW = 0.002
+
+    def __init__(self, db, window=WINDOW, max_batch=MAX_BATCH):
+        self.db = db
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        if threading.current_thread() is self.thread:
+            # Called from inside a queued write: already in the writer's transaction
+            try:
+                future.set_result(func(self.db._conn(), *args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self.queue.put((future, func, args, kwargs))
+        return future
+
+    def stop(self):
+        """Commits everything queued so far and ends the writer thread."""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _collect(self, first):
+        # The first write plus those queued behind it, for at most one window; (batch, stop requested)
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch and time.monotonic() < deadline:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = self.db._conn()
+        stopping = False
+        while not stopping:
+            first = self.queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect(first)
+            self._commit(conn, batch)
+        self.db.close_thread_connection()
+
+    def _commit(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # A lone write needs no savepoint: on failure the whole transaction is its own
+            isolate = len(batch) > 1
+            for future, func, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    outcomes.append(None)
+                    continue
+                if isolate:
+                    conn.execute('SAVEPOINT queued_write')
+                try:
+                    outcomes.append((True, func(conn, *args, **kwargs)))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO queued_write' if isolate else 'ROLLBACK')
+                    outcomes.append((False, e))
+                if isolate:
+                    conn.execute('RELEASE queued_write')
+            if conn.in_transaction:
+                conn.commit()
+        except sqlite3.Error as e:
+            # The group as a whole failed (locked by another process, disk full...)
+            logging.error(f"Failed to commit {len(batch)} queued writes: {e}")
+            if conn.in_transaction:
+                conn.rollback()
+            # Including those not started yet (e.g. BEGIN IMMEDIATE itself failed)
+            for future, *_ in batch:
+                if future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+        for (future, *_), outcome in zip(batch, outcomes):
+            if outcome is None:
+                continue
+            ok, value = outcome
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
 
 class DatabaseManager:
+    # Connection tuning applied to every connection we open.
+    # WAL lets the Tk thread read while another thread writes, NORMAL sync is
+    # safe under WAL and avoids an fsync per commit.
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-16000",     # ~16 MB page cache
+        "PRAGMA mmap_size=134217728",   # 128 MB memory-mapped I/O
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA foreign_keys=ON",
+    )
+    MEMBER_COLUMNS = ("id", "name", "age", "address", "phone", "registration_date",
+                      "membership_end_date", "is_frozen", "frozen_date")
+    # Searches with more matches than this are listed in index order instead of by relevance
+    RANK_LIMIT = 1000
+
     def __init__(self, db_name="gym.db"):
         self.db_name = db_name
+        # One persistent connection per thread (Tk thread, serial thread, workers).
+        self._local = threading.local()
+        self._connections = []
+        self._conn_lock = threading.Lock()
+        # Access-decision cache: id -> (name, expiry ordinal, is_frozen, plan_id).
+        # None until warmed; kept correct by write-through on every mutation.
+        self._access_cache = None
+        self._cache_lock = threading.Lock()
+        # With use_snapshot(): a memory-mapped snapshot under the cache, which then
+        # only holds members changed since the snapshot (None for deleted ones)
+        self._snapshot = None
+        # The snapshot replaced by the last rebuild, closed at the next one
+        self._retired_snapshot = None
+        self._snapshot_path = None
+        self._cache_seq = 0
+        # Compiled plan rules (see plans.py), rebuilt only after plans change;
+        # granted visits per member for plans with a quota: id -> (period start, count)
+        self._access_plans = None
+        self._visit_counts = {}
+        self._visits_lock = threading.Lock()
+        # Card UID -> (member id, is_revoked), loaded on first scan and
+        # written through like the access cache
+        self._credentials = None
+        self._credentials_lock = threading.Lock()
+        # table_versions as of the last warm-up or refresh
+        self._table_versions = {}
+        self._seen_data_version = None
+        # Replication identity and clock (see _next_version)
+        self.node_id = None
+        self._last_version = None
+        self._version_lock = threading.Lock()
+        self.fts_enabled = False
+        # Single writer with group commit, started on the first write (see WriteQueue)
+        self._writer = None
+        self._writer_lock = threading.Lock()
         self.init_db()
 
     def connect(self):
+        """Opens a new, independently owned connection (caller must close it)."""
         try:
-            return sqlite3.connect(self.db_name)
+            conn = sqlite3.connect(self.db_name, timeout=10, check_same_thread=False)
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            return conn
         except sqlite3.Error as e:
             logging.error(f"Failed to connect to database: {e}")
             raise
-    
+
+    def _conn(self):
+        """Returns the persistent connection owned by the calling thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._conn_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close_thread_connection(self):
+        """Closes the calling thread's persistent connection (for worker threads that exit)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._conn_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
     def close(self):
-        # Helper for tests or explicit cleanup if needed, 
-        # though we currently close connection per method.
-        pass
+        """Commits queued writes, then closes every persistent connection opened by this manager."""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer:
+            writer.stop()
+        with self._cache_lock:
+            members, self._snapshot = self._snapshot, None
+            if members:
+                self._access_cache = None
+                members.close()
+            retired, self._retired_snapshot = self._retired_snapshot, None
+            if retired:
+                retired.close()
+        with self._conn_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logging.error(f"Error closing database connection: {e}")
+        # Threads still holding a closed handle will reconnect on next use
+        self._local = threading.local()
+
+    def execute(self, sql, params=()):
+        """Runs a query on the calling thread's connection and returns the cursor."""
+        return self._conn().execute(sql, params)
+
+    def submit_write(self, func, *args, **kwargs):
+        """Queues func(conn, *args, **kwargs) for the writer thread; returns a Future for its result.
+
+        func runs inside the writer's transaction (do not commit) and is
+        committed together with the other writes queued alongside it.
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = WriteQueue(self)
+            writer = self._writer
+        return writer.submit(func, *args, **kwargs)
+
+    def _write(self, func, *args, **kwargs):
+        # Blocking form of submit_write: returns once the write is committed
+        return self.submit_write(func, *args, **kwargs).result()
+
+    @contextmanager
+    def transaction(self):
+        """Yields the calling thread's connection inside a transaction (commit on success)."""
+        conn = self._conn()
+        with conn:
+            yield conn
+
+    @contextmanager
+    def cancel_when(self, is_cancelled):
+        """Aborts queries run by this thread inside the block once is_cancelled() is true.
+
+        The interrupted query raises sqlite3.OperationalError ("interrupted").
+        """
+        conn = self._conn()
+        conn.set_progress_handler(is_cancelled, 1000)
+        try:
+            yield
+        finally:
+            conn.set_progress_handler(None, 0)
 
     def init_db(self):
         try:
-            conn = self.connect()
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS members (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                age INTEGER,
-                address TEXT,
-                phone TEXT,
-                registration_date TEXT,
-                membership_end_date TEXT,
-                is_frozen INTEGER DEFAULT 0,
-                frozen_date TEXT
-            )
-        ''')
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS config (
-                    key TEXT PRIMARY KEY,
-                    value TEXT
+            conn = self._conn()
+            with conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS members (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    age INTEGER,
+                    address TEXT,
+                    phone TEXT,
+                    registration_date TEXT,
+                    membership_end_date TEXT,
+                    is_frozen INTEGER DEFAULT 0,
+                    frozen_date TEXT
                 )
             ''')
-            conn.commit()
-            conn.close()
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS config (
+                        key TEXT PRIMARY KEY,
+                        value TEXT
+                    )
+                ''')
+                # One row per scan; ts is local time 'YYYY-MM-DD HH:MM:SS'
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS access_events (
+                        id INTEGER PRIMARY KEY,
+                        member_id TEXT NOT NULL,
+                        ts TEXT NOT NULL,
+                        outcome TEXT NOT NULL,
+                        source TEXT NOT NULL,
+                        terminal TEXT
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_access_events_member_ts ON access_events (member_id, ts)')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_access_events_ts ON access_events (ts)')
+                analytics.create_tables(conn)
+            self.init_search_index(conn)
+            self.migrate(conn)
+            self.node_id = self.get_config("node_id")
         except Exception as e:
             logging.error(f"Error initializing database: {e}")
 
+    def migrate(self, conn):
+        """Brings an existing gym.db up to the current schema version."""
+        for version, migration in enumerate(MIGRATIONS, start=1):
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= version:
+                continue
+            # IMMEDIATE takes the write lock, so only one process runs each step
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if conn.execute('PRAGMA user_version').fetchone()[0] < version:
+                    migration(conn)
+                    conn.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            logging.info(f"Database migrated to schema version {version}")
+
+    def init_search_index(self, conn):
+        """Creates the FTS5 index over members(id, name) and the triggers that keep it in sync.
+
+        Tokens are case-folded and stripped of accents, so "jose" finds "José".
+        Falls back to LIKE scans when SQLite was built without FTS5.
+        """
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'members_fts'").fetchone()
+        try:
+            with conn:
+                conn.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS members_fts USING fts5(
+                        id, name,
+                        content='members', content_rowid='rowid',
+                        tokenize='unicode61 remove_diacritics 2',
+                        prefix='1 2 3'
+                    )
+                ''')
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS members_fts_insert AFTER INSERT ON members BEGIN
+                        INSERT INTO members_fts(rowid, id, name) VALUES (new.rowid, new.id, new.name);
+                    END
+                ''')
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS members_fts_delete AFTER DELETE ON members BEGIN
+                        INSERT INTO members_fts(members_fts, rowid, id, name) VALUES ('delete', old.rowid, old.id, old.name);
+                    END
+                ''')
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS members_fts_update AFTER UPDATE OF id, name ON members BEGIN
+                        INSERT INTO members_fts(members_fts, rowid, id, name) VALUES ('delete', old.rowid, old.id, old.name);
+                        INSERT INTO members_fts(rowid, id, name) VALUES (new.rowid, new.id, new.name);
+                    END
+                ''')
+                if not exists:
+                    # Existing databases: index the members that are already there
+                    conn.execute("INSERT INTO members_fts(members_fts) VALUES ('rebuild')")
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            logging.warning(f"Full-text search unavailable, using LIKE search: {e}")
+
+    @staticmethod
+    def _fts_query(query):
+        # Every word must match as a prefix: "jo pe" -> "jo"* "pe"*
+        words = re.findall(r"\w+", query)
+        return " ".join(f'"{w}"*' for w in words)
+
+    # Rebuild the snapshot file once this many members changed since it was written
+    SNAPSHOT_REBUILD_MIN = 1000
+    SNAPSHOT_REBUILD_FRACTION = 0.05
+
+    def use_snapshot(self, path):
+        """Serves get_access_info() from the memory-mapped snapshot at path.
+
+        The file is opened if it matches this database and (re)built
+        otherwise; members changed since it was written are read from the
+        changelog into the in-memory cache. Several processes can share one
+        file.
+        """
+        self._snapshot_path = path
+        self._access_cache = None
+        self.warm_access_cache()
+
+    def _open_snapshot(self, rebuild=False):
+        # Sets _snapshot and an empty overlay; call with _cache_lock held
+        path = self._snapshot_path
+        current = None
+        if not rebuild:
+            try:
+                current = snapshot.MemberSnapshot(path)
+                last_seq = self._conn().execute('SELECT COALESCE(MAX(seq), 0) FROM changelog').fetchone()[0]
+                if current.node_id != (self.node_id or "") or current.seq > last_seq:
+                    logging.warning(f"Member snapshot {path} belongs to another database, rebuilding")
+                    current.close()
+                    current = None
+            except snapshot.SnapshotError as e:
+                if os.path.exists(path):
+                    logging.warning(f"{e}, rebuilding")
+        if current is None:
+            conn = self.connect()
+            try:
+                snapshot.build(conn, path, self.node_id)
+            finally:
+                conn.close()
+            current = snapshot.MemberSnapshot(path)
+        # Readers take the overlay first and the snapshot second (get_access_info):
+        # swap the snapshot first so they never pair a new overlay with an old file.
+        # A replaced snapshot stays open for readers still using it until the next swap.
+        if self._snapshot is not None:
+            if self._retired_snapshot is not None:
+                self._retired_snapshot.close()
+            self._retired_snapshot = self._snapshot
+        self._snapshot = current
+        self._access_cache = {}
+        self._cache_seq = current.seq
+
+    def _catch_up(self):
+        # Re-reads every member changed since the last catch-up (into the overlay
+        # with a snapshot); call with _cache_lock held
+        cache = self._access_cache
+        cursor = self._conn().execute('''
+            SELECT c.seq, c.key, m.name, m.end_ord, m.is_frozen, m.plan_id
+            FROM changelog c LEFT JOIN members m ON m.id = c.key
+            WHERE c.seq > ? AND +c.entity = 'member' ORDER BY c.seq  -- a seq range, not the entity index
+        ''', (self._cache_seq,))
+        for seq, mid, name, end_ord, is_frozen, plan_id in cursor:
+            if name is not None:
+                cache[mid] = (name, end_ord, bool(is_frozen), plan_id)
+            elif self._snapshot is not None:
+                cache[mid] = None  # hides the snapshot's entry
+            else:
+                cache.pop(mid, None)
+            self._cache_seq = seq
+
+    def warm_access_cache(self):
+        """Loads the access-relevant columns of every member into memory, and the cards.
+
+        With use_snapshot(), only members changed since the last call are
+        read (and the snapshot is rebuilt once too many have changed). Plans
+        are recompiled and visits recounted on next use. To pick up changes
+        made by other processes, refresh_access_cache() is enough.
+        """
+        self._table_versions = dict(self._conn().execute('SELECT name, version FROM table_versions'))
+        self._access_plans = None
+        with self._visits_lock:
+            self._visit_counts = {}
+        self._load_credentials()
+        self._warm_members()
+
+    def _warm_members(self):
+        # With a snapshot: catch up (rebuilding it if too much changed); without: load every member
+        if self._snapshot_path:
+            with self._cache_lock:
+                try:
+                    if self._snapshot is None:
+                        self._open_snapshot()
+                    self._catch_up()
+                    limit = max(self.SNAPSHOT_REBUILD_MIN, self.SNAPSHOT_REBUILD_FRACTION * len(self._snapshot))
+                    if len(self._access_cache) > limit:
+                        self._open_snapshot(rebuild=True)
+                        self._catch_up()
+                except (OSError, snapshot.SnapshotError) as e:
+                    # e.g. the file is mapped by another process on Windows
+                    logging.error(f"Member snapshot {self._snapshot_path} unusable: {e}")
+                    if self._snapshot is not None:
+                        self._catch_up()
+            if self._snapshot is not None:
+                logging.info(f"Access cache: snapshot of {len(self._snapshot)} members, "
+                             f"{len(self._access_cache)} changed since")
+                return
+            self._snapshot_path = None
+        with self._cache_lock:
+            # Changes committed while the rows are read are applied again by the next catch-up
+            self._cache_seq = self._conn().execute('SELECT COALESCE(MAX(seq), 0) FROM changelog').fetchone()[0]
+            cursor = self._conn().execute('SELECT id, name, end_ord, is_frozen, plan_id FROM members')
+            self._access_cache = {
+                mid: (name, end_ord, bool(is_frozen), plan_id)
+                for mid, name, end_ord, is_frozen, plan_id in cursor
+            }
+        logging.info(f"Access cache warmed with {len(self._access_cache)} members")
+
+    def get_access_info(self, user_id):
+        """Returns (name, expiry_ordinal, is_frozen, plan_id) for user_id, or None if unknown.
+
+        Served from memory; the cache is warmed on first use if needed.
+        """
+        cache = self._access_cache
+        if cache is None:
+            self.warm_access_cache()
+            cache = self._access_cache
+        members = self._snapshot
+        if members is None:
+            return cache.get(user_id)
+        info = cache.get(user_id, cache)
+        return members.get(user_id) if info is cache else info
+
+    def refresh_access_cache(self):
+        """Applies what other processes changed since the last warm-up or refresh.
+
+        Members are caught up from the changelog (only those changed are
+        read), plans and cards are reloaded only if their tables changed
+        (see table_versions), and visit counts are kept. Cheap when the
+        changes were this process's own, already written through.
+        """
+        if self._access_cache is None:
+            return
+        if self._snapshot_path:
+            self._warm_members()
+        else:
+            with self._cache_lock:
+                self._catch_up()
+        versions = dict(self._conn().execute('SELECT name, version FROM table_versions'))
+        if versions.get("plans") != self._table_versions.get("plans"):
+            self._access_plans = None
+        if versions.get("credentials") != self._table_versions.get("credentials"):
+            self._load_credentials()
+        self._table_versions = versions
+
+    def data_changed(self):
+        """True if another connection has committed since the previous call.
+
+        PRAGMA data_version moves for commits made through any other
+        connection, including this process's own writer thread, event writer
+        and worker pool, so a True result calls for refresh_access_cache(),
+        which only reads what actually changed. Call it from one thread
+        only: each connection has its own counter.
+        """
+        version = self._conn().execute('PRAGMA data_version').fetchone()[0]
+        seen, self._seen_data_version = self._seen_data_version, version
+        return seen is not None and seen != version
+
+    def _refresh_access_entry(self, user_id):
+        # Write-through: re-read a single row after it changed
+        if self._access_cache is None:
+            return
+        with self._cache_lock:
+            cursor = self._conn().execute('SELECT name, end_ord, is_frozen, plan_id FROM members WHERE id = ?', (user_id,))
+            row = cursor.fetchone()
+            if row:
+                name, end_ord, is_frozen, plan_id = row
+                self._access_cache[user_id] = (name, end_ord, bool(is_frozen), plan_id)
+            elif self._snapshot is not None:
+                self._access_cache[user_id] = None  # hides the snapshot's entry
+            else:
+                self._access_cache.pop(user_id, None)
+
     def get_config(self, key, default=None):
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute('SELECT value FROM config WHERE key = ?', (key,))
+        cursor = self._conn().execute('SELECT value FROM config WHERE key = ?', (key,))
         result = cursor.fetchone()
-        conn.close()
         return result[0] if result else default
 
     def set_config(self, key, value):
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute('INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)', (key, value))
-        conn.commit()
-        conn.close()
+        self._write(self._set_config, key, value)
+
+    def _set_config(self, conn, key, value):
+        conn.execute('INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)', (key, value))
+        if key not in LOCAL_CONFIG_KEYS:
+            conn.execute("INSERT OR REPLACE INTO changelog (entity, key, data, version, node) VALUES ('config', ?, ?, ?, ?)",
+                         (key, value, self._next_version(), self.node_id))
+
+    # --- replication ---
+
+    def _next_version(self):
+        # Hybrid clock: wall-clock ms, but never at or below a version already seen
+        with self._version_lock:
+            if self._last_version is None:
+                self._last_version = self._conn().execute('SELECT COALESCE(MAX(version), 0) FROM changelog').fetchone()[0]
+            self._last_version = max(_now_version(), self._last_version + 1)
+            return self._last_version
+
+    def _log_members(self, conn, ids):
+        # Records the current state of each member (NULL once deleted); call inside the mutation's transaction
+        conn.execute(f'''
+            INSERT OR REPLACE INTO changelog (entity, key, data, version, node)
+            SELECT 'member', j.value, CASE WHEN m.id IS NULL THEN NULL ELSE {MEMBER_JSON_SQL} END, ?, ?
+            FROM json_each(?) j LEFT JOIN members m ON m.id = j.value
+        ''', (self._next_version(), self.node_id, json.dumps(list(ids))))
+
+    def get_node_id(self):
+        return self.node_id
+
+    def changes_since(self, cursor=0, limit=1000, exclude_node=None):
+        """Returns (changes, next_cursor): up to limit changelog rows after cursor, oldest first.
+
+        Each change is (entity, key, data, version, node). Rows made by
+        exclude_node (the asking peer) are skipped, but the cursor still moves
+        past them. Served by the seq primary key, so the cost depends only on
+        how much changed since cursor.
+        """
+        rows = self._conn().execute(
+            'SELECT seq, entity, key, data, version, node FROM changelog WHERE seq > ? ORDER BY seq LIMIT ?',
+            (cursor, limit)).fetchall()
+        if not rows:
+            return [], cursor
+        return [row[1:] for row in rows if row[5] != exclude_node], rows[-1][0]
+
+    def apply_changes(self, changes):
+        """Applies changes from a peer, keeping the newest (version, node) for each key.
+
+        Winning changes are re-logged locally, so they propagate to further
+        peers. Returns the number of changes applied.
+        """
+        columns = ", ".join(self.MEMBER_COLUMNS)
+        upsert_member = (f"INSERT INTO members ({columns}) VALUES ({', '.join('?' * len(self.MEMBER_COLUMNS))}) "
+                         f"ON CONFLICT (id) DO UPDATE SET " +
+                         ", ".join(f"{c} = excluded.{c}" for c in self.MEMBER_COLUMNS[1:]))
+        applied, members, deleted = 0, [], []
+        conn = self._conn()
+        with conn:
+            for entity, key, data, version, node in changes:
+                local = conn.execute('SELECT version, node FROM changelog WHERE entity = ? AND key = ?',
+                                     (entity, key)).fetchone()
+                if local and tuple(local) >= (version, node):
+                    continue
+                if entity == "member":
+                    if data is None:
+                        conn.execute('DELETE FROM members WHERE id = ?', (key,))
+                        deleted.append(key)
+                    else:
+                        conn.execute(upsert_member, json.loads(data))
+                    members.append(key)
+                elif entity == "config":
+                    if key in LOCAL_CONFIG_KEYS:
+                        continue
+                    conn.execute('INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)', (key, data))
+                else:
+                    logging.warning(f"Ignoring change for unknown entity {entity}")
+                    continue
+                conn.execute('INSERT OR REPLACE INTO changelog (entity, key, data, version, node) VALUES (?, ?, ?, ?, ?)',
+                             (entity, key, data, version, node))
+                applied += 1
+                with self._version_lock:
+                    if self._last_version is not None:
+                        self._last_version = max(self._last_version, version)
+        for user_id in members:
+            self._refresh_access_entry(user_id)
+        # Their cards went with them (ON DELETE CASCADE), as in delete_member
+        for user_id in deleted:
+            self._forget_credentials(user_id)
+        return applied
+
+    def get_sync_cursors(self, peer):
+        """Returns (pulled, pushed): how far this node has synced with peer, as changelog seqs."""
+        row = self._conn().execute('SELECT pulled, pushed FROM sync_peers WHERE node = ?', (peer,)).fetchone()
+        return tuple(row) if row else (0, 0)
+
+    def set_sync_cursors(self, peer, pulled=None, pushed=None):
+        conn = self._conn()
+        with conn:
+            conn.execute('INSERT OR IGNORE INTO sync_peers (node) VALUES (?)', (peer,))
+            if pulled is not None:
+                conn.execute('UPDATE sync_peers SET pulled = ? WHERE node = ?', (pulled, peer))
+            if pushed is not None:
+                conn.execute('UPDATE sync_peers SET pushed = ? WHERE node = ?', (pushed, peer))
 
 
     def add_member(self, user_id, name, age, address, phone, registration_date=None, membership_end_date=None):
-        conn = self.connect()
-        cursor = conn.cursor()
-        
         # Default Logic
         if not registration_date:
             registration_date = datetime.now().strftime("%Y-%m-%d")
@@ -75,13 +832,15 @@ class DatabaseManager:
             # Default 30 days if not provided
             start_dt = datetime.strptime(registration_date, "%Y-%m-%d")
             membership_end_date = (start_dt + timedelta(days=30)).strftime("%Y-%m-%d")
+
+        # Scanned codes are tried as cards first: an ID equal to a card UID could never be used
+        card = self.resolve_credential(user_id)
+        if card:
+            raise ValueError(f"ID {user_id} is the UID of a card of member {card[0]}")
         
         try:
-            cursor.execute('''
-                INSERT INTO members (id, name, age, address, phone, registration_date, membership_end_date)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, name, age, address, phone, registration_date, membership_end_date))
-            conn.commit()
+            self._write(self._insert_member, (user_id, name, age, address, phone, registration_date, membership_end_date))
+            self._refresh_access_entry(user_id)
             logging.info(f"New member registered: {name} (ID: {user_id})")
             return True
         except sqlite3.IntegrityError:
@@ -90,56 +849,414 @@ class DatabaseManager:
         except Exception as e:
             logging.error(f"Error adding member {user_id}: {e}")
             return False
+
+    def _insert_member(self, conn, values):
+        conn.execute('''
+            INSERT INTO members (id, name, age, address, phone, registration_date, membership_end_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', values)
+        self._log_members(conn, [values[0]])
+
+    def bulk_add_members(self, rows):
+        """Inserts a batch of members in a single transaction.
+
+        rows: list of (line_no, values) with values in MEMBER_COLUMNS order.
+        Returns (imported_count, errors) where errors is a list of
+        (line_no, user_id, message) for the rows that were rejected.
+        """
+        conn = self._conn()
+        sql = f"INSERT INTO members ({', '.join(self.MEMBER_COLUMNS)}) VALUES ({', '.join('?' * len(self.MEMBER_COLUMNS))})"
+        errors = []
+        # IDs equal to a card UID are rejected like in add_member
+        if any(self.resolve_credential(str(values[0])) for _, values in rows):
+            accepted = []
+            for line_no, values in rows:
+                if self.resolve_credential(str(values[0])):
+                    errors.append((line_no, values[0], "ID usado por una tarjeta"))
+                else:
+                    accepted.append((line_no, values))
+            rows = accepted
+        try:
+            with conn:
+                conn.executemany(sql, [values for _, values in rows])
+                self._log_members(conn, [values[0] for _, values in rows])
+            inserted = rows
+        except sqlite3.IntegrityError:
+            # Some row in the batch clashes; redo it row by row to find which
+            inserted = []
+            with conn:
+                for line_no, values in rows:
+                    try:
+                        conn.execute(sql, values)
+                        inserted.append((line_no, values))
+                    except sqlite3.IntegrityError as e:
+                        reason = "ID duplicado" if "UNIQUE" in str(e) else str(e)
+                        errors.append((line_no, values[0], reason))
+                self._log_members(conn, [values[0] for _, values in inserted])
+
+        if self._access_cache is not None:
+            with self._cache_lock:
+                for _, values in inserted:
+                    self._access_cache[values[0]] = (values[1], date_to_ordinal(values[6]), bool(values[7]), None)
+        return len(inserted), errors
+
+    def iter_members(self, batch_size=1000):
+        """Yields every member row (MEMBER_COLUMNS order) without loading the table into memory."""
+        cursor = self.connect().execute(f"SELECT {', '.join(self.MEMBER_COLUMNS)} FROM members ORDER BY rowid")
+        try:
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from batch
         finally:
-            conn.close()
+            cursor.connection.close()
+
+    def get_members_after(self, after_id=None, limit=1000):
+        """Returns up to limit member rows (MEMBER_COLUMNS order) with id > after_id, by id (keyset paging)."""
+        cursor = self._conn().execute(
+            f"SELECT {', '.join(self.MEMBER_COLUMNS)} FROM members WHERE id > ? ORDER BY id LIMIT ?",
+            ("" if after_id is None else after_id, limit))
+        return cursor.fetchall()
+
+    def add_access_events(self, events):
+        """Inserts a batch of (member_id, ts, outcome, source, terminal, latency_ms) rows in one commit.
+
+        Granted entries were already counted against visit quotas by
+        count_visit() when they were decided.
+        """
+        self._write(self._insert_access_events, events)
+
+    def visits_used(self, user_id, since_ord):
+        """Granted entries of user_id from the day since_ord on (for plans with a visit quota).
+
+        Counted once from access_events, then kept in memory and updated by
+        count_visit() as entries are granted.
+        """
+        counted = self._visit_counts.get(user_id)
+        if counted and counted[0] == since_ord:
+            return counted[1]
+        with self._visits_lock:
+            count = self._conn().execute(
+                'SELECT COUNT(*) FROM access_events WHERE member_id = ? AND ts >= ? AND outcome = ?',
+                (user_id, date.fromordinal(since_ord).isoformat(), OUTCOME_GRANTED)).fetchone()[0]
+            self._visit_counts[user_id] = (since_ord, count)
+        return count
+
+    def count_visit(self, user_id, since_ord):
+        """Counts an entry just granted to user_id in the quota period starting on since_ord.
+
+        Done when the grant is decided, so the next scan sees it even before
+        its event is written.
+        """
+        with self._visits_lock:
+            counted = self._visit_counts.get(user_id)
+            if counted and counted[0] == since_ord:
+                self._visit_counts[user_id] = (since_ord, counted[1] + 1)
+
+    def _insert_access_events(self, conn, events):
+        conn.executemany('INSERT INTO access_events (member_id, ts, outcome, source, terminal, latency_ms) VALUES (?, ?, ?, ?, ?, ?)', events)
+        # Keep the attendance rollups current in the same commit
+        analytics.apply_events(conn, events)
+
+    def get_access_events(self, member_id=None, start=None, end=None, limit=100):
+        """Returns the newest access events, optionally for one member and/or a [start, end) ts range."""
+        clauses, params = [], []
+        if member_id is not None:
+            clauses.append('member_id = ?')
+            params.append(member_id)
+        if start is not None:
+            clauses.append('ts >= ?')
+            params.append(start)
+        if end is not None:
+            clauses.append('ts < ?')
+            params.append(end)
+        where = (' WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        cursor = self._conn().execute(
+            'SELECT member_id, ts, outcome, source, terminal, latency_ms FROM access_events' + where + ' ORDER BY ts DESC, id DESC LIMIT ?',
+            params + [limit])
+        return cursor.fetchall()
+
+    REPORTS = ("daily_visits", "peak_hours", "active_member_ratio", "churn")
+
+    def report(self, name, **kwargs):
+        """Runs one of the analytics REPORTS against this database."""
+        if name not in self.REPORTS:
+            raise ValueError(f"Unknown report: {name}")
+        return getattr(analytics, name)(self, **kwargs)
+
+    def rebuild_rollups(self):
+        return analytics.rebuild(self)
 
     def get_member(self, user_id):
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM members WHERE id = ?', (user_id,))
-        member = cursor.fetchone()
-        conn.close()
-        return member
+        cursor = self._conn().execute('SELECT * FROM members WHERE id = ?', (user_id,))
+        return cursor.fetchone()
 
     def get_all_members(self):
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name, membership_end_date, is_frozen FROM members')
-        members = cursor.fetchall()
-        conn.close()
-        return members
+        cursor = self._conn().execute('SELECT id, name, membership_end_date, is_frozen FROM members')
+        return cursor.fetchall()
+
+    def _status_clause(self, status, expiring_days=7):
+        # Returns (condition, params) for a membership status; served by idx_members_status
+        today = date.today().toordinal()
+        if status == STATUS_FROZEN:
+            return "members.is_frozen = 1", ()
+        if status == STATUS_ACTIVE:
+            return "members.is_frozen = 0 AND members.end_ord > ?", (today,)
+        if status == STATUS_EXPIRED:
+            return "members.is_frozen = 0 AND members.end_ord <= ?", (today,)
+        if status == STATUS_EXPIRING:
+            return "members.is_frozen = 0 AND members.end_ord > ? AND members.end_ord <= ?", (today, today + expiring_days)
+        raise ValueError(f"Unknown membership status: {status}")
+
+    def _member_filter(self, query, ranked=False, status=None):
+        # Returns (FROM/WHERE clause, params, ORDER BY) shared by the list queries
+        where, params, order = "FROM members", (), "members.rowid"
+        if query:
+            match = self._fts_query(query) if self.fts_enabled else ""
+            if match:
+                where = "FROM members_fts JOIN members ON members.rowid = members_fts.rowid WHERE members_fts MATCH ?"
+                params = (match,)
+                order = "members_fts.rank" if ranked else "members_fts.rowid"
+            else:
+                like = '%' + query + '%'
+                where, params = "FROM members WHERE (members.name LIKE ? OR members.id LIKE ?)", (like, like)
+        if status:
+            condition, status_params = self._status_clause(status)
+            where += (" AND " if " WHERE " in where else " WHERE ") + condition
+            params += status_params
+        return where, params, order
+
+    def _rank_results(self, query, status=None):
+        # bm25 ranking scores every match; only worth it for selective queries
+        return bool(query) and self.count_members(query, status) <= self.RANK_LIMIT
+
+    def count_members(self, query=None, status=None):
+        where, params, _ = self._member_filter(query, status=status)
+        if where.startswith("FROM members_fts") and not status:
+            # Count straight from the index, without touching member rows
+            where = "FROM members_fts WHERE members_fts MATCH ?"
+        return self._conn().execute('SELECT COUNT(*) ' + where, params).fetchone()[0]
+
+    def count_by_status(self, expiring_days=7):
+        """Returns {status: member count} for every membership status, using index range counts."""
+        conn = self._conn()
+        counts = {}
+        for status in (STATUS_ACTIVE, STATUS_EXPIRING, STATUS_EXPIRED, STATUS_FROZEN):
+            condition, params = self._status_clause(status, expiring_days)
+            counts[status] = conn.execute('SELECT COUNT(*) FROM members WHERE ' + condition, params).fetchone()[0]
+        return counts
+
+    def get_members_page(self, offset, limit, query=None, status=None):
+        """Returns one page of (id, name, end_date, status) rows, best matches first when searching.
+
+        status is one of the STATUS_* values, computed in SQL from is_frozen and end_ord.
+        """
+        where, params, order = self._member_filter(query, self._rank_results(query, status), status)
+        cursor = self._conn().execute(
+            'SELECT members.id, members.name, members.membership_end_date, ' + STATUS_SQL + ' ' + where +
+            ' ORDER BY ' + order + ' LIMIT ? OFFSET ?',
+            (date.today().toordinal(),) + params + (limit, offset))
+        return cursor.fetchall()
 
     def search_members(self, query):
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, membership_end_date, is_frozen FROM members WHERE name LIKE ? OR id LIKE ?", ('%' + query + '%', '%' + query + '%'))
-        members = cursor.fetchall()
-        conn.close()
-        return members
+        where, params, order = self._member_filter(query, self._rank_results(query))
+        cursor = self._conn().execute(
+            'SELECT members.id, members.name, members.membership_end_date, members.is_frozen ' + where +
+            ' ORDER BY ' + order, params)
+        return cursor.fetchall()
 
     def update_member(self, user_id, name, age, address, phone):
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute('''
+        self._write(self._update_member, user_id, name, age, address, phone)
+        self._refresh_access_entry(user_id)
+
+    def _update_member(self, conn, user_id, name, age, address, phone):
+        if conn.execute('''
             UPDATE members SET name=?, age=?, address=?, phone=? WHERE id=?
-        ''', (name, age, address, phone, user_id))
-        conn.commit()
-        conn.close()
+        ''', (name, age, address, phone, user_id)).rowcount:
+            self._log_members(conn, [user_id])
 
-    def set_membership_expiry(self, user_id, new_date_str):
-        """Sets a specific expiration date and unfreezes if needed."""
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute('UPDATE members SET membership_end_date = ?, is_frozen = 0, frozen_date = NULL WHERE id = ?', 
-                       (new_date_str, user_id))
-        conn.commit()
-        conn.close()
+    def set_membership_expiry(self, user_id, new_date_str, plan_id=None):
+        """Sets a specific expiration date and unfreezes if needed; a renewal also passes the plan sold."""
+        self._write(self._set_membership_expiry, user_id, new_date_str, plan_id)
+        self._refresh_access_entry(user_id)
+
+    def _set_membership_expiry(self, conn, user_id, new_date_str, plan_id=None):
+        if plan_id is None:
+            changed = conn.execute('UPDATE members SET membership_end_date = ?, is_frozen = 0, frozen_date = NULL WHERE id = ?',
+                                   (new_date_str, user_id)).rowcount
+        else:
+            changed = conn.execute('UPDATE members SET membership_end_date = ?, is_frozen = 0, frozen_date = NULL, plan_id = ? '
+                                   'WHERE id = ?', (new_date_str, plan_id, user_id)).rowcount
+        if changed:
+            self._log_members(conn, [user_id])
+
+    def set_member_plan(self, user_id, plan_id):
+        """Moves user_id to another plan (None: no plan restrictions) without touching the dates."""
+        self._write(self._set_member_plan, user_id, plan_id)
+        self._refresh_access_entry(user_id)
+
+    def _set_member_plan(self, conn, user_id, plan_id):
+        if conn.execute('UPDATE members SET plan_id = ? WHERE id = ?', (plan_id, user_id)).rowcount:
+            self._log_members(conn, [user_id])
+
+    # --- plans ---
+
+    def get_plans(self):
+        """Returns every plan as (id, name, months, days, rules JSON), in creation order."""
+        return self._conn().execute('SELECT id, name, months, days, rules FROM plans ORDER BY id').fetchall()
+
+    def access_plans(self):
+        """Returns {plan_id: plans.CompiledPlan}, compiled once and again only after plans change."""
+        compiled = self._access_plans
+        if compiled is None:
+            compiled = self._access_plans = plans.compile_plans(self.get_plans())
+        return compiled
+
+    def save_plan(self, name, months, days, rules, plan_id=None):
+        """Creates a plan (plan_id None) or updates one; returns its id.
+
+        Raises ValueError for rules plans.compile_plan cannot use, and
+        sqlite3.IntegrityError for a name already in use.
+        """
+        rules = json.dumps(plans.validate_rules(rules), ensure_ascii=False)
+        plan_id = self._write(self._save_plan, name, int(months), int(days), rules, plan_id)
+        self._access_plans = None
+        logging.info(f"Plan saved: {name} (ID: {plan_id})")
+        return plan_id
+
+    def _save_plan(self, conn, name, months, days, rules, plan_id):
+        if plan_id is None:
+            return conn.execute('INSERT INTO plans (name, months, days, rules) VALUES (?, ?, ?, ?)',
+                                (name, months, days, rules)).lastrowid
+        conn.execute('UPDATE plans SET name = ?, months = ?, days = ?, rules = ? WHERE id = ?',
+                     (name, months, days, rules, plan_id))
+        return plan_id
+
+    def delete_plan(self, plan_id):
+        """Deletes a plan; its members keep their dates and lose the plan's restrictions."""
+        members = self._write(self._delete_plan, plan_id)
+        self._access_plans = None
+        for user_id in members:
+            self._refresh_access_entry(user_id)
+
+    def _delete_plan(self, conn, plan_id):
+        members = [row[0] for row in conn.execute('SELECT id FROM members WHERE plan_id = ?', (plan_id,))]
+        conn.execute('UPDATE members SET plan_id = NULL WHERE plan_id = ?', (plan_id,))
+        conn.execute('DELETE FROM plans WHERE id = ?', (plan_id,))
+        self._log_members(conn, members)
+        return members
+
+    # --- credentials ---
+
+    def resolve_credential(self, code):
+        """Returns (member_id, is_revoked) for the card with UID code, or None if code is no card.
+
+        Served from memory; all cards are loaded with the access cache, or on first use.
+        """
+        credentials = self._credentials
+        if credentials is None:
+            credentials = self._load_credentials()
+        return credentials.get(normalize_uid(code))
+
+    def _load_credentials(self):
+        # Under the lock, so no write-through lands in a dict about to be replaced
+        with self._credentials_lock:
+            cursor = self._conn().execute('SELECT uid, member_id, is_revoked FROM credentials')
+            credentials = self._credentials = {uid: (mid, bool(is_revoked)) for uid, mid, is_revoked in cursor}
+        logging.info(f"Loaded {len(credentials)} cards")
+        return credentials
+
+    def get_credentials(self, member_id):
+        """Returns member_id's cards as (uid, label, is_revoked, assigned_date, revoked_date), newest first."""
+        return self._conn().execute('''
+            SELECT uid, label, is_revoked, assigned_date, revoked_date FROM credentials
+            WHERE member_id = ? ORDER BY assigned_date DESC, uid
+        ''', (member_id,)).fetchall()
+
+    def assign_credential(self, uid, member_id, label=""):
+        """Gives the card uid to member_id as active; a known card is moved and reactivated.
+
+        Returns False if member_id does not exist. Raises ValueError for a
+        UID that is another member's ID, as that member could no longer get
+        in with it. Takes effect at the next scan, without reloading the
+        other cards.
+        """
+        uid = normalize_uid(uid)
+        if not uid:
+            raise ValueError("Empty card UID")
+        # Member IDs normalized like the UID (normalize_uid); a table scan, but cards are assigned by hand
+        owner = self._conn().execute('SELECT id FROM members WHERE upper(trim(id)) = ? AND id != ?',
+                                     (uid, member_id)).fetchone()
+        if owner:
+            raise ValueError(f"Card UID {uid} is the ID of member {owner[0]}")
+        try:
+            self._write(self._assign_credential, uid, member_id, label.strip())
+        except sqlite3.IntegrityError:
+            logging.warning(f"Failed to assign card {uid}, no member with ID: {member_id}")
+            return False
+        self._refresh_credential(uid)
+        logging.info(f"Card {uid} assigned to member {member_id}")
+        return True
+
+    def _assign_credential(self, conn, uid, member_id, label):
+        conn.execute('''
+            INSERT INTO credentials (uid, member_id, label, assigned_date) VALUES (?, ?, ?, ?)
+            ON CONFLICT (uid) DO UPDATE SET member_id = excluded.member_id, label = excluded.label,
+                is_revoked = 0, assigned_date = excluded.assigned_date, revoked_date = NULL
+        ''', (uid, member_id, label, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+    def revoke_credential(self, uid):
+        """Marks a lost or returned card as revoked; scanning it is denied from then on.
+
+        Returns False for an unknown (or already revoked) UID.
+        """
+        uid = normalize_uid(uid)
+        revoked = self._write(self._revoke_credential, uid)
+        self._refresh_credential(uid)
+        if revoked:
+            logging.info(f"Card {uid} revoked")
+        return revoked
+
+    def _revoke_credential(self, conn, uid):
+        return conn.execute('UPDATE credentials SET is_revoked = 1, revoked_date = ? WHERE uid = ? AND is_revoked = 0',
+                            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), uid)).rowcount > 0
+
+    def delete_credential(self, uid):
+        """Forgets a card altogether (e.g. a UID typed by mistake); its code is then read as a member ID."""
+        uid = normalize_uid(uid)
+        self._write(self._delete_credential, uid)
+        self._refresh_credential(uid)
+
+    def _delete_credential(self, conn, uid):
+        conn.execute('DELETE FROM credentials WHERE uid = ?', (uid,))
+
+    def _refresh_credential(self, uid):
+        # Write-through: re-read a single card after it changed
+        if self._credentials is None:
+            return
+        with self._credentials_lock:
+            row = self._conn().execute('SELECT member_id, is_revoked FROM credentials WHERE uid = ?', (uid,)).fetchone()
+            if row:
+                self._credentials[uid] = (row[0], bool(row[1]))
+            else:
+                self._credentials.pop(uid, None)
+
+    def _forget_credentials(self, member_id):
+        # After a member is deleted; a full pass, but deleting members is rare
+        if self._credentials is None:
+            return
+        with self._credentials_lock:
+            for uid in [uid for uid, (mid, _) in self._credentials.items() if mid == member_id]:
+                del self._credentials[uid]
 
 
     def toggle_freeze(self, user_id):
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute('SELECT is_frozen, frozen_date, membership_end_date FROM members WHERE id = ?', (user_id,))
+        self._write(self._toggle_freeze, user_id)
+        self._refresh_access_entry(user_id)
+
+    def _toggle_freeze(self, conn, user_id):
+        cursor = conn.execute('SELECT is_frozen, frozen_date, membership_end_date FROM members WHERE id = ?', (user_id,))
         record = cursor.fetchone()
         
         if record:
@@ -157,19 +1274,85 @@ class DatabaseManager:
                     end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
                     new_end_date = end_date + delta
                     
-                    cursor.execute('UPDATE members SET is_frozen=0, frozen_date=NULL, membership_end_date=? WHERE id=?', 
-                                   (new_end_date.strftime("%Y-%m-%d"), user_id))
+                    conn.execute('UPDATE members SET is_frozen=0, frozen_date=NULL, membership_end_date=? WHERE id=?', 
+                                 (new_end_date.strftime("%Y-%m-%d"), user_id))
             else:
                 # Freeze
-                cursor.execute('UPDATE members SET is_frozen=1, frozen_date=? WHERE id=?', 
-                               (datetime.now().strftime("%Y-%m-%d"), user_id))
-            
-            conn.commit()
-        conn.close()
+                conn.execute('UPDATE members SET is_frozen=1, frozen_date=? WHERE id=?', 
+                             (datetime.now().strftime("%Y-%m-%d"), user_id))
+            self._log_members(conn, [user_id])
+
+    def _target_clause(self, ids=None, status=None):
+        # Members selected by a bulk operation: an explicit id list and/or a status
+        clauses, params = [], ()
+        if ids is not None:
+            clauses.append("members.id IN (SELECT value FROM json_each(?))")
+            params += (json.dumps([str(i) for i in ids]),)
+        if status:
+            condition, status_params = self._status_clause(status)
+            clauses.append(condition)
+            params += status_params
+        return " AND ".join(clauses) or "1", params
+
+    def _bulk_update(self, set_sql, set_params, condition, ids, status, dry_run):
+        # One UPDATE over every targeted row, in a single transaction
+        target, params = self._target_clause(ids, status)
+        where = f"{condition} AND {target}" if condition else target
+        conn = self._conn()
+        if dry_run:
+            return conn.execute('SELECT COUNT(*) FROM members WHERE ' + where, params).fetchone()[0]
+        with conn:
+            changed = [row[0] for row in conn.execute(f'UPDATE members SET {set_sql} WHERE {where} RETURNING id',
+                                                      set_params + params)]
+            self._log_members(conn, changed)
+        count = len(changed)
+        self.refresh_access_cache()
+        logging.info(f"Bulk update ({set_sql.split('=')[0].strip()}...) applied to {count} members")
+        return count
+
+    def bulk_extend(self, delta, ids=None, status=None, dry_run=False):
+        """Extends memberships by delta (timedelta/relativedelta), counting from today if already expired.
+
+        Frozen members stay frozen. Returns the number of members changed
+        (or that would change, with dry_run).
+        """
+        today = date.today()
+
+        def extend(end_date_str):
+            try:
+                base = max(date.fromisoformat(end_date_str), today)
+            except (TypeError, ValueError):
+                base = today
+            return (base + delta).isoformat()
+
+        self._conn().create_function("gym_extend", 1, extend, deterministic=True)
+        return self._bulk_update("membership_end_date = gym_extend(membership_end_date)", (),
+                                 None, ids, status, dry_run)
+
+    def bulk_freeze(self, ids=None, status=None, dry_run=False):
+        """Freezes every targeted member that is not frozen yet."""
+        return self._bulk_update("is_frozen = 1, frozen_date = ?", (date.today().isoformat(),),
+                                 "members.is_frozen = 0", ids, status, dry_run)
+
+    def bulk_unfreeze(self, ids=None, status=None, dry_run=False):
+        """Unfreezes targeted members, pushing expiry forward by the days they spent frozen."""
+        return self._bulk_update(
+            """membership_end_date = CASE WHEN frozen_date IS NULL THEN membership_end_date
+                   ELSE date(membership_end_date, printf('%+d days', CAST(julianday(?) - julianday(frozen_date) AS INTEGER))) END,
+               is_frozen = 0, frozen_date = NULL""",
+            (date.today().isoformat(),), "members.is_frozen = 1", ids, status, dry_run)
+
+    def bulk_set_expiry(self, new_date_str, ids=None, status=None, dry_run=False):
+        """Sets a fixed expiration date (and unfreezes), like set_membership_expiry for many members."""
+        return self._bulk_update("membership_end_date = ?, is_frozen = 0, frozen_date = NULL", (new_date_str,),
+                                 None, ids, status, dry_run)
 
     def delete_member(self, user_id):
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM members WHERE id = ?', (user_id,))
-        conn.commit()
-        conn.close()
+        # The member's cards go with it (ON DELETE CASCADE)
+        self._write(self._delete_member, user_id)
+        self._refresh_access_entry(user_id)
+        self._forget_credentials(user_id)
+
+    def _delete_member(self, conn, user_id):
+        if conn.execute('DELETE FROM members WHERE id = ?', (user_id,)).rowcount:
+            self._log_members(conn, [user_id])
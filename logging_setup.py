@@ -0,0 +1,124 @@
+"""Queue-based logging: callers only enqueue records, one thread writes them.
+
+Log files rotate by size (default) or daily, and rotated files are gzipped
+by the writer thread, so neither the Tk thread nor the serial hub ever waits
+for the disk and disk usage stays bounded at about
+max_bytes * (1 + backups / compression ratio).
+
+Access events can also be written as JSON lines (one object per event) to a
+separate, equally rotated file; AccessEventWriter emits them from its own
+thread through the "gymbase.access" logger.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(module)s - %(message)s'
+LOG_DATEFMT = '%Y-%m-%d %H:%M:%S'
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+ROTATE_SIZE = "size"
+ROTATE_DAILY = "daily"
+
+# Structured access records; silent unless setup_logging(access_json=...) attached a handler
+ACCESS_LOG = logging.getLogger("gymbase.access")
+ACCESS_LOG.propagate = False
+
+_listener = None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    # The stock prepare() formats the message on the calling thread; records
+    # stay in this process, so hand them over as they are and let the writer
+    # thread do all the formatting
+    def prepare(self, record):
+        return record
+
+
+class _JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.access, ensure_ascii=False)
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _file_handler(filename, rotate, max_bytes, backups):
+    if rotate == ROTATE_DAILY:
+        handler = TimedRotatingFileHandler(filename, when="midnight", backupCount=backups, encoding="utf-8")
+    else:
+        handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+def setup_logging(filename, level=logging.INFO, rotate=ROTATE_SIZE, max_bytes=LOG_MAX_BYTES,
+                  backups=LOG_BACKUPS, access_json=None):
+    """Routes the root logger (and the access log, if access_json is a path)
+    through a queue to a background writer. Safe to call again: the previous
+    pipeline is flushed and replaced."""
+    global _listener
+    stop_logging()
+
+    file_handler = _file_handler(filename, rotate, max_bytes, backups)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATEFMT))
+    handlers = [file_handler]
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+
+    for handler in ACCESS_LOG.handlers[:]:
+        ACCESS_LOG.removeHandler(handler)
+    if access_json:
+        json_handler = _file_handler(access_json, rotate, max_bytes, backups)
+        json_handler.setFormatter(_JsonLinesFormatter())
+        json_handler.addFilter(lambda record: record.name == ACCESS_LOG.name)
+        # The root file only takes records that did not come from the access log
+        file_handler.addFilter(lambda record: record.name != ACCESS_LOG.name)
+        handlers.append(json_handler)
+        ACCESS_LOG.addHandler(_DeferredQueueHandler(log_queue))
+        ACCESS_LOG.setLevel(logging.INFO)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Writes out queued records and closes the log files."""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+atexit.register(stop_logging)
+
+
+def log_access_event(member_id, ts, outcome, source, terminal, latency_ms):
+    if ACCESS_LOG.handlers:
+        ACCESS_LOG.info("access", extra={"access": {
+            "ts": ts, "member_id": member_id, "outcome": outcome, "source": source,
+            "terminal": terminal, "latency_ms": latency_ms,
+        }})
@@ -1,37 +1,60 @@
+import time
+STARTED = time.perf_counter()  # startup report baseline, taken before the heavy imports
+
+import argparse
 import logging
 import os
+import socket
 import customtkinter as ctk
 from database import DatabaseManager
+from async_db import AsyncDatabase
 from views import AccessFrame, RegisterFrame, MembersFrame, AdminFrame
-from serial_manager import SerialManager
-
-# Configure Logging
-logging.basicConfig(
-    filename='gymbase.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(module)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+from serial_manager import SerialHub, load_port_config
+from access_log import AccessEventWriter, OUTCOME_GRANTED
+from metrics import ScanTimer
+from logging_setup import setup_logging, stop_logging, ROTATE_SIZE, ROTATE_DAILY
 
 ctk.set_appearance_mode("Light")
 ctk.set_default_color_theme("blue")
 
 class GymApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, remote=None, startup=None, print_startup=False):
+        # startup: ScanTimer running since process start, for the startup report
+        self.startup = startup or ScanTimer("startup")
+        self.print_startup = print_startup
         super().__init__()
+        self.startup.mark("tk")
         logging.info("Starting GymBase Application")
         
-        # Initialize DB
-        self.db = DatabaseManager()
-        
-        # Initialize Serial
-        port = self.db.get_config("serial_port", "")
-        baud = int(self.db.get_config("serial_baud", "9600"))
-        self.serial_mgr = SerialManager(port, baud, self.on_serial_data)
+        # Initialize DB: the local gym.db, or a shared one served by remote.py
+        if remote:
+            from remote import RemoteDatabase
+            self.db = RemoteDatabase(remote)
+        else:
+            self.db = DatabaseManager()
+        self.db.warm_access_cache()
+        self.terminal_name = self.db.get_config("terminal_name", socket.gethostname())
+        # Screens query through this pool so the main loop never waits on the database
+        self.adb = AsyncDatabase(self.db)
+        self.startup.mark("database")
+        
+        # Offline-first replication with another terminal's server, if configured;
+        # started once the access screen is up (see report_startup)
+        self.remote = remote
+        self.sync_worker = None
+        
+        # Access events are written in the background with group commits
+        self.event_writer = AccessEventWriter(self.db)
+        self.event_writer.start()
+        
+        # Initialize Serial: one hub thread serves every configured reader
+        self.serial_hub = SerialHub(self.on_serial_data)
+        self.serial_hub.configure(load_port_config(self.db))
         
         # Try connect on start if configured
-        if port:
-            self.serial_mgr.start()
+        if self.serial_hub.ports:
+            self.serial_hub.start()
+        self.startup.mark("serial")
 
         # Configure window
         gym_name = self.db.get_config("gym_name", "GymBase")
@@ -43,33 +66,86 @@ class GymApp(ctk.CTk):
         self.grid_rowconfigure(0, weight=1)
         
         self.create_sidebar()
-        self.create_frames()
         self.create_footer()
         
-        # Start at Home
+        # Start at Home; the other screens are built the first time they are opened
+        self.frames = {}
         self.select_frame("access")
+        self.startup.mark("access_screen")
+        
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after_idle(self.report_startup)
+
+    def report_startup(self):
+        # Runs once the main loop is idle, i.e. the access screen has been drawn
+        self.startup.mark("first_draw")
+        total = 1000 * (self.startup.last - self.startup.started)
+        report = f"Startup: ready in {total:.0f} ms ({self.startup.breakdown()})"
+        logging.info(report)
+        if self.print_startup:
+            print(report)
+        self.reload_config()
+
+    def on_close(self):
+        logging.info("Closing GymBase Application")
+        self.serial_hub.stop()
+        if self.sync_worker:
+            self.sync_worker.stop()
+        self.event_writer.stop()
+        self.adb.shutdown()
+        self.db.close()
+        self.destroy()
+        stop_logging()
 
-    def on_serial_data(self, code):
-        # This runs in thread, schedule update on main thread
+    def on_serial_data(self, code, port, received_at):
+        # This runs in the hub thread, schedule update on main thread
         # We want to put this code into entry_id of AccessFrame and trigger check
-        self.after(0, lambda: self.handle_serial_code(code))
+        timer = ScanTimer(code, received_at)
+        timer.mark("serial")
+        self.after(0, lambda: self.handle_serial_code(code, port, received_at, timer))
 
-    def handle_serial_code(self, code):
-        print(f"Serial Code Received: {code}")
+    def handle_serial_code(self, code, port, received_at, timer=None):
+        if timer:
+            timer.mark("queue")
+        print(f"Serial Code Received: {code} ({port.terminal})")
         # Only if we are on access frame, or maybe always force access frame?
         # Let's force switch to access frame to show result
         self.select_frame("access")
         access_frame = self.frames["access"]
         access_frame.entry_id.delete(0, 'end')
         access_frame.entry_id.insert(0, code)
-        access_frame.check_access()
+        # Open (or keep closed) the turnstile the code came from
+        access_frame.check_access(source=port.port, terminal=port.terminal,
+                                  respond=lambda outcome: self.serial_hub.respond(port, outcome == OUTCOME_GRANTED, received_at),
+                                  timer=timer)
 
     def reload_config(self):
+        def load():
+            return (self.db.get_config("gym_name", "GymBase"),
+                    self.db.get_config("terminal_name", socket.gethostname()),
+                    None if self.remote else self.db.get_config("sync_peer"))
+        self.adb.then(self.adb.submit(load), self, lambda settings: self.apply_config(*settings))
+
+    def apply_config(self, gym_name, terminal_name, sync_peer):
         # Update Title
-        gym_name = self.db.get_config("gym_name", "GymBase")
         self.title(f"{gym_name} - Gestión")
         # Update Sidebar Title
         self.logo_label.configure(text=gym_name)
+        self.terminal_name = terminal_name
+        self.frames["access"].terminal = self.terminal_name
+        self.start_sync(sync_peer)
+
+    def start_sync(self, sync_peer):
+        # (Re)starts replication when the sync peer setting changes; not used against a remote database
+        if self.sync_worker and self.sync_worker.peer_address == sync_peer:
+            return
+        if self.sync_worker:
+            self.sync_worker.stop()
+            self.sync_worker = None
+        if sync_peer:
+            from sync import SyncWorker
+            self.sync_worker = SyncWorker(self.db, sync_peer)
+            self.sync_worker.start()
 
     def create_footer(self):
         self.footer_frame = ctk.CTkFrame(self, height=30, corner_radius=0)
@@ -99,16 +175,20 @@ class GymApp(ctk.CTk):
         self.btn_admin = ctk.CTkButton(self.sidebar_frame, text="Administración", font=("Roboto", 16), height=40, text_color="white", fg_color="gray40", hover_color="gray30", command=lambda: self.select_frame("admin"))
         self.btn_admin.grid(row=4, column=0, padx=20, pady=15)
 
-    def create_frames(self):
-        self.frames = {}
-        
-        self.frames["access"] = AccessFrame(self, self.db)
-        self.frames["register"] = RegisterFrame(self, self.db)
-        self.frames["members"] = MembersFrame(self, self.db)
-        self.frames["admin"] = AdminFrame(self, self.db, self.serial_mgr, self.reload_config)
-        
-        for frame in self.frames.values():
-            frame.grid(row=0, column=1, sticky="nsew")
+    def create_frame(self, name):
+        started = time.perf_counter()
+        if name == "access":
+            frame = AccessFrame(self, self.db, self.event_writer, self.terminal_name, self.adb)
+        elif name == "register":
+            frame = RegisterFrame(self, self.db, self.adb)
+        elif name == "members":
+            frame = MembersFrame(self, self.db, self.adb)
+        else:
+            frame = AdminFrame(self, self.db, self.adb, self.serial_hub, self.reload_config)
+        frame.grid(row=0, column=1, sticky="nsew")
+        self.frames[name] = frame
+        logging.info(f"Built {name} screen in {1000 * (time.perf_counter() - started):.0f} ms")
+        return frame
             
     def select_frame(self, name):
         # Update buttons state
@@ -122,17 +202,33 @@ class GymApp(ctk.CTk):
         self.btn_admin.configure(fg_color=inactive_color if name != "admin" else "gray40") # Keep Admin distinct or similar
 
         
-        # Show frame
-        frame = self.frames[name]
+        # Show frame (a new MembersFrame loads its list itself)
+        frame = self.frames.get(name)
+        refresh = frame is not None
+        if frame is None:
+            frame = self.create_frame(name)
         frame.tkraise()
         
         # Optional: refresh data if needed
-        if name == "members" and hasattr(frame, "refresh_list"):
+        if refresh and name == "members" and hasattr(frame, "refresh_list"):
             frame.refresh_list()
 
     def change_appearance_mode_event(self, new_appearance_mode: str):
         ctk.set_appearance_mode(new_appearance_mode)
 
 if __name__ == "__main__":
-    app = GymApp()
+    parser = argparse.ArgumentParser(description="GymBase")
+    parser.add_argument("--remote", metavar="HOST:PORT", help="use the database served by remote.py on another terminal")
+    parser.add_argument("--log-rotate", choices=[ROTATE_SIZE, ROTATE_DAILY], default=ROTATE_SIZE,
+                        help="rotate gymbase.log at 5 MB (default) or at midnight; old logs are gzipped")
+    parser.add_argument("--access-json", metavar="PATH", help="also write every access event as a JSON line to PATH")
+    parser.add_argument("--startup-report", action="store_true", help="print where the startup time went")
+    args = parser.parse_args()
+
+    startup = ScanTimer("startup", STARTED)
+    startup.mark("imports")
+    # Logging is written by a background thread; the UI only enqueues records
+    setup_logging('gymbase.log', rotate=args.log_rotate, access_json=args.access_json)
+    startup.mark("logging")
+    app = GymApp(args.remote, startup, args.startup_report)
     app.mainloop()
@@ -0,0 +1,163 @@
+import csv
+import json
+import logging
+from datetime import date, datetime, timedelta
+from database import DatabaseManager
+
+COLUMNS = DatabaseManager.MEMBER_COLUMNS
+CHUNK_SIZE = 5000
+
+
+class ImportReport:
+    def __init__(self):
+        self.total = 0
+        self.imported = 0
+        # (line_no, user_id, message) for every rejected row
+        self.errors = []
+
+    def write_errors(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["linea", "id", "error"])
+            writer.writerows(self.errors)
+
+
+def _count_lines(path):
+    # Cheap total for progress reporting: count newlines in binary chunks
+    count = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            count += chunk.count(b"\n")
+    return count
+
+
+def _parse_date(value, field):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        # fromisoformat is much faster than strptime; insist on the YYYY-MM-DD shape
+        if len(value) != 10 or value[4] != "-":
+            raise ValueError
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"{field} inválida: {value}")
+
+
+def normalize_record(record):
+    """Validates one input record (dict) and returns a tuple in COLUMNS order.
+
+    Applies the same defaults as DatabaseManager.add_member.
+    Raises ValueError with a user-facing message for bad rows.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("El registro no es un objeto")
+    user_id = str(record.get("id") or "").strip()
+    name = str(record.get("name") or "").strip()
+    if not user_id or not name:
+        raise ValueError("El ID y Nombre son obligatorios")
+
+    age = record.get("age")
+    if age in (None, ""):
+        age = None
+    else:
+        try:
+            age = int(age)
+        except (TypeError, ValueError):
+            raise ValueError(f"Edad inválida: {age}")
+
+    registration_date = _parse_date(record.get("registration_date"), "Fecha de registro") or datetime.now().strftime("%Y-%m-%d")
+    end_date = _parse_date(record.get("membership_end_date"), "Fecha de vencimiento")
+    if not end_date:
+        end_date = (date.fromisoformat(registration_date) + timedelta(days=30)).isoformat()
+
+    is_frozen = 1 if str(record.get("is_frozen") or "0").strip().lower() in ("1", "true", "si", "sí") else 0
+    frozen_date = _parse_date(record.get("frozen_date"), "Fecha de congelamiento") if is_frozen else None
+
+    return (user_id, name, age, record.get("address") or "", record.get("phone") or "",
+            registration_date, end_date, is_frozen, frozen_date)
+
+
+def _read_records(path):
+    # Yields (line_no, record). CSV and JSON Lines are streamed; a JSON array is loaded whole.
+    # A JSON line that does not parse is yielded as the ValueError, so the rest still imports.
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+    elif path.lower().endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_no, ValueError(f"JSON inválido: {e.msg}")
+    else:
+        with open(path, encoding="utf-8") as f:
+            for index, record in enumerate(json.load(f), start=1):
+                yield index, record
+
+
+def import_members(db, path, progress=None, chunk_size=CHUNK_SIZE):
+    """Imports members from a CSV, JSON or JSON Lines file in chunked transactions.
+
+    Bad rows (validation errors, duplicate IDs) are skipped and reported;
+    progress(done, total) is called after every chunk.
+    """
+    report = ImportReport()
+    total = _count_lines(path) if path.lower().endswith((".csv", ".jsonl")) else 0
+    chunk = []
+
+    def flush():
+        imported, errors = db.bulk_add_members(chunk)
+        report.imported += imported
+        report.errors.extend(errors)
+        chunk.clear()
+        if progress:
+            progress(report.total, max(total, report.total))
+
+    for line_no, record in _read_records(path):
+        report.total += 1
+        if isinstance(record, ValueError):
+            report.errors.append((line_no, "", str(record)))
+            continue
+        try:
+            chunk.append((line_no, normalize_record(record)))
+        except ValueError as e:
+            report.errors.append((line_no, record.get("id", "") if isinstance(record, dict) else "", str(e)))
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    logging.info(f"Imported {report.imported}/{report.total} members from {path} ({len(report.errors)} errors)")
+    return report
+
+
+def export_members(db, path, progress=None):
+    """Streams every member to a CSV, JSON or JSON Lines file in constant memory. Returns the row count."""
+    count = 0
+    lower = path.lower()
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if lower.endswith(".csv"):
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            write_row = writer.writerow
+        elif lower.endswith(".jsonl"):
+            write_row = lambda row: f.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n")
+        else:
+            f.write("[")
+            write_row = lambda row: f.write(("," if count else "") + "\n" + json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False))
+
+        for row in db.iter_members():
+            write_row(row)
+            count += 1
+            if progress and count % CHUNK_SIZE == 0:
+                progress(count)
+
+        if not lower.endswith((".csv", ".jsonl")):
+            f.write("\n]\n")
+
+    logging.info(f"Exported {count} members to {path}")
+    return count
@@ -0,0 +1,166 @@
+"""In-memory latency histograms and counters for the access path.
+
+Every scan is timed per stage (serial receipt, after() queueing, lookup,
+turnstile relay, UI update). Recording is a bisect and an increment under a
+lock, so it stays on permanently. Scans slower than SLOW_SCAN_MS are logged
+with their stage breakdown.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+# Bucket upper bounds in ms: 1 µs to ~2 min, each 10% wider than the last
+BUCKET_BOUNDS = []
+_bound = 0.001
+while _bound < 120000:
+    BUCKET_BOUNDS.append(round(_bound, 6))
+    _bound *= 1.1
+del _bound
+
+SLOW_SCAN_MS = 150
+# Display order for the known scan stages
+STAGES = ("serial", "queue", "lookup", "relay", "ui", "record", "total")
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Log-bucketed latency histogram; quantiles are accurate to one bucket (10%)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, ms):
+        self.counts[bisect_left(BUCKET_BOUNDS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                # The overflow bucket and the top bucket report the exact maximum
+                return min(BUCKET_BOUNDS[i], self.max) if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": self.max,
+        }
+
+
+class Metrics:
+    """Thread-safe registry of named histograms (ms) and counters."""
+
+    def __init__(self, slow_ms=SLOW_SCAN_MS):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started = datetime.now()
+
+    def observe(self, name, ms):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(ms)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        """Returns ({stage: summary}, {counter: value}), known stages first."""
+        with self._lock:
+            names = sorted(self.histograms, key=lambda n: (STAGES.index(n) if n in STAGES else len(STAGES), n))
+            return {name: self.histograms[name].summary() for name in names}, dict(sorted(self.counters.items()))
+
+    def export_text(self):
+        """Prometheus-style text exposition of every histogram and counter."""
+        histograms, counters = self.snapshot()
+        lines = [f"# GymBase metrics since {self.started.isoformat(timespec='seconds')}, "
+                 f"written {datetime.now().isoformat(timespec='seconds')}",
+                 "# TYPE gymbase_stage_ms summary"]
+        for name, s in histograms.items():
+            for q in QUANTILES:
+                lines.append(f'gymbase_stage_ms{{stage="{name}",quantile="{q}"}} {s[f"p{round(q * 100)}_ms"]:.4f}')
+            lines.append(f'gymbase_stage_ms_max{{stage="{name}"}} {s["max_ms"]:.4f}')
+            lines.append(f'gymbase_stage_ms_sum{{stage="{name}"}} {s["mean_ms"] * s["count"]:.4f}')
+            lines.append(f'gymbase_stage_ms_count{{stage="{name}"}} {s["count"]}')
+        lines.append("# TYPE gymbase_events_total counter")
+        for name, value in counters.items():
+            lines.append(f'gymbase_events_total{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.export_text())
+
+
+# Shared by the app, the hub and the daemon of one process
+METRICS = Metrics()
+
+
+class ScanTimer:
+    """Per-scan stopwatch: mark(stage) records the time since the previous mark.
+
+    started is a time.perf_counter() stamp (for serial scans, when the bytes
+    were read).
+    """
+    __slots__ = ("code", "started", "last", "stages", "metrics")
+
+    def __init__(self, code=None, started=None, metrics=METRICS):
+        self.code = code
+        self.started = self.last = started if started is not None else time.perf_counter()
+        self.stages = []
+        self.metrics = metrics
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, 1000 * (now - self.last)))
+        self.last = now
+
+    def per_stage(self):
+        # A stage marked more than once (UI work before and after the lookup) is summed
+        per_stage = {}
+        for stage, ms in self.stages:
+            per_stage[stage] = per_stage.get(stage, 0.0) + ms
+        return per_stage
+
+    def breakdown(self):
+        return ", ".join(f"{stage} {ms:.1f}" for stage, ms in self.per_stage().items())
+
+    def finish(self, outcome=None):
+        """Feeds the histograms; returns the total in ms."""
+        total = 1000 * (self.last - self.started)
+        per_stage = self.per_stage()
+        for stage, ms in per_stage.items():
+            self.metrics.observe(stage, ms)
+        self.metrics.observe("total", total)
+        self.metrics.incr("scans")
+        if outcome:
+            self.metrics.incr(f"access_{outcome}")
+        if total > self.metrics.slow_ms:
+            self.metrics.incr("slow_scans")
+            logging.warning(f"Slow scan {total:.1f} ms for ID {self.code}: {self.breakdown()}")
+        return total
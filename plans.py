@@ -0,0 +1,157 @@
+"""Membership plans and their access rules, compiled for constant-time decisions.
+
+A plan (a row of the plans table) is what the front desk sells: a duration
+added on renewal (months and days) and optional rules, stored as JSON:
+
+    {"hours": [["06:00", "12:00"], ["20:00", "23:00"]],  # entry windows, end exclusive
+     "weekdays": [0, 1, 2, 3, 4],                        # Monday = 0
+     "visits": 10,                                       # granted entries per membership period
+     "grace_days": 3}                                    # entry allowed this many days past expiry
+
+compile_plan() turns the hour windows and weekdays into one byte per minute
+of the week, so a scan is decided with one index and a few comparisons
+whatever the rules say. Members without a plan keep the plain rule: active
+until the expiry date.
+"""
+import json
+import re
+from datetime import date
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+RULE_KEYS = ("hours", "weekdays", "visits", "grace_days")
+# Plans a new database starts with: the renewal lengths the front desk has always offered
+DEFAULT_PLANS = (
+    ("1 Semana", 0, 7),
+    ("15 Días", 0, 15),
+    ("1 Mes", 1, 0),
+    ("2 Meses", 2, 0),
+    ("3 Meses", 3, 0),
+    ("6 Meses", 6, 0),
+    ("1 Año", 12, 0),
+)
+
+
+def add_months(day, months):
+    """day moved by whole months, clamped to the end of shorter months (Jan 31 + 1 -> Feb 28/29)."""
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    for last in (31, 30, 29, 28):
+        try:
+            return day.replace(year=year, month=month, day=min(day.day, last))
+        except ValueError:
+            continue
+
+
+def minute_of_week(when):
+    """Index into CompiledPlan.minutes for a datetime: Monday 00:00 is 0."""
+    return when.weekday() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+
+
+def _minute_of_day(text):
+    match = re.fullmatch(r"(\d{1,2}):(\d{2})", text.strip())
+    if not match or int(match[1]) > 24 or int(match[2]) > 59 or (int(match[1]) == 24 and int(match[2])):
+        raise ValueError(f"Invalid time {text!r}, expected HH:MM")
+    return int(match[1]) * 60 + int(match[2])
+
+
+def parse_hours(text):
+    """'06:00-12:00, 20:00-23:00' -> [["06:00", "12:00"], ["20:00", "23:00"]] (empty text: no windows)."""
+    windows = []
+    for part in filter(None, (p.strip() for p in re.split(r"[,;]", text))):
+        start, sep, end = part.partition("-")
+        if not sep:
+            raise ValueError(f"Invalid window {part!r}, expected HH:MM-HH:MM")
+        _minute_of_day(start)
+        _minute_of_day(end)
+        windows.append([start.strip(), end.strip()])
+    return windows
+
+
+def format_hours(windows):
+    return ", ".join(f"{start}-{end}" for start, end in windows)
+
+
+def validate_rules(rules):
+    """Returns rules as a normalized dict, raising ValueError for anything compile_plan cannot use."""
+    if isinstance(rules, str):
+        rules = json.loads(rules or "{}")
+    unknown = set(rules) - set(RULE_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown plan rules: {', '.join(sorted(unknown))}")
+    normalized = {}
+    if rules.get("hours"):
+        windows = []
+        for window in rules["hours"]:
+            start, end = window
+            if _minute_of_day(start) == _minute_of_day(end):
+                raise ValueError(f"Empty window {start}-{end}")
+            windows.append([start, end])
+        normalized["hours"] = windows
+    if rules.get("weekdays") is not None:
+        weekdays = sorted(set(int(d) for d in rules["weekdays"]))
+        if not weekdays or weekdays[0] < 0 or weekdays[-1] > 6:
+            raise ValueError("weekdays must name at least one day between 0 (Monday) and 6 (Sunday)")
+        if len(weekdays) < 7:
+            normalized["weekdays"] = weekdays
+    for key in ("visits", "grace_days"):
+        if rules.get(key) is not None:
+            value = int(rules[key])
+            if value < 0 or (key == "visits" and value == 0):
+                raise ValueError(f"{key} must be positive")
+            if value:
+                normalized[key] = value
+    return normalized
+
+
+class CompiledPlan:
+    """A plan's rules as the access decision uses them.
+
+    minutes: None (any time) or one byte per minute of the week, 1 where entry
+    is allowed. visits: None or the entries allowed per membership period.
+    """
+    __slots__ = ("plan_id", "name", "months", "days", "minutes", "visits", "grace_days")
+
+    def __init__(self, plan_id, name, months, days, minutes, visits, grace_days):
+        self.plan_id = plan_id
+        self.name = name
+        self.months = months
+        self.days = days
+        self.minutes = minutes
+        self.visits = visits
+        self.grace_days = grace_days
+
+    def period_start(self, end_ord):
+        """First day (ordinal) of the membership period ending at end_ord, for counting visits."""
+        try:
+            return add_months(date.fromordinal(end_ord), -self.months).toordinal() - self.days
+        except ValueError:
+            return end_ord - self.days
+
+
+def compile_plan(plan_id, name, months, days, rules):
+    """Builds the CompiledPlan for a plans row (rules as JSON text or dict)."""
+    rules = validate_rules(rules)
+    minutes = None
+    if "hours" in rules or "weekdays" in rules:
+        day = bytearray(MINUTES_PER_DAY)
+        if "hours" in rules:
+            for start, end in rules["hours"]:
+                first, last = _minute_of_day(start), _minute_of_day(end)
+                if first < last:
+                    day[first:last] = b"\1" * (last - first)
+                else:  # across midnight, e.g. 22:00-02:00
+                    day[first:] = b"\1" * (MINUTES_PER_DAY - first)
+                    day[:last] = b"\1" * last
+        else:
+            day[:] = b"\1" * MINUTES_PER_DAY
+        weekdays = set(rules.get("weekdays", range(7)))
+        closed = bytes(MINUTES_PER_DAY)
+        minutes = b"".join(bytes(day) if weekday in weekdays else closed for weekday in range(7))
+    return CompiledPlan(plan_id, name, int(months or 0), int(days or 0), minutes,
+                        rules.get("visits"), rules.get("grace_days", 0))
+
+
+def compile_plans(rows):
+    """{plan_id: CompiledPlan} for (id, name, months, days, rules) rows."""
+    return {row[0]: compile_plan(*row) for row in rows}
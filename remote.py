@@ -0,0 +1,410 @@
+"""Shared database for several front-desk terminals over the local network.
+
+One machine runs the server next to its gym.db:
+
+    GYMBASE_SECRET=... python remote.py --db gym.db [--host 0.0.0.0] [--port 8765]
+
+and the other terminals start the app with `python main.py --remote HOST:PORT`
+and the same GYMBASE_SECRET. The server only listens on localhost unless
+given --host; listening on the network requires the shared secret.
+
+The protocol is one JSON object per line over a persistent TCP connection:
+    -> {"id": 1, "method": "get_member", "args": ["123"], "kwargs": {}}
+    <- {"id": 1, "result": [...]}   or   {"id": 1, "error": {"type": "ValueError", "message": "..."}}
+Clients may pipeline: send many requests before reading; responses come
+back in request order on each connection. With a secret, the first request
+of a connection must be {"method": "auth", "args": [secret]}; the server
+closes connections that fail it.
+"""
+import argparse
+import asyncio
+import hmac
+import itertools
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+from functools import partial
+
+from dateutil.relativedelta import relativedelta
+
+import plans
+from database import DatabaseManager, LOCAL_CONFIG_KEYS
+from logging_setup import setup_logging
+
+DEFAULT_PORT = 8765
+MAX_LINE = 16 * 1024 * 1024
+
+# DatabaseManager methods reachable over the network
+SERVER_METHODS = (
+    "get_access_info", "get_config", "set_config", "get_member", "get_members_page", "count_members",
+    "count_by_status", "search_members", "add_member", "bulk_add_members", "get_members_after",
+    "update_member", "set_membership_expiry", "toggle_freeze", "delete_member",
+    "bulk_extend", "bulk_freeze", "bulk_unfreeze", "bulk_set_expiry",
+    "add_access_events", "get_access_events", "report", "rebuild_rollups",
+    "get_node_id", "changes_since", "apply_changes",
+    "get_plans", "save_plan", "delete_plan", "set_member_plan", "visits_used",
+    "count_visit",
+    "resolve_credential", "get_credentials", "assign_credential", "revoke_credential", "delete_credential",
+)
+# Served from memory (or a primary-key lookup): answered on the event loop, not in a worker
+INLINE_METHODS = {"ping", "get_access_info", "resolve_credential", "get_config", "get_member"}
+
+# Shared secret of the server and its terminals (also used by sync)
+SECRET_ENV = "GYMBASE_SECRET"
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+# Exceptions re-raised with their own type on the client
+REMOTE_ERRORS = {
+    "PermissionError": PermissionError,
+    "ValueError": ValueError,
+    "KeyError": KeyError,
+    "TypeError": TypeError,
+    "IntegrityError": sqlite3.IntegrityError,
+    "OperationalError": sqlite3.OperationalError,
+}
+
+
+class RemoteError(Exception):
+    """A server-side failure without a local equivalent (a lost connection raises ConnectionError)."""
+
+
+def _encode(obj):
+    # Membership deltas travel as relativedelta fields
+    if isinstance(obj, timedelta):
+        return {"__delta__": {"days": obj.days}}
+    if isinstance(obj, relativedelta):
+        return {"__delta__": {"years": obj.years, "months": obj.months, "days": obj.days}}
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def _decode(obj):
+    if "__delta__" in obj:
+        return relativedelta(**obj["__delta__"])
+    return obj
+
+
+class AccessServer:
+    """Serves one DatabaseManager to many terminals with asyncio streams."""
+    WORKERS = 4
+    HIGH_WATER = 256 * 1024
+    CACHE_CHECK_INTERVAL = 5
+
+    def __init__(self, db, host="127.0.0.1", port=DEFAULT_PORT, secret=None):
+        if not secret and host not in LOOPBACK_HOSTS:
+            raise ValueError(f"Listening on {host} requires a shared secret ({SECRET_ENV})")
+        self.db = db
+        self.host = host
+        self.port = port
+        self.secret = secret
+        self.methods = {name: getattr(db, name) for name in SERVER_METHODS}
+        self.methods["ping"] = lambda: "pong"
+        self.executor = ThreadPoolExecutor(max_workers=self.WORKERS, thread_name_prefix="remote-db")
+        self.server = None
+        self.clients = 0
+
+    async def start(self):
+        self.db.warm_access_cache()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, limit=MAX_LINE)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logging.info(f"Access server listening on {self.host}:{self.port}")
+        return self.port
+
+    async def serve_forever(self):
+        watcher = asyncio.create_task(self.watch_members())
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass  # the server was closed
+        finally:
+            watcher.cancel()
+            self.executor.shutdown(wait=True)
+
+    async def watch_members(self):
+        # Mutations made through this server are written through; changes from
+        # other processes on this machine are picked up here, incrementally
+        self.db.data_changed()
+        while True:
+            await asyncio.sleep(self.CACHE_CHECK_INTERVAL)
+            if self.db.data_changed():
+                await asyncio.get_running_loop().run_in_executor(self.executor, self.db.refresh_access_cache)
+
+    async def handle(self, reader, writer):
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        peer = writer.get_extra_info("peername")
+        self.clients += 1
+        logging.info(f"Terminal connected: {peer}")
+        authenticated = not self.secret
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not authenticated:
+                    response, authenticated = self.authenticate(line)
+                    writer.write(response)
+                    if not authenticated:
+                        logging.warning(f"Terminal {peer} failed to authenticate")
+                        await writer.drain()
+                        break
+                    continue
+                writer.write(await self.dispatch(line))
+                # Pipelined responses accumulate in the transport; only wait when it backs up
+                if writer.transport.get_write_buffer_size() > self.HIGH_WATER:
+                    await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            logging.warning(f"Terminal {peer} dropped: {e}")
+        finally:
+            self.clients -= 1
+            writer.close()
+            logging.info(f"Terminal disconnected: {peer}")
+
+    def authenticate(self, line):
+        # The first request of a connection; returns (response, accepted)
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            args = request.get("args") or [""]
+            accepted = (request.get("method") == "auth" and isinstance(args[0], str)
+                        and hmac.compare_digest(args[0].encode(), self.secret.encode()))
+        except (ValueError, AttributeError, TypeError):
+            accepted = False
+        if accepted:
+            response = {"id": request_id, "result": "ok"}
+        else:
+            response = {"id": request_id, "error": {"type": "PermissionError", "message": "Authentication required"}}
+        return (json.dumps(response) + "\n").encode(), accepted
+
+    async def dispatch(self, line):
+        request_id = None
+        try:
+            request = json.loads(line, object_hook=_decode) if b"__delta__" in line else json.loads(line)
+            request_id = request.get("id")
+            func = self.methods.get(request.get("method"))
+            if func is None:
+                raise ValueError(f"Unknown method: {request.get('method')}")
+            call = partial(func, *request.get("args", ()), **request.get("kwargs", {}))
+            if request["method"] in INLINE_METHODS:
+                result = call()
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, call)
+            response = {"id": request_id, "result": result}
+        except Exception as e:
+            response = {"id": request_id, "error": {"type": type(e).__name__, "message": str(e)}}
+        return (json.dumps(response, default=_encode) + "\n").encode()
+
+
+class RemoteDatabase:
+    """DatabaseManager stand-in that forwards calls to an AccessServer.
+
+    Like DatabaseManager, each thread keeps its own persistent connection.
+    Per-terminal settings (LOCAL_CONFIG_KEYS) stay in a local JSON file so
+    each front desk keeps its own readers and terminal name.
+    """
+    LOCAL_CONFIG_KEYS = LOCAL_CONFIG_KEYS
+    TIMEOUT = 30
+    PIPELINE_WINDOW = 256
+    PLANS_TTL = 60
+
+    def __init__(self, address, local_config="gymbase-terminal.json", secret=None):
+        host, _, port = address.rpartition(":")
+        self.address = (host or address, int(port) if host else DEFAULT_PORT)
+        self.local_config = local_config
+        self.secret = secret if secret is not None else os.environ.get(SECRET_ENV)
+        self._local = threading.local()
+        self._conn_lock = threading.Lock()
+        self._connections = []
+        self._ids = itertools.count(1)
+        self._access_plans = None
+
+    # --- transport ---
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection(self.address, timeout=self.TIMEOUT)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = (sock, sock.makefile("rb"))
+            if self.secret:
+                self._authenticate(conn)
+            self._local.conn = conn
+            with self._conn_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _authenticate(self, conn):
+        try:
+            conn[0].sendall((json.dumps({"id": next(self._ids), "method": "auth", "args": [self.secret]}) + "\n").encode())
+            response = json.loads(conn[1].readline() or "{}")
+        except (OSError, ValueError) as e:
+            response = {"error": {"message": str(e)}}
+        if "error" in response or "result" not in response:
+            for part in reversed(conn):
+                part.close()
+            raise PermissionError(f"Server {self.address[0]}:{self.address[1]} rejected this terminal: "
+                                  f"{response.get('error', {}).get('message', 'connection closed')}")
+
+    def _drop(self, conn):
+        self._local.conn = None
+        with self._conn_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        for part in reversed(conn):
+            try:
+                part.close()
+            except OSError:
+                pass
+
+    def call_many(self, calls):
+        """Pipelines [(method, args, kwargs)] on this thread's connection; returns results in order.
+
+        Requests are sent PIPELINE_WINDOW at a time so neither side can block
+        on a full socket buffer. The first failed call raises after every
+        response has been read.
+        """
+        conn = self._conn()
+        results, error = [], None
+        for start in range(0, len(calls), self.PIPELINE_WINDOW):
+            window = calls[start:start + self.PIPELINE_WINDOW]
+            payload = "".join(json.dumps({"id": next(self._ids), "method": method, "args": list(args), "kwargs": kwargs},
+                                         default=_encode) + "\n" for method, args, kwargs in window).encode()
+            try:
+                conn[0].sendall(payload)
+                raw = [conn[1].readline() for _ in window]
+            except OSError as e:
+                self._drop(conn)
+                raise ConnectionError(f"Connection to {self.address[0]}:{self.address[1]} lost: {e}")
+            if not raw[-1]:
+                self._drop(conn)
+                raise ConnectionError(f"Server {self.address[0]}:{self.address[1]} closed the connection")
+            for line in raw:
+                response = json.loads(line, object_hook=_decode)
+                if "error" in response and error is None:
+                    error = response["error"]
+                results.append(response.get("result"))
+        if error:
+            raise REMOTE_ERRORS.get(error["type"], RemoteError)(error["message"])
+        return results
+
+    def call(self, method, *args, **kwargs):
+        return self.call_many([(method, args, kwargs)])[0]
+
+    def close_thread_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._drop(conn)
+
+    def close(self):
+        with self._conn_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            for part in reversed(conn):
+                try:
+                    part.close()
+                except OSError:
+                    pass
+        self._local = threading.local()
+
+    # --- local settings ---
+
+    def _read_local(self):
+        try:
+            with open(self.local_config, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get_config(self, key, default=None):
+        if key in self.LOCAL_CONFIG_KEYS:
+            return self._read_local().get(key, default)
+        return self.call("get_config", key, default)
+
+    def set_config(self, key, value):
+        if key not in self.LOCAL_CONFIG_KEYS:
+            return self.call("set_config", key, value)
+        settings = self._read_local()
+        settings[key] = value
+        tmp = self.local_config + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(settings, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.local_config)
+
+    # --- DatabaseManager API ---
+
+    def warm_access_cache(self):
+        self._access_plans = None  # the server keeps the member cache
+
+    def access_plans(self):
+        """Plans compiled locally from the server's, refetched every PLANS_TTL seconds."""
+        compiled, fetched = self._access_plans or (None, 0)
+        if compiled is None or time.monotonic() - fetched > self.PLANS_TTL:
+            compiled = plans.compile_plans(self.call("get_plans"))
+            self._access_plans = (compiled, time.monotonic())
+        return compiled
+
+    def save_plan(self, *args, **kwargs):
+        self._access_plans = None
+        return self.call("save_plan", *args, **kwargs)
+
+    def delete_plan(self, plan_id):
+        self._access_plans = None
+        return self.call("delete_plan", plan_id)
+
+    def cancel_when(self, is_cancelled):
+        # Remote queries cannot be interrupted; stale results are discarded by the caller
+        return nullcontext()
+
+    def iter_members(self, batch_size=1000):
+        after_id = None
+        while True:
+            batch = self.get_members_after(after_id, batch_size)
+            if not batch:
+                break
+            yield from batch
+            after_id = batch[-1][0]
+
+    def __getattr__(self, name):
+        if name in SERVER_METHODS:
+            return partial(self.call, name)
+        raise AttributeError(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GymBase shared database server")
+    parser.add_argument("--db", default="gym.db")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help=f"address to listen on; other than localhost requires the {SECRET_ENV} environment variable")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--log", default="gymbase-server.log")
+    args = parser.parse_args()
+
+    secret = os.environ.get(SECRET_ENV)
+    if not secret and args.host not in LOOPBACK_HOSTS:
+        parser.error(f"set {SECRET_ENV} to a shared secret to listen on {args.host}")
+
+    setup_logging(args.log)
+    async def run():
+        server = AccessServer(DatabaseManager(args.db), args.host, args.port, secret)
+        port = await server.start()
+        print(f"Listening on {args.host}:{port}", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            server.db.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,65 @@ import serial
 import threading
 import time
 import logging
+import json
+import os
+import selectors
+
+# Every byte value except ASCII digits, for bytes.translate(None, ...)
+NON_DIGITS = bytes(b for b in range(256) if not 0x30 <= b <= 0x39)
+
+
+# Turnstile protocol, host -> device: grant "*G<seq>:<pulse_ms>#", deny "*D<seq>#".
+# Devices that acknowledge answer "*A<seq>#" with the same sequence number.
+GRANT_FRAME = "*G{seq}:{pulse}#"
+DENY_FRAME = "*D{seq}#"
+ACK_MARK = b"A"
+
+
+class FrameParser:
+    """Incremental byte-level parser for the keypad/RFID framing: *1234#
+
+    '*' starts a new code, '#' ends it, digits are collected and anything else
+    is ignored. Frames may be split across reads or arrive several at a time.
+    Acknowledgements (*A12#) are not codes; their sequence numbers are
+    appended to self.acks instead.
+    """
+    MAX_FRAME = 64
+
+    def __init__(self):
+        self.buffer = b""
+        self.in_ack = False
+        self.acks = []
+
+    def feed(self, data):
+        """Consumes a chunk of bytes and returns the list of completed codes."""
+        if not data:
+            return []
+        parts = (self.buffer + data).split(b"#")
+        tail = parts.pop()
+        codes = []
+        in_ack = self.in_ack
+        for part in parts:
+            digits, is_ack = self._digits(part, in_ack)
+            in_ack = False
+            if not digits:
+                continue
+            if is_ack:
+                self.acks.append(int(digits))
+            else:
+                codes.append(digits.decode("ascii"))
+        self.buffer, self.in_ack = self._digits(tail, in_ack)
+        return codes
+
+    def _digits(self, segment, is_ack):
+        # Only what follows the last '*' belongs to the current frame
+        start = segment.rfind(b"*")
+        if start >= 0:
+            segment = segment[start + 1:]
+            is_ack = segment[:1] == ACK_MARK
+        # Cap runaway noise without a terminator
+        return segment.translate(None, NON_DIGITS)[-self.MAX_FRAME:], is_ack
+
 
 class SerialManager:
     def __init__(self, port, baudrate, callback_code):
@@ -39,26 +98,366 @@ class SerialManager:
             self.serial_conn = None
 
     def _listen(self):
-        buffer = ""
+        parser = FrameParser()
         while self.running:
             try:
                 if self.serial_conn and self.serial_conn.is_open:
-                    data = self.serial_conn.read().decode('utf-8', errors='ignore')
-                    if data:
-                        # Protocol: *1234#
-                        if data == '*':
-                            buffer = "" # Start new code
-                        elif data == '#':
-                            # End of code
-                            if buffer:
-                                logging.debug(f"Serial code received: {buffer}")
-                                self.callback_code(buffer)
-                            buffer = ""
-                        elif data.isdigit():
-                            buffer += data
-                        # Ignore other characters like newlines if any, unless protocol is stricter
+                    # Take everything already buffered in one call; when idle, block
+                    # (up to the port timeout) for the next byte
+                    data = self.serial_conn.read(self.serial_conn.in_waiting or 1)
+                    for code in parser.feed(data):
+                        logging.debug(f"Serial code received: {code}")
+                        self.callback_code(code)
                 else:
                     time.sleep(0.5)
             except Exception as e:
+                if not self.running:
+                    break  # port closed by stop() while reading
                 logging.error(f"Serial Error in listen loop: {e}")
                 time.sleep(1)
+
+
+class PendingResponse:
+    """A grant/deny frame written to a reader and not yet acknowledged."""
+
+    def __init__(self, frame, received_at, deadline):
+        self.frame = frame
+        self.received_at = received_at
+        self.deadline = deadline
+        self.attempts = 1
+
+
+class HubPort:
+    """One reader attached to a SerialHub: connection, parser state and counters.
+
+    pulse_ms is the relay pulse requested in grant frames (0 leaves it to the
+    device); ack says whether the device acknowledges responses.
+    """
+    SEQ_MODULO = 1000
+
+    def __init__(self, port, baudrate, terminal=None, pulse_ms=0, ack=False):
+        self.port = port
+        self.baudrate = baudrate
+        self.terminal = terminal or port
+        self.pulse_ms = pulse_ms
+        self.ack = ack
+        self.conn = None
+        self.parser = FrameParser()
+        self.retry_at = 0
+        self.seq = 0
+        self.pending = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.started_at = time.monotonic()
+        self.reads = 0
+        self.bytes = 0
+        self.frames = 0
+        # Time from read() returning to the callback finishing, per frame
+        self.dispatch_total = 0.0
+        self.dispatch_max = 0.0
+        # Scan (read of the closing '#') to response written, and to its ACK
+        self.responses = 0
+        self.relay_total = 0.0
+        self.relay_max = 0.0
+        self.acked = 0
+        self.ack_total = 0.0
+        self.ack_max = 0.0
+        self.retries = 0
+        self.ack_failures = 0
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "port": self.port,
+            "terminal": self.terminal,
+            "connected": self.conn is not None,
+            "reads": self.reads,
+            "bytes": self.bytes,
+            "frames": self.frames,
+            "frames_per_s": self.frames / elapsed,
+            "dispatch_avg_ms": 1000 * self.dispatch_total / self.frames if self.frames else 0.0,
+            "dispatch_max_ms": 1000 * self.dispatch_max,
+            "responses": self.responses,
+            "relay_avg_ms": 1000 * self.relay_total / self.responses if self.responses else 0.0,
+            "relay_max_ms": 1000 * self.relay_max,
+            "acked": self.acked,
+            "ack_avg_ms": 1000 * self.ack_total / self.acked if self.acked else 0.0,
+            "ack_max_ms": 1000 * self.ack_max,
+            "retries": self.retries,
+            "ack_failures": self.ack_failures,
+            "pending": len(self.pending),
+        }
+
+
+class SerialHub:
+    """Serves several serial readers from a single thread.
+
+    On POSIX the ports are multiplexed with a selector; where serial handles
+    cannot be selected (Windows) the thread polls in_waiting instead. Each
+    port has its own FrameParser, and every code is delivered as
+    callback(code, hub_port, received_at) so the caller knows which
+    turnstile it came from. received_at is a time.perf_counter() stamp.
+
+    respond() sends the access decision back to the reader. For ports with
+    ack enabled the frame is resent every ACK_TIMEOUT seconds until the
+    device acknowledges it or MAX_RETRIES is exhausted.
+    """
+    POLL_INTERVAL = 0.005
+    RETRY_INTERVAL = 3.0
+    ACK_TIMEOUT = 0.1
+    MAX_RETRIES = 3
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.ports = {}
+        self.running = False
+        self.thread = None
+        self.selector = None
+        # Guards writes and pending ACKs: respond() is called from other threads
+        self.lock = threading.Lock()
+        self.wake_r = self.wake_w = None
+
+    def configure(self, specs):
+        """Replaces the port list with spec dicts (port, baud, terminal, pulse_ms, ack); restarts if running."""
+        was_running = self.running
+        self.stop()
+        self.ports = {}
+        for spec in specs:
+            if spec.get("port"):
+                self.ports[spec["port"]] = HubPort(spec["port"], int(spec.get("baud", 9600)), spec.get("terminal"),
+                                                   int(spec.get("pulse_ms") or 0), bool(spec.get("ack")))
+        if was_running:
+            self.start()
+
+    def start(self):
+        if self.running or not self.ports:
+            return False
+        if os.name == "posix":
+            self.selector = selectors.DefaultSelector()
+            # Self-pipe so respond() can cut the select() short when a retry deadline is added
+            self.wake_r, self.wake_w = os.pipe()
+            os.set_blocking(self.wake_r, False)
+            os.set_blocking(self.wake_w, False)
+            self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+        for hub_port in self.ports.values():
+            hub_port.reset_stats()
+            hub_port.pending.clear()
+            self._open(hub_port)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="serial-hub", daemon=True)
+        self.thread.start()
+        return any(p.conn for p in self.ports.values())
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        logging.info("Stopping serial hub")
+        self._wake()
+        if self.thread:
+            self.thread.join(2)
+        for hub_port in self.ports.values():
+            self._close(hub_port)
+        if self.selector:
+            self.selector.close()
+            self.selector = None
+            os.close(self.wake_r)
+            os.close(self.wake_w)
+            self.wake_r = self.wake_w = None
+
+    def stats(self):
+        return [p.stats() for p in self.ports.values()]
+
+    def respond(self, hub_port, granted, received_at=None):
+        """Writes a grant or deny frame to the reader a code came from.
+
+        Returns the scan-to-relay latency in milliseconds (received_at until
+        the frame is written), or None when the port is not connected.
+        """
+        with self.lock:
+            conn = hub_port.conn
+            if conn is None:
+                return None
+            hub_port.seq = hub_port.seq % HubPort.SEQ_MODULO + 1
+            seq = hub_port.seq
+            text = GRANT_FRAME.format(seq=seq, pulse=hub_port.pulse_ms) if granted else DENY_FRAME.format(seq=seq)
+            frame = text.encode("ascii")
+            try:
+                conn.write(frame)
+            except Exception as e:
+                logging.error(f"Serial hub: write failed on {hub_port.port}: {e}")
+                return None
+            sent_at = time.perf_counter()
+            received_at = received_at or sent_at
+            latency = sent_at - received_at
+            hub_port.responses += 1
+            hub_port.relay_total += latency
+            hub_port.relay_max = max(hub_port.relay_max, latency)
+            if hub_port.ack:
+                hub_port.pending[seq] = PendingResponse(frame, received_at, sent_at + self.ACK_TIMEOUT)
+        if hub_port.ack:
+            self._wake()
+        return 1000 * latency
+
+    def _wake(self):
+        if self.wake_w is not None:
+            try:
+                os.write(self.wake_w, b"\0")
+            except (BlockingIOError, OSError):
+                pass  # a wake-up is already pending
+
+    def _open(self, hub_port):
+        conn = None
+        try:
+            conn = serial.Serial(hub_port.port, hub_port.baudrate, timeout=0, write_timeout=0.05)
+            if self.selector:
+                self.selector.register(conn.fileno(), selectors.EVENT_READ, hub_port)
+            hub_port.conn = conn
+            logging.info(f"Serial hub: {hub_port.port} ({hub_port.terminal}) open at {hub_port.baudrate}")
+        except Exception as e:
+            logging.error(f"Serial hub: cannot open {hub_port.port}: {e}")
+            if conn is not None:
+                conn.close()
+            hub_port.retry_at = time.monotonic() + self.RETRY_INTERVAL
+
+    def _close(self, hub_port):
+        with self.lock:
+            conn, hub_port.conn = hub_port.conn, None
+            hub_port.pending.clear()
+        if conn is None:
+            return
+        if self.selector:
+            try:
+                self.selector.unregister(conn.fileno())
+            except (KeyError, ValueError):
+                pass
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _run(self):
+        while self.running:
+            try:
+                if self.selector:
+                    for key, _ in self.selector.select(timeout=self._select_timeout()):
+                        if key.data is None:
+                            self._drain_wake()
+                        else:
+                            self._service(key.data)
+                else:
+                    busy = False
+                    for hub_port in self.ports.values():
+                        if hub_port.conn and hub_port.conn.in_waiting:
+                            self._service(hub_port)
+                            busy = True
+                    if not busy:
+                        time.sleep(self.POLL_INTERVAL)
+                self._resend_expired()
+                self._retry_closed()
+            except Exception as e:
+                if not self.running:
+                    break
+                logging.error(f"Serial hub loop error: {e}")
+                time.sleep(0.5)
+
+    def _select_timeout(self):
+        # Wake up in time for the earliest ACK deadline, otherwise idle for up to 0.5 s
+        timeout = 0.5
+        now = time.perf_counter()
+        with self.lock:
+            for hub_port in self.ports.values():
+                for pending in hub_port.pending.values():
+                    timeout = min(timeout, pending.deadline - now)
+        return max(timeout, 0)
+
+    def _drain_wake(self):
+        try:
+            os.read(self.wake_r, 512)
+        except BlockingIOError:
+            pass
+
+    def _retry_closed(self):
+        now = time.monotonic()
+        for hub_port in self.ports.values():
+            if hub_port.conn is None and now >= hub_port.retry_at:
+                self._open(hub_port)
+
+    def _resend_expired(self):
+        now = time.perf_counter()
+        with self.lock:
+            for hub_port in self.ports.values():
+                for seq, pending in list(hub_port.pending.items()):
+                    if now < pending.deadline:
+                        continue
+                    if pending.attempts > self.MAX_RETRIES or hub_port.conn is None:
+                        del hub_port.pending[seq]
+                        hub_port.ack_failures += 1
+                        logging.warning(f"Serial hub: no ACK for response {seq} on {hub_port.port}")
+                        continue
+                    try:
+                        hub_port.conn.write(pending.frame)
+                    except Exception as e:
+                        logging.error(f"Serial hub: resend failed on {hub_port.port}: {e}")
+                    pending.attempts += 1
+                    pending.deadline = now + self.ACK_TIMEOUT
+                    hub_port.retries += 1
+
+    def _acknowledge(self, hub_port, seqs, received_at):
+        with self.lock:
+            for seq in seqs:
+                pending = hub_port.pending.pop(seq, None)
+                if pending is None:
+                    continue  # duplicate ACK for a resent frame
+                latency = received_at - pending.received_at
+                hub_port.acked += 1
+                hub_port.ack_total += latency
+                hub_port.ack_max = max(hub_port.ack_max, latency)
+        seqs.clear()
+
+    def _service(self, hub_port):
+        try:
+            data = hub_port.conn.read(hub_port.conn.in_waiting or 1)
+        except Exception as e:
+            logging.error(f"Serial hub: read failed on {hub_port.port}: {e}")
+            self._close(hub_port)
+            hub_port.retry_at = time.monotonic() + self.RETRY_INTERVAL
+            return
+        received_at = time.perf_counter()
+        hub_port.reads += 1
+        hub_port.bytes += len(data)
+        codes = hub_port.parser.feed(data)
+        if hub_port.parser.acks:
+            self._acknowledge(hub_port, hub_port.parser.acks, received_at)
+        for code in codes:
+            logging.debug(f"Serial code received on {hub_port.port}: {code}")
+            self.callback(code, hub_port, received_at)
+            elapsed = time.perf_counter() - received_at
+            hub_port.frames += 1
+            hub_port.dispatch_total += elapsed
+            hub_port.dispatch_max = max(hub_port.dispatch_max, elapsed)
+
+
+def load_port_config(db):
+    """Returns the configured readers as spec dicts for SerialHub.configure.
+
+    Stored as a JSON list in config 'serial_ports'; falls back to the single
+    serial_port/serial_baud settings of older installs.
+    """
+    raw = db.get_config("serial_ports")
+    if raw:
+        try:
+            return [{"port": p["port"], "baud": int(p.get("baud", 9600)), "terminal": p.get("terminal") or p["port"],
+                     "pulse_ms": int(p.get("pulse_ms") or 0), "ack": bool(p.get("ack"))} for p in json.loads(raw)]
+        except (ValueError, KeyError, TypeError) as e:
+            logging.error(f"Invalid serial_ports config: {e}")
+    port = db.get_config("serial_port", "")
+    if port:
+        return [{"port": port, "baud": int(db.get_config("serial_baud", "9600")),
+                 "terminal": db.get_config("terminal_name", port), "pulse_ms": 0, "ack": False}]
+    return []
+
+
+def save_port_config(db, specs):
+    db.set_config("serial_ports", json.dumps(specs))
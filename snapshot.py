@@ -0,0 +1,149 @@
+"""Memory-mapped, columnar snapshot of the access-relevant member data.
+
+A snapshot file holds, for every member, a 64-bit hash of the id (sorted),
+the expiry ordinal, the plan, the frozen flag and the name, each as a flat
+array:
+
+    header | keys uint64[n] | end_ord int32[n] | plan_id int32[n] (0: none)
+           | name offsets uint32[n+1] | flags uint8[n] | names (UTF-8)
+
+About 21 bytes per member plus the names, so one million members take
+a few tens of MB. Opening one is an mmap and a header check, and the pages
+are shared read-only by every process that opens the same file. Lookups are
+a binary search over the mapped keys.
+
+The snapshot records the changelog seq it was built at; DatabaseManager
+keeps the members changed since then in an in-memory overlay (see
+DatabaseManager.use_snapshot) and rebuilds the file once the overlay grows.
+Two ids hashing to the same key would make the build fail; with 64-bit keys
+that takes billions of members.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+MAGIC = b"GYMSNAP2"
+# magic, byte order (1 = little), member count, changelog seq, names size, node id
+HEADER = struct.Struct("<8sBxxxIqQ32s")
+HEADER_SIZE = 64
+
+
+class SnapshotError(Exception):
+    """The file is missing, damaged, or belongs to another database."""
+
+
+def member_key(user_id):
+    return int.from_bytes(hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def build(conn, path, node_id=""):
+    """Writes a snapshot of conn's members table to path (atomically) and returns its seq."""
+    # One read transaction, so the rows and the seq agree
+    conn.execute("BEGIN")
+    try:
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changelog").fetchone()[0]
+        rows = conn.execute("SELECT id, name, end_ord, is_frozen, plan_id FROM members").fetchall()
+    finally:
+        conn.rollback()
+
+    hashed = [member_key(row[0]) for row in rows]
+    order = sorted(range(len(rows)), key=hashed.__getitem__)
+    keys = array("Q", [hashed[i] for i in order])
+    if any(a == b for a, b in zip(keys, keys[1:])):
+        raise SnapshotError("Two member ids share a snapshot key")
+    end_ords = array("i", [rows[i][2] for i in order])
+    plan_ids = array("i", [rows[i][4] or 0 for i in order])
+    flags = bytes(1 if rows[i][3] else 0 for i in order)
+    encoded = [rows[i][1].encode("utf-8") for i in order]
+    offsets = array("I", [0])
+    total = 0
+    for name in encoded:
+        total += len(name)
+        offsets.append(total)
+    names = b"".join(encoded)
+
+    header = HEADER.pack(MAGIC, sys.byteorder == "little", len(keys), seq, len(names),
+                         (node_id or "").encode("ascii")).ljust(HEADER_SIZE, b"\0")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(header)
+            keys.tofile(f)
+            end_ords.tofile(f)
+            plan_ids.tofile(f)
+            offsets.tofile(f)
+            f.write(flags)
+            f.write(names)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    logging.info(f"Member snapshot written: {len(keys)} members at seq {seq} ({os.path.getsize(path)} bytes)")
+    return seq
+
+
+class MemberSnapshot:
+    """Read-only view of a snapshot file; get() answers like get_access_info()."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot open snapshot {path}: {e}") from e
+        try:
+            self._map_arrays()
+        except Exception:
+            self.map.close()
+            raise
+
+    def _map_arrays(self):
+        if len(self.map) < HEADER_SIZE:
+            raise SnapshotError(f"Snapshot {self.path} is truncated")
+        magic, little, count, self.seq, names_size, node = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path} is not a member snapshot")
+        if bool(little) != (sys.byteorder == "little"):
+            raise SnapshotError(f"Snapshot {self.path} was written with another byte order")
+        end = HEADER_SIZE + 21 * count + 4 + names_size
+        if len(self.map) != end:
+            raise SnapshotError(f"Snapshot {self.path} is truncated")
+        self.count = count
+        self.node_id = node.rstrip(b"\0").decode("ascii")
+
+        view = memoryview(self.map)
+        pos = HEADER_SIZE
+        self.keys = view[pos:pos + 8 * count].cast("Q")
+        pos += 8 * count
+        self.end_ords = view[pos:pos + 4 * count].cast("i")
+        pos += 4 * count
+        self.plan_ids = view[pos:pos + 4 * count].cast("i")
+        pos += 4 * count
+        self.name_offsets = view[pos:pos + 4 * (count + 1)].cast("I")
+        pos += 4 * (count + 1)
+        self.flags = view[pos:pos + count]
+        self.names = view[pos + count:end]
+
+    def __len__(self):
+        return self.count
+
+    def get(self, user_id):
+        """Returns (name, expiry_ordinal, is_frozen, plan_id), or None if user_id is not in the snapshot."""
+        key = member_key(user_id)
+        i = bisect_left(self.keys, key)
+        if i == self.count or self.keys[i] != key:
+            return None
+        name = bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]]).decode("utf-8")
+        return name, self.end_ords[i], bool(self.flags[i]), self.plan_ids[i] or None
+
+    def close(self):
+        for view in (self.keys, self.end_ords, self.plan_ids, self.name_offsets, self.flags, self.names):
+            view.release()
+        self.map.close()
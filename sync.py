@@ -0,0 +1,102 @@
+"""Offline-first replication between terminals that each keep their own gym.db.
+
+Every mutation made through DatabaseManager is recorded in the changelog
+table with a (version, node) stamp. sync_once() exchanges only the
+changelog rows added since the previous sync with that peer, in both
+directions; on conflict the higher (version, node) wins on every node,
+so all terminals converge to the same state.
+
+The peer is any remote.py server:
+
+    python sync.py --db gym.db --peer 192.168.1.10:8765
+"""
+import argparse
+import logging
+import sqlite3
+import threading
+
+from database import DatabaseManager
+from remote import RemoteDatabase, RemoteError
+
+BATCH_SIZE = 500
+
+
+def sync_once(db, peer_db, batch_size=BATCH_SIZE):
+    """Pulls then pushes changes since the saved cursors. Returns (pulled, pushed) change counts."""
+    peer = peer_db.get_node_id()
+    pulled_cursor, pushed_cursor = db.get_sync_cursors(peer)
+    pulled = pushed = 0
+
+    while True:
+        changes, cursor = peer_db.changes_since(pulled_cursor, batch_size, exclude_node=db.node_id)
+        if cursor == pulled_cursor:
+            break
+        pulled += db.apply_changes(changes)
+        pulled_cursor = cursor
+        db.set_sync_cursors(peer, pulled=pulled_cursor)
+
+    while True:
+        changes, cursor = db.changes_since(pushed_cursor, batch_size, exclude_node=peer)
+        if cursor == pushed_cursor:
+            break
+        pushed += peer_db.apply_changes(changes)
+        pushed_cursor = cursor
+        db.set_sync_cursors(peer, pushed=pushed_cursor)
+
+    if pulled or pushed:
+        logging.info(f"Sync with {peer}: {pulled} changes received, {pushed} sent")
+    return pulled, pushed
+
+
+class SyncWorker:
+    """Syncs with a peer every interval seconds; failures (peer offline) are retried next round."""
+
+    def __init__(self, db, peer_address, interval=10):
+        self.db = db
+        self.peer_address = peer_address
+        self.interval = interval
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._run, name="sync-worker", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def _run(self):
+        peer_db = RemoteDatabase(self.peer_address)
+        while not self.stopping.is_set():
+            try:
+                sync_once(self.db, peer_db)
+            except (OSError, ValueError, sqlite3.Error, RemoteError) as e:
+                # ConnectionError is an OSError: the peer is unreachable, keep working offline;
+                # a RemoteError (e.g. the peer's database is busy) is retried next round too
+                logging.warning(f"Sync with {self.peer_address} failed: {e}")
+            self.stopping.wait(self.interval)
+        peer_db.close()
+        self.db.close_thread_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GymBase terminal sync")
+    parser.add_argument("--db", default="gym.db")
+    parser.add_argument("--peer", required=True, metavar="HOST:PORT")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    peer_db = RemoteDatabase(args.peer)
+    pulled, pushed = sync_once(db, peer_db)
+    peer_db.close()
+    db.close()
+    print(f"{pulled} changes received, {pushed} sent")
+
+
+if __name__ == "__main__":
+    main()
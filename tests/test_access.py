@@ -0,0 +1,174 @@
+import unittest
+import asyncio
+import os
+import select
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tty
+from datetime import date
+from database import DatabaseManager
+from access_log import OUTCOME_GRANTED, OUTCOME_FROZEN, OUTCOME_EXPIRED, OUTCOME_NOT_FOUND, OUTCOME_REVOKED
+from serial_manager import save_port_config
+import access
+from daemon import AccessDaemon
+
+class TestDecide(unittest.TestCase):
+    def test_outcomes(self):
+        today = date(2024, 5, 31).toordinal()
+        self.assertEqual(access.decide(None, today), OUTCOME_NOT_FOUND)
+        self.assertEqual(access.decide(("Ana", today + 1, False), today), OUTCOME_GRANTED)
+        # The expiry date itself is already expired
+        self.assertEqual(access.decide(("Ana", today, False), today), OUTCOME_EXPIRED)
+        self.assertEqual(access.decide(("Ana", today + 30, True), today), OUTCOME_FROZEN)
+
+    def test_ui_free(self):
+        # The decision path and the daemon must import without Tk
+        code = "import sys, daemon; sys.exit(any(m.split('.')[0] in ('tkinter', 'customtkinter') for m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0)
+
+class TestCheckCode(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp.name, "cards_gym.db"))
+        self.db.add_member("10", "Ana", 30, "", "", "2024-01-01", "2999-01-01")
+        self.db.add_member("11", "Beto", 30, "", "", "2024-01-01", "2024-02-01")
+        self.db.add_member("12", "Carla", 30, "", "", "2024-01-01", "2999-01-01")
+        self.db.warm_access_cache()
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_cards_stand_for_their_member(self):
+        self.assertTrue(self.db.assign_credential("04a1b2c3", "10", "Llavero"))
+        self.assertTrue(self.db.assign_credential("04D4E5F6", "10"))
+        self.assertTrue(self.db.assign_credential("77", "11"))
+        self.assertFalse(self.db.assign_credential("88", "999"))
+        self.assertEqual(access.check_code(self.db, " 04A1B2C3 ")[:2], ("10", OUTCOME_GRANTED))
+        self.assertEqual(access.check_code(self.db, "04d4e5f6")[:2], ("10", OUTCOME_GRANTED))
+        self.assertEqual(access.check_code(self.db, "77")[:2], ("11", OUTCOME_EXPIRED))
+        # Codes that are no card are member IDs
+        self.assertEqual(access.check_code(self.db, "12")[:2], ("12", OUTCOME_GRANTED))
+        self.assertEqual(access.check_code(self.db, "88")[:2], ("88", OUTCOME_NOT_FOUND))
+        self.assertEqual(sorted((uid, label, is_revoked) for uid, label, is_revoked, _, _ in self.db.get_credentials("10")),
+                         [("04A1B2C3", "Llavero", 0), ("04D4E5F6", "", 0)])
+
+    def test_changes_apply_to_the_next_scan(self):
+        self.db.assign_credential("CAFE", "10")
+        self.assertEqual(access.check_code(self.db, "CAFE")[:2], ("10", OUTCOME_GRANTED))
+        cards = self.db._credentials
+
+        self.assertTrue(self.db.revoke_credential("cafe"))
+        self.assertFalse(self.db.revoke_credential("cafe"))
+        user_id, outcome, info = access.check_code(self.db, "CAFE")
+        self.assertEqual((user_id, outcome, info[0]), ("10", OUTCOME_REVOKED, "Ana"))
+
+        # Handed to another member: reactivated for them
+        self.db.assign_credential("CAFE", "12")
+        self.assertEqual(access.check_code(self.db, "CAFE")[:2], ("12", OUTCOME_GRANTED))
+        self.assertEqual(self.db.get_credentials("10"), [])
+        self.assertIs(self.db._credentials, cards)
+
+        self.db.delete_credential("CAFE")
+        self.assertEqual(access.check_code(self.db, "CAFE")[:2], ("CAFE", OUTCOME_NOT_FOUND))
+        self.db.assign_credential("BEEF", "12")
+        self.db.delete_member("12")
+        self.assertIsNone(self.db.resolve_credential("BEEF"))
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM credentials").fetchone()[0], 0)
+
+    def test_changes_from_another_process(self):
+        self.assertIsNone(self.db.resolve_credential("CAFE"))
+        other = DatabaseManager(self.db.db_name)
+        other.assign_credential("CAFE", "10")
+        other.close()
+        self.db.warm_access_cache()
+        self.assertEqual(self.db.resolve_credential("CAFE"), ("10", False))
+
+    def test_card_uids_and_member_ids_do_not_collide(self):
+        # Scans are tried as cards first, so a card "12" would shadow member 12
+        with self.assertRaises(ValueError):
+            self.db.assign_credential("12", "10")
+        self.assertIsNone(self.db.resolve_credential("12"))
+        self.assertTrue(self.db.assign_credential("10", "10"))
+        self.db.add_member("aB12", "Mixta", 30, "", "", "2024-01-01", "2999-01-01")
+        with self.assertRaises(ValueError):
+            self.db.assign_credential("ab12", "10")
+
+        self.db.assign_credential("ABC123", "11")
+        with self.assertRaises(ValueError):
+            self.db.add_member("abc123", "Dario", 30, "", "", "2024-01-01", "2999-01-01")
+        imported, errors = self.db.bulk_add_members([
+            (1, ("ABC123", "Dario", 30, "", "", "2024-01-01", "2999-01-01", 0, None)),
+            (2, ("13", "Eva", 30, "", "", "2024-01-01", "2999-01-01", 0, None)),
+        ])
+        self.assertEqual((imported, errors), (1, [(1, "ABC123", "ID usado por una tarjeta")]))
+        self.assertIsNone(self.db.get_member("ABC123"))
+        self.assertEqual(access.check_code(self.db, "ABC123")[:2], ("11", OUTCOME_EXPIRED))
+
+@unittest.skipUnless(hasattr(os, "openpty"), "requires a POSIX pty")
+class TestAccessDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "daemon_gym.db")
+        self.device_fd, self.port_fd = os.openpty()
+        tty.setraw(self.device_fd)
+
+        db = DatabaseManager(self.db_path)
+        db.add_member("10", "Activo", 30, "", "", "2024-01-01", "2999-01-01")
+        db.add_member("11", "Vencido", 30, "", "", "2024-01-01", "2024-02-01")
+        # Readers send the card number in decimal, like any other code
+        db.assign_credential("0004123456", "10")
+        save_port_config(db, [{"port": os.ttyname(self.port_fd), "baud": 115200, "terminal": "molinete"}])
+        db.close()
+
+        self.daemon = AccessDaemon(self.db_path)
+        started = time.perf_counter()
+        self.thread = threading.Thread(target=asyncio.run, args=(self.daemon.serve(),))
+        self.thread.start()
+        while self.daemon.hub is None or not self.daemon.hub.running:
+            self.assertLess(time.perf_counter() - started, 1, "daemon took too long to start")
+            time.sleep(0.005)
+
+    def tearDown(self):
+        self.daemon.stop()
+        self.thread.join(5)
+        os.close(self.device_fd)
+        os.close(self.port_fd)
+        self.tmp.cleanup()
+
+    def read_frame(self):
+        frame = b""
+        while not frame.endswith(b"#"):
+            ready, _, _ = select.select([self.device_fd], [], [], 1)
+            if not ready:
+                return None
+            frame += os.read(self.device_fd, 1)
+        return frame
+
+    def test_decides_and_answers_turnstile(self):
+        os.write(self.device_fd, b"*10#")
+        self.assertEqual(self.read_frame(), b"*G1:0#")
+        os.write(self.device_fd, b"*11#")
+        self.assertEqual(self.read_frame(), b"*D2#")
+        os.write(self.device_fd, b"*99#")
+        self.assertEqual(self.read_frame(), b"*D3#")
+        os.write(self.device_fd, b"*0004123456#")
+        self.assertEqual(self.read_frame(), b"*G4:0#")
+
+        self.daemon.stop()
+        self.thread.join(5)
+        db = DatabaseManager(self.db_path)
+        events = sorted(db.get_access_events())
+        db.close()
+        self.assertEqual([(e[0], e[2], e[4]) for e in events],
+                         [("10", OUTCOME_GRANTED, "molinete"), ("10", OUTCOME_GRANTED, "molinete"),
+                          ("11", OUTCOME_EXPIRED, "molinete"),
+                          ("99", OUTCOME_NOT_FOUND, "molinete")])
+        self.assertTrue(all(e[5] is not None for e in events))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from database import DatabaseManager
+from access_log import AccessEventWriter, OUTCOME_GRANTED, OUTCOME_EXPIRED, SOURCE_KEYBOARD
+
+class TestAccessEventWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp.name, "events_gym.db"))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_batched_writes(self):
+        writer = AccessEventWriter(self.db, batch_size=50, flush_interval=0.5)
+        with patch.object(self.db, "add_access_events", wraps=self.db.add_access_events) as add_events:
+            writer.start()
+            for i in range(120):
+                writer.record(str(i % 3), OUTCOME_GRANTED, SOURCE_KEYBOARD, "recepcion", ts=f"2024-05-01 10:{i % 60:02d}:00")
+            writer.stop()
+
+        # Group commits: far fewer transactions than events
+        self.assertLessEqual(add_events.call_count, 4)
+        self.assertEqual(len(self.db.get_access_events(limit=1000)), 120)
+
+    def test_query_by_member_and_range(self):
+        self.db.add_access_events([
+            ("1", "2024-05-01 08:00:00", OUTCOME_GRANTED, SOURCE_KEYBOARD, "t1", None),
+            ("1", "2024-05-02 09:00:00", OUTCOME_EXPIRED, "/dev/ttyUSB0", "t1", 12.5),
+            ("2", "2024-05-02 10:00:00", OUTCOME_GRANTED, SOURCE_KEYBOARD, "t2", None),
+        ])
+        events = self.db.get_access_events(member_id="1")
+        self.assertEqual([e[1] for e in events], ["2024-05-02 09:00:00", "2024-05-01 08:00:00"])
+
+        day = self.db.get_access_events(start="2024-05-02", end="2024-05-03")
+        self.assertEqual({e[0] for e in day}, {"1", "2"})
+        self.assertEqual(day[-1][3], "/dev/ttyUSB0")
+        self.assertEqual(day[-1][5], 12.5)
+
+if __name__ == '__main__':
+    unittest.main()
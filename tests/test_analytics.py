@@ -0,0 +1,60 @@
+import unittest
+import os
+import tempfile
+from datetime import date
+from database import DatabaseManager
+from access_log import OUTCOME_GRANTED, OUTCOME_EXPIRED, OUTCOME_NOT_FOUND
+import analytics
+
+class TestAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp.name, "analytics_gym.db"))
+        self.today = date(2024, 5, 31)
+        self.db.add_member("1", "Uno", 20, "", "", "2024-01-01", "2024-12-31")
+        self.db.add_member("2", "Dos", 20, "", "", "2024-01-01", "2024-12-31")
+        self.db.add_member("3", "Tres", 20, "", "", "2024-01-01", "2024-01-31")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def record(self):
+        # Two batches, so the rollups are updated incrementally
+        self.db.add_access_events([
+            ("1", "2024-04-20 07:10:00", OUTCOME_GRANTED, "keyboard", "t1", None),
+            ("2", "2024-04-20 07:40:00", OUTCOME_GRANTED, "keyboard", "t1", None),
+            ("3", "2024-04-20 18:00:00", OUTCOME_EXPIRED, "keyboard", "t1", None),
+        ])
+        self.db.add_access_events([
+            ("1", "2024-05-31 07:05:00", OUTCOME_GRANTED, "COM3", "t1", None),  # Friday
+            ("1", "2024-05-31 19:00:00", OUTCOME_GRANTED, "COM3", "t1", None),
+            ("9", "2024-05-31 19:30:00", OUTCOME_NOT_FOUND, "COM3", "t1", None),
+        ])
+
+    def snapshot(self):
+        return {table: self.db.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall()
+                for table in analytics.ROLLUP_TABLES}
+
+    def test_incremental_matches_rebuild(self):
+        self.record()
+        incremental = self.snapshot()
+        analytics.rebuild(self.db)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_reports(self):
+        self.record()
+        self.assertEqual(analytics.daily_visits(self.db, days=1, today=self.today), [("2024-05-31", 2, 1, 1)])
+
+        heatmap = analytics.peak_hours(self.db, days=7, today=self.today)
+        self.assertEqual(heatmap[4][7], 1)
+        self.assertEqual(heatmap[4][19], 1)
+        self.assertEqual(sum(map(sum, heatmap)), 2)
+
+        # Member 1 visited recently; both 1 and 2 have current memberships
+        self.assertEqual(analytics.active_member_ratio(self.db, today=self.today), (1, 2))
+        # Member 2 came in the previous 30-day window but not the last one
+        self.assertEqual(analytics.churn(self.db, today=self.today), (1, 2))
+
+if __name__ == '__main__':
+    unittest.main()
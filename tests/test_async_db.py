@@ -0,0 +1,96 @@
+import unittest
+import os
+import queue
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+from database import DatabaseManager
+from async_db import AsyncDatabase
+
+class FakeWidget:
+    """Collects after() callbacks like the Tk event queue, to run on the test thread."""
+    def __init__(self):
+        self.events = queue.SimpleQueue()
+        self.alive = True
+
+    def after(self, ms, callback):
+        self.events.put(callback)
+
+    def winfo_exists(self):
+        return self.alive
+
+    def run_next(self, timeout=5):
+        self.events.get(timeout=timeout)()
+
+class TestAsyncDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp.name, "async_gym.db"))
+        self.db.add_member("1", "Ana Pérez", 30, "", "", "2024-01-01", "2030-01-01")
+        self.adb = AsyncDatabase(self.db)
+        self.widget = FakeWidget()
+
+    def tearDown(self):
+        self.adb.shutdown()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_results_arrive_through_after(self):
+        results = []
+        self.adb.then(self.adb.get_member("1"), self.widget, results.append)
+        self.assertEqual(results, [])
+        self.widget.run_next()
+        self.assertEqual(results[0][1], "Ana Pérez")
+
+    def test_calls_do_not_block_the_caller(self):
+        original = self.db.toggle_freeze
+
+        def slow_toggle(user_id):
+            time.sleep(0.3)
+            return original(user_id)
+
+        with patch.object(self.db, "toggle_freeze", slow_toggle):
+            start = time.perf_counter()
+            future = self.adb.toggle_freeze("1")
+            self.assertLess(time.perf_counter() - start, 0.05)
+            self.assertFalse(future.done())
+            future.result(timeout=5)
+        self.assertEqual(self.db.get_member("1")[7], 1)
+
+    def test_errors_go_to_on_error(self):
+        errors = []
+        self.adb.then(self.adb.submit(self.db.execute, "SELECT * FROM missing_table"), self.widget,
+                      lambda result: self.fail("no result expected"), on_error=errors.append)
+        self.widget.run_next()
+        self.assertIn("missing_table", str(errors[0]))
+
+    def test_destroyed_widget_is_skipped(self):
+        results = []
+        gate = threading.Event()
+        future = self.adb.submit(gate.wait)
+        self.adb.then(future, self.widget, results.append)
+        self.widget.alive = False
+        gate.set()
+        self.widget.run_next()
+        self.assertEqual(results, [])
+
+    def test_ordered_calls_complete_in_order(self):
+        finished = []
+
+        def call(i):
+            time.sleep(0.02 if i == 0 else 0)
+            finished.append(i)
+            return i
+
+        futures = [self.adb.submit_ordered(call, i) for i in range(5)]
+        self.assertEqual([f.result(timeout=5) for f in futures], list(range(5)))
+        self.assertEqual(finished, list(range(5)))
+
+    def test_queries_run_off_the_calling_thread(self):
+        caller = threading.get_ident()
+        future = self.adb.submit(threading.get_ident)
+        self.assertNotEqual(future.result(timeout=5), caller)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,11 @@
 import unittest
 import os
 import sqlite3
+import tempfile
+import threading
 from datetime import datetime, timedelta
+from unittest.mock import patch
+import database
 from database import DatabaseManager
 
 class TestDatabaseManager(unittest.TestCase):
@@ -52,6 +56,22 @@ class TestDatabaseManager(unittest.TestCase):
         results_id = self.db.search_members("201")
         self.assertEqual(len(results_id), 1)
 
+    def test_search_accents_and_prefix(self):
+        self.db.add_member("211", "José Pérez", 30, "", "")
+        self.db.add_member("212", "JOSEFINA Gómez", 30, "", "")
+        self.db.add_member("213", "Ana Jiménez", 30, "", "")
+
+        self.assertEqual({m[0] for m in self.db.search_members("jose")}, {"211", "212"})
+        self.assertEqual([m[0] for m in self.db.search_members("jose perez")], ["211"])
+        self.assertEqual([m[0] for m in self.db.search_members("jimen")], ["213"])
+        self.assertEqual(self.db.count_members("gomez"), 1)
+
+        # Index follows renames and deletes
+        self.db.update_member("213", "Ana Castro", 30, "", "")
+        self.assertEqual(self.db.search_members("jimenez"), [])
+        self.db.delete_member("211")
+        self.assertEqual([m[0] for m in self.db.search_members("jose")], ["212"])
+
     def test_config(self):
         self.db.set_config("gym_name", "SuperGym")
         val = self.db.get_config("gym_name")
@@ -95,5 +115,256 @@ class TestDatabaseManager(unittest.TestCase):
         member = self.db.get_member("501")
         self.assertIsNone(member)
 
+    def test_connections_per_thread(self):
+        import threading
+        self.db.add_member("601", "Thread Test", 20, "", "")
+
+        results = {}
+        def worker():
+            results["member"] = self.db.get_member("601")
+            results["conn"] = self.db._conn()
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+
+        self.assertEqual(results["member"][1], "Thread Test")
+        self.assertIsNot(results["conn"], self.db._conn())
+        mode = self.db._conn().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_reconnect_after_close(self):
+        self.db.add_member("701", "Reopen", 20, "", "")
+        self.db.close()
+        self.assertEqual(self.db.get_member("701")[1], "Reopen")
+
+    def test_access_cache_write_through(self):
+        self.db.add_member("801", "Cache Test", 20, "", "", "2024-01-01", "2024-02-01")
+        self.db.warm_access_cache()
+        name, end_ord, is_frozen, plan_id = self.db.get_access_info("801")
+        self.assertEqual(name, "Cache Test")
+        self.assertEqual(end_ord, datetime(2024, 2, 1).toordinal())
+        self.assertFalse(is_frozen)
+        self.assertIsNone(plan_id)
+
+        self.db.update_member("801", "Renamed", 20, "", "")
+        self.db.set_membership_expiry("801", "2030-01-01")
+        self.db.toggle_freeze("801")
+        self.assertEqual(self.db.get_access_info("801"), ("Renamed", datetime(2030, 1, 1).toordinal(), True, None))
+        self.db.set_member_plan("801", 3)
+        self.assertEqual(self.db.get_access_info("801")[3], 3)
+
+        self.db.add_member("802", "Late Join", 20, "", "")
+        self.assertIsNotNone(self.db.get_access_info("802"))
+
+        self.db.delete_member("801")
+        self.assertIsNone(self.db.get_access_info("801"))
+
+    def test_members_page(self):
+        for i in range(25):
+            self.db.add_member(f"9{i:02d}", f"Page {i}", 20, "", "")
+
+        self.assertEqual(self.db.count_members(), 25)
+        first = self.db.get_members_page(0, 10)
+        last = self.db.get_members_page(20, 10)
+        self.assertEqual([m[0] for m in first], [f"9{i:02d}" for i in range(10)])
+        self.assertEqual(len(last), 5)
+
+        self.assertEqual(self.db.count_members("Page 1"), 11)
+        self.assertEqual(len(self.db.get_members_page(0, 100, "Page 1")), 11)
+
+    def test_cancel_when(self):
+        slow_query = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 1000000) SELECT COUNT(*) FROM n"
+        with self.db.cancel_when(lambda: True):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.db._conn().execute(slow_query).fetchone()
+        # Handler is removed afterwards
+        self.assertEqual(self.db._conn().execute(slow_query).fetchone()[0], 1000000)
+
+    def test_status_queries(self):
+        today = datetime.now()
+        day = lambda offset: (today + timedelta(days=offset)).strftime("%Y-%m-%d")
+        self.db.add_member("1001", "Active", 20, "", "", day(-10), day(30))
+        self.db.add_member("1002", "Expiring", 20, "", "", day(-10), day(3))
+        self.db.add_member("1003", "Expired", 20, "", "", day(-40), day(-1))
+        self.db.add_member("1004", "Frozen", 20, "", "", day(-10), day(30))
+        self.db.toggle_freeze("1004")
+
+        self.assertEqual(self.db.count_by_status(), {
+            database.STATUS_ACTIVE: 2, database.STATUS_EXPIRING: 1,
+            database.STATUS_EXPIRED: 1, database.STATUS_FROZEN: 1})
+        self.assertEqual(self.db.get_members_page(0, 10, status=database.STATUS_EXPIRING), [("1002", "Expiring", day(3), "active")])
+        self.assertEqual([m[3] for m in self.db.get_members_page(0, 10)], ["active", "active", "expired", "frozen"])
+
+        # Expiry changes keep end_ord (and so the status) in sync
+        self.db.set_membership_expiry("1003", day(60))
+        self.assertEqual(self.db.count_members("expired", database.STATUS_ACTIVE), 1)
+        self.assertEqual(self.db.count_members(status=database.STATUS_EXPIRED), 0)
+
+    def test_refresh_reads_only_what_changed(self):
+        # Its own file: clear_db() removed the node id another manager would need
+        self.db.close()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "refresh_gym.db")
+        self.db = DatabaseManager(path)
+        self.db.add_member("1201", "Uno", 20, "", "", "2024-01-01", "2030-01-01")
+        self.db.add_member("1202", "Dos", 20, "", "", "2024-01-01", "2030-01-01")
+        self.db.assign_credential("555", "1201")
+        self.db.warm_access_cache()
+        cards, plans = self.db._credentials, self.db.access_plans()
+        self.db.visits_used("1201", 1)
+
+        # Another process renews one member and records events: only that member is re-read
+        other = DatabaseManager(path)
+        other.set_membership_expiry("1202", "2031-01-01")
+        other.add_access_events([("1201", "2024-05-01 09:00:00", "granted", "keyboard", "t", None)])
+        other.close()
+        self.db.refresh_access_cache()
+        self.assertEqual(self.db.get_access_info("1202")[1], datetime(2031, 1, 1).toordinal())
+        self.assertIs(self.db._credentials, cards)
+        self.assertIs(self.db.access_plans(), plans)
+        self.assertIn("1201", self.db._visit_counts)
+
+        # Cards and plans are reloaded once their tables changed
+        other = DatabaseManager(path)
+        other.revoke_credential("555")
+        other.delete_member("1202")
+        other.close()
+        self.db.refresh_access_cache()
+        self.assertEqual(self.db.resolve_credential("555"), ("1201", True))
+        self.assertIsNone(self.db.get_access_info("1202"))
+        self.assertIs(self.db.access_plans(), plans)
+
+    def test_bulk_operations(self):
+        from dateutil.relativedelta import relativedelta
+        today = datetime.now()
+        day = lambda offset: (today + timedelta(days=offset)).strftime("%Y-%m-%d")
+        self.db.add_member("1101", "Active", 20, "", "", day(-10), "2030-01-31")
+        self.db.add_member("1102", "Expired", 20, "", "", day(-40), day(-5))
+        self.db.add_member("1103", "Frozen", 20, "", "", day(-10), day(20))
+        self.db.toggle_freeze("1103")
+        self.db.warm_access_cache()
+
+        # Dry run counts without changing anything
+        self.assertEqual(self.db.bulk_extend(relativedelta(months=1), status=database.STATUS_ACTIVE, dry_run=True), 1)
+        self.assertEqual(self.db.get_member("1101")[6], "2030-01-31")
+
+        self.assertEqual(self.db.bulk_extend(relativedelta(months=1), ids=["1101", "1102"]), 2)
+        self.assertEqual(self.db.get_member("1101")[6], "2030-02-28")
+        self.assertEqual(self.db.get_member("1102")[6], (today.date() + relativedelta(months=1)).isoformat())
+
+        self.assertEqual(self.db.bulk_freeze(), 2)
+        self.assertTrue(self.db.get_access_info("1101")[2])
+
+        # Pretend 1103 was frozen 5 days ago
+        self.db.execute("UPDATE members SET frozen_date = ? WHERE id = '1103'", (day(-5),)).connection.commit()
+        self.assertEqual(self.db.bulk_unfreeze(ids=["1103"]), 1)
+        self.assertEqual(self.db.get_member("1103")[6], day(25))
+        self.assertEqual(self.db.count_members(status=database.STATUS_FROZEN), 2)
+
+        self.assertEqual(self.db.bulk_set_expiry("2031-01-01", status=database.STATUS_FROZEN), 2)
+        self.assertEqual(self.db.count_members(status=database.STATUS_FROZEN), 0)
+        self.assertEqual(self.db.get_access_info("1102")[1], datetime(2031, 1, 1).toordinal())
+
+    def hold_writer(self):
+        # Queues a write that blocks the writer thread until the returned event is set
+        gate, running = threading.Event(), threading.Event()
+        self.db.submit_write(lambda conn: running.set() or gate.wait(5))
+        running.wait(5)
+        return gate
+
+    def test_queued_writes_share_one_commit(self):
+        batches = []
+        commit = database.WriteQueue._commit
+
+        def record(writer, conn, batch):
+            batches.append(len(batch))
+            commit(writer, conn, batch)
+
+        with patch.object(database.WriteQueue, "_commit", record):
+            gate = self.hold_writer()
+            futures = [self.db.submit_write(self.db._set_config, f"key_{i}", str(i)) for i in range(50)]
+            gate.set()
+            for future in futures:
+                future.result(timeout=5)
+        self.assertEqual(batches, [1, 50])
+        self.assertEqual(self.db.get_config("key_49"), "49")
+
+    def test_failed_write_is_rolled_back_alone(self):
+        self.db.add_member("901", "Original", 20, "", "")
+        gate = self.hold_writer()
+        before = self.db.submit_write(self.db._set_membership_expiry, "901", "2030-01-01")
+        duplicate = self.db.submit_write(self.db._insert_member, ("901", "Dup", 1, "", "", "2024-01-01", "2024-02-01"))
+        after = self.db.submit_write(self.db._insert_member, ("902", "Next", 1, "", "", "2024-01-01", "2024-02-01"))
+        gate.set()
+        self.assertIsInstance(duplicate.exception(timeout=5), sqlite3.IntegrityError)
+        before.result(timeout=5)
+        after.result(timeout=5)
+        self.assertEqual(self.db.get_member("901")[1], "Original")
+        self.assertEqual(self.db.get_member("901")[6], "2030-01-01")
+        self.assertEqual(self.db.get_member("902")[1], "Next")
+        self.assertFalse(self.db.add_member("901", "Again", 20, "", ""))
+
+    def test_locked_database_fails_the_queued_writes(self):
+        # Another process holds the write lock past the busy timeout: BEGIN IMMEDIATE fails
+        self.db.submit_write(lambda conn: conn.execute("PRAGMA busy_timeout = 50")).result(timeout=5)
+        other = sqlite3.connect(self.db.db_name, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            future = self.db.submit_write(self.db._set_config, "gym_name", "Locked")
+            self.assertIsInstance(future.exception(timeout=5), sqlite3.OperationalError)
+            self.assertFalse(self.db.add_member("903", "Bloqueado", 20, "", ""))
+        finally:
+            other.rollback()
+            other.close()
+        self.assertTrue(self.db.add_member("903", "Desbloqueado", 20, "", ""))
+
+    def test_concurrent_writers(self):
+        errors = []
+
+        def worker(k):
+            try:
+                for i in range(50):
+                    self.db.add_member(f"{k}-{i}", f"Member {k} {i}", 20, "", "")
+                    self.db.toggle_freeze(f"{k}-{i}")
+            except sqlite3.Error as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(k,)) for k in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        count, frozen = self.db.execute("SELECT COUNT(*), SUM(is_frozen) FROM members").fetchone()
+        self.assertEqual((count, frozen), (400, 400))
+
+    def test_close_commits_queued_writes(self):
+        gate = self.hold_writer()
+        future = self.db.submit_write(self.db._set_config, "gym_name", "Queued")
+        threading.Timer(0.05, gate.set).start()
+        self.db.close()
+        self.assertTrue(future.done())
+        self.assertEqual(self.db.get_config("gym_name"), "Queued")
+
+    def test_migrates_existing_database(self):
+        legacy_name = "test_legacy_gym.db"
+        conn = sqlite3.connect(legacy_name)
+        conn.execute("CREATE TABLE members (id TEXT PRIMARY KEY, name TEXT NOT NULL, age INTEGER, address TEXT, phone TEXT, "
+                     "registration_date TEXT, membership_end_date TEXT, is_frozen INTEGER DEFAULT 0, frozen_date TEXT)")
+        conn.execute("INSERT INTO members (id, name, membership_end_date) VALUES ('1', 'Old Member', '2024-02-29')")
+        conn.commit()
+        conn.close()
+        try:
+            legacy = DatabaseManager(legacy_name)
+            self.assertEqual(legacy.execute("PRAGMA user_version").fetchone()[0], len(database.MIGRATIONS))
+            self.assertEqual(legacy.execute("SELECT end_ord FROM members").fetchone()[0], datetime(2024, 2, 29).toordinal())
+            self.assertEqual(legacy.search_members("old")[0][0], "1")
+            legacy.close()
+            # Re-opening is a no-op
+            DatabaseManager(legacy_name).close()
+        finally:
+            os.remove(legacy_name)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+from unittest.mock import patch
+from logging.handlers import RotatingFileHandler
+from database import DatabaseManager
+from access_log import AccessEventWriter, OUTCOME_GRANTED, SOURCE_KEYBOARD
+import logging_setup
+
+class TestLoggingSetup(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = logging.getLogger()
+        self.saved = (root.handlers[:], root.level)
+
+    def tearDown(self):
+        logging_setup.stop_logging()
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        for handler in logging_setup.ACCESS_LOG.handlers[:]:
+            logging_setup.ACCESS_LOG.removeHandler(handler)
+        root.handlers[:], level = self.saved
+        root.setLevel(level)
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_rotation_is_compressed_and_bounded(self):
+        logging_setup.setup_logging(self.path("gym.log"), max_bytes=20000, backups=3)
+        for i in range(5000):
+            logging.info(f"Access GRANTED for user: {i:08d} (Miembro de prueba)")
+        logging_setup.stop_logging()
+
+        files = sorted(os.listdir(self.tmp.name))
+        self.assertEqual(files, ["gym.log", "gym.log.1.gz", "gym.log.2.gz", "gym.log.3.gz"])
+        with gzip.open(self.path("gym.log.1.gz"), "rt", encoding="utf-8") as f:
+            self.assertIn("Access GRANTED for user", f.readline())
+        self.assertLessEqual(os.path.getsize(self.path("gym.log")), 20000)
+
+    def test_callers_do_not_wait_for_the_disk(self):
+        logging_setup.setup_logging(self.path("gym.log"))
+        original_emit = RotatingFileHandler.emit
+        writers = set()
+
+        def recording_emit(handler, record):
+            writers.add(threading.current_thread())
+            original_emit(handler, record)
+
+        with patch.object(RotatingFileHandler, "emit", recording_emit):
+            for i in range(200):
+                logging.info(f"scan {i}")
+            logging_setup.stop_logging()
+
+        # The file is written by the listener thread alone
+        self.assertTrue(writers)
+        self.assertNotIn(threading.current_thread(), writers)
+        with open(self.path("gym.log"), encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 200)
+
+    def test_json_access_log(self):
+        logging_setup.setup_logging(self.path("gym.log"), access_json=self.path("access.jsonl"))
+        db = DatabaseManager(self.path("gym.db"))
+        writer = AccessEventWriter(db, flush_interval=0.05)
+        writer.start()
+        writer.record("42", OUTCOME_GRANTED, SOURCE_KEYBOARD, "recepcion", ts="2024-05-01 10:00:00", latency_ms=3.5)
+        writer.record("43", OUTCOME_GRANTED, "/dev/ttyUSB0", "entrada", ts="2024-05-01 10:00:01")
+        writer.stop()
+        logging.info("not an access record")
+        logging_setup.stop_logging()
+        db.close()
+
+        with open(self.path("access.jsonl"), encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(records[0], {"ts": "2024-05-01 10:00:00", "member_id": "42", "outcome": "granted",
+                                      "source": "keyboard", "terminal": "recepcion", "latency_ms": 3.5})
+        self.assertEqual([r["member_id"] for r in records], ["42", "43"])
+        with open(self.path("gym.log"), encoding="utf-8") as f:
+            text = f.read()
+        self.assertIn("not an access record", text)
+        self.assertNotIn('"member_id"', text)
+
+    def test_access_json_is_off_by_default(self):
+        logging_setup.setup_logging(self.path("gym.log"))
+        self.assertEqual(logging_setup.ACCESS_LOG.handlers, [])
+        logging_setup.log_access_event("1", "2024-05-01 10:00:00", OUTCOME_GRANTED, SOURCE_KEYBOARD, "t", None)
+        logging_setup.stop_logging()
+        self.assertEqual(os.listdir(self.tmp.name), ["gym.log"])
+
+if __name__ == '__main__':
+    unittest.main()
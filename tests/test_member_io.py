@@ -0,0 +1,75 @@
+import unittest
+import os
+import json
+import tempfile
+from database import DatabaseManager
+import member_io
+
+class TestMemberIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp.name, "io_gym.db"))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_import_csv_reports_bad_rows(self):
+        self.db.add_member("1", "Existing", 30, "", "")
+        path = self.write("members.csv",
+                          "id,name,age,address,phone,registration_date,membership_end_date\n"
+                          "10,José Pérez,30,Calle 1,555,2024-01-01,2024-06-01\n"
+                          "1,Duplicate,20,,,,\n"
+                          ",No Id,20,,,,\n"
+                          "11,Bad Date,20,,,2024-13-45,\n"
+                          "12,Defaults,,,,2024-01-01,\n")
+        progress = []
+        report = member_io.import_members(self.db, path, progress=lambda done, total: progress.append(done), chunk_size=2)
+
+        self.assertEqual(report.total, 5)
+        self.assertEqual(report.imported, 2)
+        self.assertEqual([(line, uid) for line, uid, _ in report.errors], [(3, "1"), (4, ""), (5, "11")])
+        self.assertEqual(progress[-1], 5)
+        self.assertEqual(self.db.get_member("10")[6], "2024-06-01")
+        self.assertEqual(self.db.get_member("12")[6], "2024-01-31")
+        self.assertEqual(self.db.search_members("jose")[0][0], "10")
+
+    def test_import_jsonl_skips_unreadable_lines(self):
+        path = self.write("members.jsonl",
+                          '{"id": "20", "name": "Primera"}\n'
+                          '{"id": "21", "name": \n'
+                          '["22", "Lista"]\n'
+                          '\n'
+                          '{"id": "23", "name": "Última"}\n')
+        report = member_io.import_members(self.db, path)
+
+        self.assertEqual((report.total, report.imported), (4, 2))
+        self.assertEqual([(line, uid) for line, uid, _ in report.errors], [(2, ""), (3, "")])
+        self.assertIsNotNone(self.db.get_member("23"))
+
+    def test_export_round_trip(self):
+        for i in range(7):
+            self.db.add_member(str(i), f"Miembro {i}", 20 + i, "", "", "2024-01-01", "2024-03-01")
+        self.db.toggle_freeze("3")
+
+        for ext in ("csv", "json", "jsonl"):
+            path = os.path.join(self.tmp.name, f"export.{ext}")
+            self.assertEqual(member_io.export_members(self.db, path), 7)
+
+            target = DatabaseManager(os.path.join(self.tmp.name, f"copy_{ext}.db"))
+            report = member_io.import_members(target, path)
+            self.assertEqual((report.imported, report.errors), (7, []))
+            self.assertEqual(target.get_member("3"), self.db.get_member("3"))
+            target.close()
+
+        with open(os.path.join(self.tmp.name, "export.json"), encoding="utf-8") as f:
+            self.assertEqual(len(json.load(f)), 7)
+
+if __name__ == '__main__':
+    unittest.main()
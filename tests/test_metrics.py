@@ -0,0 +1,84 @@
+import unittest
+import os
+import random
+import tempfile
+import threading
+import time
+from metrics import Histogram, Metrics, ScanTimer
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles_within_a_bucket(self):
+        rng = random.Random(7)
+        samples = [rng.lognormvariate(0, 1) for _ in range(10000)]
+        histogram = Histogram()
+        for ms in samples:
+            histogram.record(ms)
+        samples.sort()
+        for q in (0.5, 0.95, 0.99):
+            exact = samples[int(q * len(samples)) - 1]
+            self.assertAlmostEqual(histogram.quantile(q) / exact, 1, delta=0.11)
+        self.assertEqual(histogram.summary()["max_ms"], samples[-1])
+        self.assertEqual(histogram.summary()["count"], 10000)
+
+    def test_empty(self):
+        self.assertEqual(Histogram().summary()["p99_ms"], 0.0)
+
+class TestMetrics(unittest.TestCase):
+    def test_concurrent_observe(self):
+        metrics = Metrics()
+
+        def worker():
+            for i in range(5000):
+                metrics.observe("lookup", 0.01 * (i % 10 + 1))
+                metrics.incr("scans")
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        histograms, counters = metrics.snapshot()
+        self.assertEqual(histograms["lookup"]["count"], 20000)
+        self.assertEqual(counters["scans"], 20000)
+
+    def test_scan_timer_stages_and_slow_log(self):
+        metrics = Metrics(slow_ms=5)
+        timer = ScanTimer("123", time.perf_counter() - 0.002, metrics=metrics)
+        timer.mark("serial")
+        timer.mark("ui")
+        time.sleep(0.01)
+        timer.mark("lookup")
+        timer.mark("ui")
+        with self.assertLogs(level="WARNING") as logs:
+            total = timer.finish("granted")
+        self.assertGreater(total, 10)
+        self.assertIn("Slow scan", logs.output[0])
+        self.assertIn("lookup", logs.output[0])
+
+        histograms, counters = metrics.snapshot()
+        # Known stages in pipeline order; repeated stages count once per scan
+        self.assertEqual(list(histograms), ["serial", "lookup", "ui", "total"])
+        self.assertEqual(histograms["ui"]["count"], 1)
+        self.assertGreaterEqual(histograms["serial"]["max_ms"], 2)
+        self.assertEqual(counters, {"access_granted": 1, "scans": 1, "slow_scans": 1})
+
+    def test_export_text(self):
+        metrics = Metrics()
+        for ms in (1, 2, 3, 50):
+            metrics.observe("lookup", ms)
+        metrics.incr("scans", 4)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "metrics.txt")
+            metrics.write(path)
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        self.assertIn('gymbase_stage_ms_count{stage="lookup"} 4', text)
+        self.assertIn('gymbase_stage_ms_max{stage="lookup"} 50.0000', text)
+        self.assertIn('gymbase_stage_ms{stage="lookup",quantile="0.99"}', text)
+        self.assertIn('gymbase_events_total{name="scans"} 4', text)
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), ({}, {}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import os
+import tempfile
+from datetime import date, datetime
+import plans
+import access
+from access_log import (OUTCOME_GRANTED, OUTCOME_EXPIRED, OUTCOME_OUT_OF_HOURS, OUTCOME_NO_VISITS,
+                        SOURCE_KEYBOARD)
+from database import DatabaseManager
+
+# A Monday
+MONDAY = datetime(2024, 5, 27, 9, 30)
+
+class TestCompilePlan(unittest.TestCase):
+    def test_windows_and_weekdays(self):
+        plan = plans.compile_plan(1, "Mañanas", 1, 0, {"hours": [["06:00", "12:00"]], "weekdays": [0, 1, 2, 3, 4]})
+        self.assertEqual(len(plan.minutes), plans.MINUTES_PER_WEEK)
+        self.assertTrue(plan.minutes[plans.minute_of_week(MONDAY)])
+        self.assertFalse(plan.minutes[plans.minute_of_week(MONDAY.replace(hour=12, minute=0))])
+        self.assertTrue(plan.minutes[plans.minute_of_week(MONDAY.replace(hour=11, minute=59))])
+        saturday = datetime(2024, 6, 1, 9, 30)
+        self.assertFalse(plan.minutes[plans.minute_of_week(saturday)])
+
+    def test_window_across_midnight(self):
+        plan = plans.compile_plan(1, "Noche", 1, 0, '{"hours": [["22:00", "02:00"]]}')
+        self.assertTrue(plan.minutes[plans.minute_of_week(MONDAY.replace(hour=23))])
+        self.assertTrue(plan.minutes[plans.minute_of_week(MONDAY.replace(hour=1))])
+        self.assertFalse(plan.minutes[plans.minute_of_week(MONDAY.replace(hour=3))])
+
+    def test_no_rules_means_any_time(self):
+        plan = plans.compile_plan(1, "1 Mes", 1, 0, "{}")
+        self.assertIsNone(plan.minutes)
+        self.assertIsNone(plan.visits)
+        self.assertEqual(plan.grace_days, 0)
+        # Every day selected is the same as no weekday rule
+        self.assertIsNone(plans.compile_plan(1, "x", 1, 0, {"weekdays": list(range(7))}).minutes)
+
+    def test_invalid_rules(self):
+        for rules in ({"hours": [["25:00", "26:00"]]}, {"hours": [["08:00", "08:00"]]}, {"weekdays": []},
+                      {"weekdays": [7]}, {"visits": 0}, {"grace_days": -1}, {"price": 10}):
+            with self.assertRaises(ValueError, msg=rules):
+                plans.validate_rules(rules)
+        self.assertEqual(plans.parse_hours("06:00-12:00, 18:00-22:00"), [["06:00", "12:00"], ["18:00", "22:00"]])
+        with self.assertRaises(ValueError):
+            plans.parse_hours("6 a 12")
+
+    def test_period_start(self):
+        plan = plans.compile_plan(1, "10 visitas", 1, 0, {"visits": 10})
+        self.assertEqual(plan.period_start(date(2024, 3, 31).toordinal()), date(2024, 2, 29).toordinal())
+        plan = plans.compile_plan(1, "Semana", 0, 7, {})
+        self.assertEqual(plan.period_start(date(2024, 3, 31).toordinal()), date(2024, 3, 24).toordinal())
+
+class TestDecideWithPlans(unittest.TestCase):
+    def test_outcomes(self):
+        today = MONDAY.toordinal()
+        minute = plans.minute_of_week(MONDAY)
+        info = ("Ana", today + 10, False, 1)
+        evenings = plans.compile_plan(1, "Tardes", 1, 0, {"hours": [["17:00", "22:00"]]})
+        self.assertEqual(access.decide(info, today, evenings, minute), OUTCOME_OUT_OF_HOURS)
+        self.assertEqual(access.decide(info, today, evenings, minute + 9 * 60), OUTCOME_GRANTED)
+
+        pass_10 = plans.compile_plan(2, "10 visitas", 1, 0, {"visits": 10})
+        self.assertEqual(access.decide(info, today, pass_10, minute, visits_used=9), OUTCOME_GRANTED)
+        self.assertEqual(access.decide(info, today, pass_10, minute, visits_used=10), OUTCOME_NO_VISITS)
+
+        grace = plans.compile_plan(3, "Gracia", 1, 0, {"grace_days": 3})
+        self.assertEqual(access.decide(("Ana", today - 2, False, 3), today, grace, minute), OUTCOME_GRANTED)
+        self.assertEqual(access.decide(("Ana", today - 3, False, 3), today, grace, minute), OUTCOME_EXPIRED)
+        self.assertEqual(access.decide(("Ana", today, False, None), today), OUTCOME_EXPIRED)
+
+class TestPlansInDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp.name, "plans_gym.db"))
+        self.db.add_member("1", "Ana", 30, "", "", "2024-05-01", "2024-06-15")
+        self.db.warm_access_cache()
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_default_plans(self):
+        self.assertEqual([(name, months, days) for _, name, months, days, _ in self.db.get_plans()],
+                         list(plans.DEFAULT_PLANS))
+        self.assertEqual(access.check(self.db, "1", now=MONDAY)[0], OUTCOME_GRANTED)
+
+    def test_rules_are_compiled_once(self):
+        plan_id = self.db.save_plan("Tardes", 1, 0, {"hours": [["17:00", "22:00"]]})
+        self.db.set_member_plan("1", plan_id)
+        compiled = self.db.access_plans()
+        self.assertEqual(access.check(self.db, "1", now=MONDAY)[0], OUTCOME_OUT_OF_HOURS)
+        self.assertIs(self.db.access_plans(), compiled)
+
+        self.db.save_plan("Tardes", 1, 0, {}, plan_id)
+        self.assertIsNot(self.db.access_plans(), compiled)
+        self.assertEqual(access.check(self.db, "1", now=MONDAY)[0], OUTCOME_GRANTED)
+
+        self.db.set_member_plan("1", plan_id)
+        self.db.delete_plan(plan_id)
+        self.assertIsNone(self.db.get_access_info("1")[3])
+        self.assertIsNone(self.db.get_member("1")[10])
+
+    def test_visit_quota(self):
+        plan_id = self.db.save_plan("3 visitas", 1, 0, {"visits": 3})
+        self.db.set_membership_expiry("1", "2024-06-15", plan_id)
+        # Visits before the period (2024-05-15 .. 2024-06-15) do not count
+        self.db.add_access_events([("1", "2024-05-10 09:00:00", OUTCOME_GRANTED, SOURCE_KEYBOARD, "t", None)])
+        for day in (20, 21):
+            outcome, _ = access.check(self.db, "1", now=MONDAY)
+            self.assertEqual(outcome, OUTCOME_GRANTED)
+            self.db.add_access_events([("1", f"2024-05-{day} 09:00:00", outcome, SOURCE_KEYBOARD, "t", None)])
+        self.assertEqual(self.db.visits_used("1", plans.add_months(date(2024, 6, 15), -1).toordinal()), 2)
+        # A grant counts as soon as it is decided, before its event is written
+        self.assertEqual(access.check(self.db, "1", now=MONDAY)[0], OUTCOME_GRANTED)
+        self.assertEqual(access.check(self.db, "1", now=MONDAY)[0], OUTCOME_NO_VISITS)
+        self.db.add_access_events([("1", "2024-05-22 09:00:00", OUTCOME_GRANTED, SOURCE_KEYBOARD, "t", None)])
+        self.assertEqual(access.check(self.db, "1", now=MONDAY)[0], OUTCOME_NO_VISITS)
+
+        # Renewing starts a new period
+        self.db.set_membership_expiry("1", "2024-07-15", plan_id)
+        self.assertEqual(access.check(self.db, "1", now=MONDAY)[0], OUTCOME_GRANTED)
+
+    def test_invalid_plan_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.db.save_plan("Mal", 1, 0, {"hours": [["8", "12"]]})
+        self.assertEqual(len(self.db.get_plans()), len(plans.DEFAULT_PLANS))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import unittest
+import asyncio
+import os
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from dateutil.relativedelta import relativedelta
+from database import DatabaseManager
+from access_log import AccessEventWriter, OUTCOME_GRANTED, OUTCOME_OUT_OF_HOURS, SOURCE_KEYBOARD
+from remote import AccessServer, RemoteDatabase
+import access
+import member_io
+
+class TestRemoteDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp.name, "server_gym.db"))
+        self.loop = asyncio.new_event_loop()
+        self.server = AccessServer(self.db, "127.0.0.1", 0)
+        port = self.loop.run_until_complete(self.server.start())
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self.server.serve_forever(),))
+        self.thread.start()
+        self.remote = RemoteDatabase(f"127.0.0.1:{port}", local_config=os.path.join(self.tmp.name, "terminal.json"))
+
+    def tearDown(self):
+        self.remote.close()
+        self.loop.call_soon_threadsafe(self.server.server.close)
+        self.thread.join(5)
+        self.loop.close()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_members_round_trip(self):
+        self.assertTrue(self.remote.add_member("1", "Ana Pérez", 30, "Calle 1", "555", "2024-01-01", "2999-01-01"))
+        self.assertFalse(self.remote.add_member("1", "Duplicada", 30, "", ""))
+        self.assertEqual(self.remote.get_member("1")[1], "Ana Pérez")
+        self.assertEqual(access.check(self.remote, "1")[0], OUTCOME_GRANTED)
+        self.assertEqual(self.remote.count_members("ana"), 1)
+        self.assertEqual(self.remote.get_members_page(0, 10, "perez")[0][0], "1")
+
+        self.remote.toggle_freeze("1")
+        self.assertTrue(self.db.get_access_info("1")[2])
+        self.remote.delete_member("1")
+        self.assertIsNone(self.remote.get_access_info("1"))
+
+    def test_plans_are_compiled_locally(self):
+        self.db.add_member("1", "Ana", 30, "", "", "2024-01-01", "2999-01-01")
+        plan_id = self.remote.save_plan("Mañanas", 1, 0, {"hours": [["06:00", "12:00"]]})
+        self.remote.set_member_plan("1", plan_id)
+        compiled = self.remote.access_plans()
+        self.assertEqual(compiled[plan_id].name, "Mañanas")
+        self.assertIs(self.remote.access_plans(), compiled)
+        self.assertEqual(access.check(self.remote, "1", now=datetime(2024, 5, 27, 9, 0))[0], OUTCOME_GRANTED)
+        self.assertEqual(access.check(self.remote, "1", now=datetime(2024, 5, 27, 13, 0))[0], OUTCOME_OUT_OF_HOURS)
+        self.remote.delete_plan(plan_id)
+        self.assertNotIn(plan_id, self.remote.access_plans())
+        self.assertIsNone(self.remote.get_access_info("1")[3])
+
+    def test_cards_resolve_on_the_server(self):
+        self.db.add_member("1", "Ana", 30, "", "", "2024-01-01", "2999-01-01")
+        self.assertTrue(self.remote.assign_credential("0004123456", "1", "Llavero"))
+        self.assertEqual(access.check_code(self.remote, "0004123456")[:2], ("1", OUTCOME_GRANTED))
+        self.assertTrue(self.remote.revoke_credential("0004123456"))
+        self.assertEqual(self.db.resolve_credential("0004123456"), ("1", True))
+        self.assertEqual(self.remote.get_credentials("1")[0][:3], ["0004123456", "Llavero", 1])
+
+    def test_bulk_extend_sends_delta(self):
+        today = date.today()
+        self.db.add_member("1", "Uno", 20, "", "", today.isoformat(), (today + timedelta(days=10)).isoformat())
+        self.assertEqual(self.remote.bulk_extend(relativedelta(months=1), ids=["1"]), 1)
+        expected = (today + timedelta(days=10) + relativedelta(months=1)).isoformat()
+        self.assertEqual(self.db.get_member("1")[6], expected)
+
+    def test_errors_keep_their_type(self):
+        with self.assertRaises(ValueError):
+            self.remote.report("not_a_report")
+        with self.assertRaises(ValueError):
+            self.remote.call("execute", "DROP TABLE members")
+
+    def test_pipelining_keeps_order(self):
+        for i in range(50):
+            self.db.add_member(str(i), f"Miembro {i}", 20, "", "", "2024-01-01", "2999-01-01")
+        ids = [str(i % 60) for i in range(1000)]
+        results = self.remote.call_many([("get_access_info", (i,), {}) for i in ids])
+        self.assertEqual([r[0] if r else None for r in results],
+                         [f"Miembro {i}" if int(i) < 50 else None for i in ids])
+
+    def test_threads_share_server(self):
+        self.db.add_member("7", "Siete", 20, "", "", "2024-01-01", "2999-01-01")
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(200):
+                    self.assertEqual(self.remote.get_access_info("7")[0], "Siete")
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self.remote.close_thread_connection()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+    def test_terminal_settings_stay_local(self):
+        self.remote.set_config("gym_name", "Central")
+        self.remote.set_config("terminal_name", "Recepción 2")
+        self.assertEqual(self.db.get_config("gym_name"), "Central")
+        self.assertIsNone(self.db.get_config("terminal_name"))
+        self.assertEqual(self.remote.get_config("terminal_name"), "Recepción 2")
+
+    def test_events_and_export(self):
+        writer = AccessEventWriter(self.remote, flush_interval=0.05)
+        writer.start()
+        writer.record("1", OUTCOME_GRANTED, SOURCE_KEYBOARD, "t2", ts="2024-05-01 10:00:00")
+        writer.stop()
+        self.assertEqual(len(self.db.get_access_events()), 1)
+
+        for i in range(2500):
+            self.db.add_member(f"{i:05d}", f"M{i}", 20, "", "", "2024-01-01", "2999-01-01")
+        path = os.path.join(self.tmp.name, "export.jsonl")
+        self.assertEqual(member_io.export_members(self.remote, path), 2500)
+
+class TestSharedSecret(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.tmp.name, "secret_gym.db"))
+        self.db.add_member("1", "Ana", 30, "", "", "2024-01-01", "2999-01-01")
+        self.loop = asyncio.new_event_loop()
+        self.server = AccessServer(self.db, "127.0.0.1", 0, secret="s3creto")
+        self.address = f"127.0.0.1:{self.loop.run_until_complete(self.server.start())}"
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self.server.serve_forever(),))
+        self.thread.start()
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.server.server.close)
+        self.thread.join(5)
+        self.loop.close()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_terminals_need_the_secret(self):
+        remote = RemoteDatabase(self.address, secret="s3creto")
+        self.assertEqual(remote.get_access_info("1")[0], "Ana")
+        remote.close()
+        for secret in ("otro", ""):
+            remote = RemoteDatabase(self.address, secret=secret)
+            with self.assertRaises(OSError):
+                remote.delete_member("1")
+            remote.close()
+        self.assertIsNotNone(self.db.get_member("1"))
+
+    def test_network_listening_requires_a_secret(self):
+        with self.assertRaises(ValueError):
+            AccessServer(self.db, "0.0.0.0", 0)
+        self.assertEqual(AccessServer(self.db).host, "127.0.0.1")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,13 @@
 import unittest
 from unittest.mock import MagicMock, patch
+import os
+import random
+import select
+import threading
+import time
+import tty
 import serial
-from serial_manager import SerialManager
+from serial_manager import SerialManager, FrameParser, SerialHub
 
 class TestSerialManager(unittest.TestCase):
     @patch('serial.Serial')
@@ -39,7 +45,8 @@ class TestSerialManager(unittest.TestCase):
         # Simulate: * 1 2 3 # then nothing
         # read() returns bytes or str depending on implementation but code assumes decode(), so bytes
         iterator = iter([b'*', b'1', b'2', b'3', b'#', b'', b''])
-        mock_instance.read.side_effect = lambda: next(iterator)
+        mock_instance.in_waiting = 0
+        mock_instance.read.side_effect = lambda size=1: next(iterator)
         
         received_codes = []
         def callback(code):
@@ -63,5 +70,205 @@ class TestSerialManager(unittest.TestCase):
         
         self.assertIn("123", received_codes)
 
+class TestFrameParser(unittest.TestCase):
+    def test_frames_split_and_batched(self):
+        parser = FrameParser()
+        self.assertEqual(parser.feed(b"*12"), [])
+        self.assertEqual(parser.feed(b"34#*56#*7"), ["1234", "56"])
+        self.assertEqual(parser.feed(b"8#"), ["78"])
+
+    def test_noise_and_restarts(self):
+        parser = FrameParser()
+        # Empty frames are dropped, '*' restarts a frame, other bytes are ignored
+        self.assertEqual(parser.feed(b"##*#*99*12\r\n3#\xff*4a5#"), ["123", "45"])
+        # Digits without a terminator never grow without bound
+        parser.feed(b"1" * 10000)
+        self.assertEqual(len(parser.buffer), FrameParser.MAX_FRAME)
+
+    def test_acks_are_not_codes(self):
+        parser = FrameParser()
+        self.assertEqual(parser.feed(b"*A7#*123#*A"), ["123"])
+        self.assertEqual(parser.feed(b"12#*45#"), ["45"])
+        self.assertEqual(parser.acks, [7, 12])
+
+
+@unittest.skipUnless(hasattr(os, "openpty"), "requires a POSIX pty")
+class TestSerialPty(unittest.TestCase):
+    """Drives SerialManager through a pty pair acting as a fake reader device."""
+
+    def setUp(self):
+        self.device_fd, self.port_fd = os.openpty()
+        self.received = []
+        self.done = threading.Event()
+        self.expected = 0
+
+        def callback(code):
+            self.received.append(code)
+            if len(self.received) >= self.expected:
+                self.done.set()
+
+        self.mgr = SerialManager(os.ttyname(self.port_fd), 115200, callback)
+        self.assertTrue(self.mgr.start())
+
+    def tearDown(self):
+        self.mgr.stop()
+        os.close(self.device_fd)
+        os.close(self.port_fd)
+
+    def send(self, codes, max_chunk):
+        stream = b"".join(b"*" + c.encode() + b"#" for c in codes)
+        rng = random.Random(7)
+        pos = 0
+        while pos < len(stream):
+            size = rng.randint(1, max_chunk)
+            os.write(self.device_fd, stream[pos:pos + size])
+            pos += size
+
+    def test_no_frame_loss(self):
+        codes = [str(random.Random(i).randrange(10 ** 9)) for i in range(5000)]
+        self.expected = len(codes)
+        self.send(codes, max_chunk=64)
+        self.assertTrue(self.done.wait(10), f"only {len(self.received)} of {len(codes)} frames arrived")
+        self.assertEqual(self.received, codes)
+
+    def test_burst_is_read_in_chunks(self):
+        # Throughput itself is timed by benchmarks/suite.py; here, bursts must not be read frame by frame
+        conn = self.mgr.serial_conn
+        read = conn.read
+        reads = []
+        conn.read = lambda size: reads.append(size) or read(size)
+        codes = [f"{i:010d}" for i in range(20000)]
+        self.expected = len(codes)
+        self.send(codes, max_chunk=4096)
+        self.assertTrue(self.done.wait(10))
+        self.assertEqual(self.received, codes)
+        self.assertLess(len(reads), len(codes) / 10)
+
+@unittest.skipUnless(hasattr(os, "openpty"), "requires a POSIX pty")
+class TestSerialHub(unittest.TestCase):
+    """Two pty pairs served by a single SerialHub thread."""
+
+    def setUp(self):
+        self.pairs = [os.openpty() for _ in range(2)]
+        self.received = {"entrada": [], "salida": []}
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.expected = 0
+
+        def callback(code, port, received_at):
+            with self.lock:
+                self.received[port.terminal].append(code)
+                if sum(map(len, self.received.values())) >= self.expected:
+                    self.done.set()
+
+        self.hub = SerialHub(callback)
+        self.hub.configure([{"port": os.ttyname(port_fd), "baud": 115200, "terminal": terminal}
+                            for (_, port_fd), terminal in zip(self.pairs, ("entrada", "salida"))])
+        self.assertTrue(self.hub.start())
+
+    def tearDown(self):
+        self.hub.stop()
+        for device_fd, port_fd in self.pairs:
+            os.close(device_fd)
+            os.close(port_fd)
+
+    def test_codes_tagged_by_port(self):
+        entrada = [f"1{i:05d}" for i in range(3000)]
+        salida = [f"2{i:05d}" for i in range(3000)]
+        self.expected = len(entrada) + len(salida)
+        (entrada_fd, _), (salida_fd, _) = self.pairs
+        # Interleave writes, splitting frames across writes on both ports
+        streams = [b"".join(b"*" + c.encode() + b"#" for c in codes) for codes in (entrada, salida)]
+        for pos in range(0, len(streams[0]), 50):
+            os.write(entrada_fd, streams[0][pos:pos + 50])
+            os.write(salida_fd, streams[1][pos:pos + 50])
+        self.assertTrue(self.done.wait(10))
+        self.assertEqual(self.received["entrada"], entrada)
+        self.assertEqual(self.received["salida"], salida)
+        stats = {s["terminal"]: s for s in self.hub.stats()}
+        self.assertEqual(stats["entrada"]["frames"], len(entrada))
+        self.assertEqual(stats["salida"]["frames"], len(salida))
+        self.assertTrue(all(s["connected"] for s in stats.values()))
+
+    def test_single_thread(self):
+        names = [t.name for t in threading.enumerate()]
+        self.assertEqual(names.count("serial-hub"), 1)
+
+@unittest.skipUnless(hasattr(os, "openpty"), "requires a POSIX pty")
+class TestTurnstileResponses(unittest.TestCase):
+    """Grant/deny frames written back to the reader over a pty pair."""
+
+    def setUp(self):
+        self.device_fd, port_fd = os.openpty()
+        self.port_fd = port_fd
+        tty.setraw(self.device_fd)
+        self.latencies = []
+
+        def callback(code, port, received_at):
+            # Odd codes are granted; answer straight from the hub thread
+            self.latencies.append(self.hub.respond(port, int(code) % 2 == 1, received_at))
+
+        self.hub = SerialHub(callback)
+
+    def tearDown(self):
+        self.hub.stop()
+        os.close(self.device_fd)
+        os.close(self.port_fd)
+
+    def start(self, ack):
+        self.hub.configure([{"port": os.ttyname(self.port_fd), "baud": 115200, "terminal": "molinete",
+                             "pulse_ms": 300, "ack": ack}])
+        self.assertTrue(self.hub.start())
+        self.port = next(iter(self.hub.ports.values()))
+
+    def read_frame(self, timeout=5):
+        frame = b""
+        deadline = time.monotonic() + timeout
+        while not frame.endswith(b"#"):
+            ready, _, _ = select.select([self.device_fd], [], [], max(deadline - time.monotonic(), 0))
+            if not ready:
+                return None
+            frame += os.read(self.device_fd, 1)
+        return frame
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_grant_and_deny_frames(self):
+        # How fast is left to the relay stats (Administración → Conexión Serial); here, what is sent
+        self.start(ack=False)
+        for i in range(200):
+            os.write(self.device_fd, f"*{i}#".encode())
+            expected = f"*G{i + 1}:300#" if i % 2 else f"*D{i + 1}#"
+            self.assertEqual(self.read_frame(), expected.encode())
+        # The last frame can arrive before respond() has counted it
+        self.wait_for(lambda: len(self.latencies) == 200)
+        stats = self.port.stats()
+        self.assertEqual(stats["responses"], 200)
+        self.assertTrue(all(latency is not None and latency >= 0 for latency in self.latencies))
+        self.assertGreaterEqual(stats["relay_max_ms"], 0)
+
+    def test_ack_clears_pending(self):
+        self.start(ack=True)
+        os.write(self.device_fd, b"*1#")
+        self.assertEqual(self.read_frame(), b"*G1:300#")
+        os.write(self.device_fd, b"*A1#")
+        self.wait_for(lambda: self.port.acked)
+        stats = self.port.stats()
+        self.assertEqual((stats["acked"], stats["pending"], stats["retries"]), (1, 0, 0))
+        # Nothing is resent once acknowledged
+        self.assertIsNone(self.read_frame(timeout=SerialHub.ACK_TIMEOUT * 2))
+
+    def test_resends_until_retries_exhausted(self):
+        self.start(ack=True)
+        os.write(self.device_fd, b"*2#")
+        frames = [self.read_frame() for _ in range(SerialHub.MAX_RETRIES + 1)]
+        self.assertEqual(frames, [b"*D1#"] * (SerialHub.MAX_RETRIES + 1))
+        self.wait_for(lambda: self.port.ack_failures)
+        stats = self.port.stats()
+        self.assertEqual((stats["retries"], stats["ack_failures"], stats["pending"]), (SerialHub.MAX_RETRIES, 1, 0))
+
 if __name__ == '__main__':
     unittest.main()
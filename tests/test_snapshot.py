@@ -0,0 +1,125 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+from datetime import date
+import snapshot
+from database import DatabaseManager
+
+class TestMemberSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "snap_gym.db")
+        self.path = os.path.join(self.tmp.name, "members.snap")
+        self.db = DatabaseManager(self.db_path)
+        self.db.bulk_add_members([(i, (str(1000 + i), f"Miembro {i} Núñez", 30, "", "", "2024-01-01",
+                                       "2030-01-01", i % 7 == 0, None)) for i in range(300)])
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def reference(self):
+        fresh = DatabaseManager(self.db_path)
+        fresh.warm_access_cache()
+        cache = dict(fresh._access_cache)
+        fresh.close()
+        return cache
+
+    def test_lookups_match_the_cache(self):
+        self.db.use_snapshot(self.path)
+        self.assertEqual(len(self.db._snapshot), 300)
+        self.assertEqual(self.db._access_cache, {})
+        for user_id, info in self.reference().items():
+            self.assertEqual(self.db.get_access_info(user_id), info)
+        self.assertIsNone(self.db.get_access_info("999999"))
+        self.assertEqual(self.db.get_access_info("1007")[1:], (date(2030, 1, 1).toordinal(), True, None))
+
+    def test_mutations_patch_the_overlay(self):
+        self.db.use_snapshot(self.path)
+        self.db.add_member("5000", "Nuevo", 20, "", "", "2024-01-01", "2024-06-01")
+        self.db.toggle_freeze("1001")
+        self.db.delete_member("1002")
+        self.db.bulk_set_expiry("2031-01-01", ids=["1003", "1004"])
+        self.assertEqual(self.db.get_access_info("5000")[0], "Nuevo")
+        self.assertTrue(self.db.get_access_info("1001")[2])
+        self.assertIsNone(self.db.get_access_info("1002"))
+        self.assertEqual(self.db.get_access_info("1004")[1], date(2031, 1, 1).toordinal())
+        self.assertEqual(len(self.db._snapshot), 300)
+
+        # Another process opens the same file and catches up through the changelog
+        other = DatabaseManager(self.db_path)
+        other.use_snapshot(self.path)
+        reference = self.reference()
+        for user_id in reference:
+            self.assertEqual(other.get_access_info(user_id), reference[user_id])
+        self.assertIsNone(other.get_access_info("1002"))
+        other.close()
+
+    def test_changes_from_another_connection(self):
+        self.db.use_snapshot(self.path)
+        other = DatabaseManager(self.db_path)
+        other.set_membership_expiry("1010", "2020-01-01")
+        other.close()
+        self.assertEqual(self.db.get_access_info("1010")[1], date(2030, 1, 1).toordinal())
+        self.db.warm_access_cache()
+        self.assertEqual(self.db.get_access_info("1010")[1], date(2020, 1, 1).toordinal())
+        self.assertEqual(list(self.db._access_cache), ["1010"])
+
+    def test_rebuilds_once_many_members_changed(self):
+        self.db.SNAPSHOT_REBUILD_MIN = 10
+        self.db.use_snapshot(self.path)
+        built_at = self.db._snapshot.seq
+        self.db.bulk_freeze(ids=[str(1000 + i) for i in range(1, 20)])
+        self.assertGreater(self.db._snapshot.seq, built_at)
+        self.assertEqual(self.db._access_cache, {})
+        self.assertTrue(self.db.get_access_info("1019")[2])
+
+    def test_replaced_snapshots_are_closed(self):
+        self.db.SNAPSHOT_REBUILD_MIN = 10
+        self.db.use_snapshot(self.path)
+        first = self.db._snapshot
+        self.db.bulk_freeze(ids=[str(1000 + i) for i in range(1, 20)])
+        # Kept open for a reader that may still hold it, until the next rebuild
+        second = self.db._snapshot
+        self.assertIsNot(second, first)
+        self.assertFalse(first.map.closed)
+        self.db.bulk_unfreeze(ids=[str(1000 + i) for i in range(1, 20)])
+        self.assertTrue(first.map.closed)
+        self.assertFalse(second.map.closed)
+        self.db.close()
+        self.assertTrue(second.map.closed)
+
+    def test_foreign_or_damaged_file_is_rebuilt(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a snapshot")
+        self.db.use_snapshot(self.path)
+        self.assertEqual(len(self.db._snapshot), 300)
+        self.db.close()
+
+        other_path = os.path.join(self.tmp.name, "other.db")
+        other = DatabaseManager(other_path)
+        other.add_member("1", "Otro", 20, "", "")
+        other.use_snapshot(self.path)
+        self.assertEqual(len(other._snapshot), 1)
+        other.close()
+
+    def test_falls_back_to_the_cache(self):
+        self.db.use_snapshot(os.path.join(self.tmp.name, "missing_dir", "members.snap"))
+        self.assertIsNone(self.db._snapshot)
+        self.assertEqual(len(self.db._access_cache), 300)
+        self.assertEqual(self.db.get_access_info("1000")[0], "Miembro 0 Núñez")
+
+    def test_file_layout(self):
+        conn = sqlite3.connect(self.db_path)
+        snapshot.build(conn, self.path, "node")
+        conn.close()
+        names = sum(len(f"Miembro {i} Núñez".encode("utf-8")) for i in range(300))
+        self.assertEqual(os.path.getsize(self.path), snapshot.HEADER_SIZE + 21 * 300 + 4 + names)
+        members = snapshot.MemberSnapshot(self.path)
+        self.assertEqual(list(members.keys), sorted(members.keys))
+        self.assertEqual(members.node_id, "node")
+        members.close()
+
+if __name__ == '__main__':
+    unittest.main()
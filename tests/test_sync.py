@@ -0,0 +1,141 @@
+import unittest
+import asyncio
+import os
+import tempfile
+import threading
+from unittest.mock import MagicMock, patch
+from database import DatabaseManager
+from remote import AccessServer, RemoteDatabase, RemoteError
+from access_log import OUTCOME_GRANTED, OUTCOME_NOT_FOUND
+import access
+import database
+import sync
+
+class TestSync(unittest.TestCase):
+    """Terminal A syncs with terminal B's gym.db through a loopback server."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.a = DatabaseManager(os.path.join(self.tmp.name, "a_gym.db"))
+        self.b = DatabaseManager(os.path.join(self.tmp.name, "b_gym.db"))
+        self.loop = asyncio.new_event_loop()
+        self.server = AccessServer(self.b, "127.0.0.1", 0)
+        port = self.loop.run_until_complete(self.server.start())
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self.server.serve_forever(),))
+        self.thread.start()
+        self.peer = RemoteDatabase(f"127.0.0.1:{port}")
+
+    def tearDown(self):
+        self.peer.close()
+        self.loop.call_soon_threadsafe(self.server.server.close)
+        self.thread.join(5)
+        self.loop.close()
+        self.a.close()
+        self.b.close()
+        self.tmp.cleanup()
+
+    def members(self, db):
+        return sorted(db.iter_members())
+
+    def test_two_way_delta_sync(self):
+        self.a.add_member("1", "Ana", 30, "", "", "2024-01-01", "2024-12-31")
+        self.b.add_member("2", "Beto", 40, "", "", "2024-01-01", "2024-12-31")
+        self.a.set_config("gym_name", "Central")
+        self.a.set_config("terminal_name", "Recepción A")
+        self.assertEqual(sync.sync_once(self.a, self.peer), (1, 2))
+        self.assertEqual(self.members(self.a), self.members(self.b))
+        self.assertEqual(self.b.get_config("gym_name"), "Central")
+        self.assertIsNone(self.b.get_config("terminal_name"))
+        self.assertEqual(self.b.get_access_info("1")[0], "Ana")
+
+        # Nothing changed: nothing is transferred
+        self.assertEqual(sync.sync_once(self.a, self.peer), (0, 0))
+
+        self.b.toggle_freeze("1")
+        self.a.delete_member("2")
+        self.b.bulk_set_expiry("2030-01-01", ids=["1"])
+        self.assertEqual(sync.sync_once(self.a, self.peer), (1, 1))
+        self.assertEqual(self.members(self.a), self.members(self.b))
+        self.assertIsNone(self.b.get_member("2"))
+        self.assertEqual(self.a.get_member("1")[6], "2030-01-01")
+
+    def test_deleted_member_loses_cards(self):
+        self.a.add_member("3", "Caro", 30, "", "", "2024-01-01", "2999-01-01")
+        sync.sync_once(self.a, self.peer)
+        # Cards are local to each terminal
+        self.b.assign_credential("CAFE01", "3")
+        self.assertEqual(access.check_code(self.b, "CAFE01")[:2], ("3", OUTCOME_GRANTED))
+
+        self.a.delete_member("3")
+        sync.sync_once(self.a, self.peer)
+        self.assertIsNone(self.b.resolve_credential("CAFE01"))
+        self.assertEqual(access.check_code(self.b, "CAFE01")[:2], ("CAFE01", OUTCOME_NOT_FOUND))
+        # The ID coming back does not bring the card back
+        self.b.add_member("3", "Caro", 30, "", "", "2024-01-01", "2999-01-01")
+        self.assertEqual(access.check_code(self.b, "CAFE01")[:2], ("CAFE01", OUTCOME_NOT_FOUND))
+
+    def test_conflicts_resolve_to_last_writer(self):
+        self.a.add_member("1", "Ana", 30, "", "", "2024-01-01", "2024-12-31")
+        sync.sync_once(self.a, self.peer)
+        # Both terminals edit offline; B's edit is newer
+        with patch.object(database, "_now_version", return_value=10 ** 13):
+            self.a.update_member("1", "Ana (A)", 30, "", "")
+        with patch.object(database, "_now_version", return_value=10 ** 13 + 5):
+            self.b.update_member("1", "Ana (B)", 30, "", "")
+        sync.sync_once(self.a, self.peer)
+        self.assertEqual(self.a.get_member("1")[1], "Ana (B)")
+        self.assertEqual(self.b.get_member("1")[1], "Ana (B)")
+
+    def test_sync_cost_follows_changes(self):
+        rows = [(i, (f"{i:05d}", f"M{i}", 20, "", "", "2024-01-01", "2024-12-31", 0, None)) for i in range(3000)]
+        self.a.bulk_add_members(rows)
+        sync.sync_once(self.a, self.peer, batch_size=500)
+        self.assertEqual(self.b.count_members(), 3000)
+
+        self.a.set_membership_expiry("00042", "2031-01-01")
+        apply_changes = MagicMock(wraps=self.b.apply_changes)
+        with patch.dict(self.server.methods, {"apply_changes": apply_changes}):
+            self.assertEqual(sync.sync_once(self.a, self.peer), (0, 1))
+        self.assertEqual(len(apply_changes.call_args[0][0]), 1)
+
+    def test_worker_survives_server_errors(self):
+        rounds = []
+
+        def fail_then_stop(db, peer_db):
+            rounds.append(peer_db)
+            if len(rounds) == 1:
+                raise RemoteError("database is locked")
+            worker.stopping.set()
+
+        worker = sync.SyncWorker(self.a, "127.0.0.1:1", interval=0)
+        with patch.object(sync, "RemoteDatabase"), patch.object(sync, "sync_once", side_effect=fail_then_stop):
+            worker.start()
+            worker.thread.join(5)
+        self.assertFalse(worker.thread.is_alive())
+        self.assertEqual(len(rounds), 2)
+
+    def test_existing_rows_are_logged_on_upgrade(self):
+        legacy_path = os.path.join(self.tmp.name, "legacy_gym.db")
+        legacy = DatabaseManager(legacy_path)
+        legacy.add_member("9", "Nueve", 20, "", "", "2024-01-01", "2024-12-31")
+        with legacy.transaction() as conn:
+            conn.execute("DELETE FROM changelog")
+            conn.execute("DROP TABLE changelog")
+            conn.execute("DROP TABLE sync_peers")
+            conn.execute("DELETE FROM config WHERE key = 'node_id'")
+            # Later migrations re-run too
+            conn.execute("ALTER TABLE members DROP COLUMN plan_id")
+            conn.execute("DROP TABLE plans")
+            conn.execute("DROP TABLE credentials")
+            conn.execute("DROP TABLE table_versions")
+            conn.execute(f"PRAGMA user_version = {database.MIGRATIONS.index(database._migrate_changelog)}")
+        legacy.close()
+
+        upgraded = DatabaseManager(legacy_path)
+        self.assertTrue(upgraded.node_id)
+        changes, _ = upgraded.changes_since(0)
+        upgraded.close()
+        self.assertEqual([(c[0], c[1]) for c in changes], [("member", "9")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,19 +1,54 @@
 import customtkinter as ctk
-from tkinter import messagebox
-from datetime import datetime
+from tkinter import messagebox, filedialog
+from datetime import date, datetime
+import json
 import logging
-from database import DatabaseManager
-from tkcalendar import DateEntry
-from dateutil.relativedelta import relativedelta
-import serial.tools.list_ports
-from serial_manager import SerialManager
+import socket
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from database import DatabaseManager, STATUS_ACTIVE, STATUS_EXPIRING, STATUS_EXPIRED, STATUS_FROZEN
+from serial_manager import SerialHub, load_port_config, save_port_config
+import member_io
+import access
+import plans
+from async_db import AsyncDatabase
+from metrics import METRICS, ScanTimer
+from access_log import (AccessEventWriter, OUTCOME_GRANTED, OUTCOME_FROZEN, OUTCOME_OUT_OF_HOURS, OUTCOME_NO_VISITS,
+                        OUTCOME_REVOKED, SOURCE_KEYBOARD)
 import sys
 import os
 
+# dateutil, tkcalendar and pyserial's port enumeration are imported on first
+# use so that startup only pays for the access screen
+
+@lru_cache(maxsize=None)
+def extension_options():
+    """Membership extension choices: 1 week, 15 days, 1 month, 2 months, 3 months, 6 months, 1 year"""
+    from dateutil.relativedelta import relativedelta
+    return [
+        ("1 Semana", relativedelta(weeks=1)),
+        ("15 Días", relativedelta(days=15)),
+        ("1 Mes", relativedelta(months=1)),
+        ("2 Meses", relativedelta(months=2)),
+        ("3 Meses", relativedelta(months=3)),
+        ("6 Meses", relativedelta(months=6)),
+        ("1 Año", relativedelta(years=1))
+    ]
+
+def date_entry(master, **kwargs):
+    from tkcalendar import DateEntry
+    return DateEntry(master, **kwargs)
+
 class AccessFrame(ctk.CTkFrame):
-    def __init__(self, master, db: DatabaseManager):
+    def __init__(self, master, db: DatabaseManager, event_writer: AccessEventWriter = None, terminal=None,
+                 adb: AsyncDatabase = None):
         super().__init__(master)
         self.db = db
+        self.adb = adb
+        self.event_writer = event_writer
+        self.terminal = terminal
         
         # Content Container removed to simplify UI as requested
         self.label_title = ctk.CTkLabel(self, text="Control de Acceso", font=("Roboto", 32, "bold"))
@@ -32,30 +67,82 @@ class AccessFrame(ctk.CTkFrame):
         self.info_label = ctk.CTkLabel(self, text="", font=("Roboto", 24))
         self.info_label.pack(pady=10)
 
-    def check_access(self):
-        user_id = self.entry_id.get().strip()
-        if not user_id:
+    def check_access(self, source=SOURCE_KEYBOARD, terminal=None, respond=None, timer=None):
+        """Decides on the ID or card UID in the entry. respond(outcome), if given,
+        signals the turnstile and returns the scan-to-relay latency in ms. timer
+        is the scan's ScanTimer when it started before this call (serial scans).
+
+        With an AsyncDatabase the decision (and the relay) runs on its ordered
+        thread and the result is shown when it arrives: against a
+        RemoteDatabase every lookup is a network round trip, which must not
+        freeze the screen."""
+        code = self.entry_id.get().strip()
+        if not code:
             return
-        
-        member = self.db.get_member(user_id)
-        
-        if member:
-            # member structure: 0:id, 1:name, 2:age, 3:addr, 4:phone, 5:reg_date, 6:end_date, 7:frozen, 8:frozen_date
-            name = member[1]
-            end_date_str = member[6]
-            is_frozen = member[7]
-            
-            end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+        if timer:
+            timer.code = code
+            timer.mark("ui")
+        else:
+            timer = ScanTimer(code)
+        self.entry_id.delete(0, 'end')
+        if self.adb is None:
+            self.show_decision(self.decide(code, source, terminal, respond, timer))
+            return
+
+        def failed(error):
+            logging.error(f"Access check failed for {code}: {error}")
+            self.status_label.configure(text="ERROR AL VERIFICAR", text_color="red")
+            self.info_label.configure(text="No se pudo consultar la base de datos, intente de nuevo")
+
+        self.adb.then(self.adb.submit_ordered(self.decide, code, source, terminal, respond, timer),
+                      self, self.show_decision, on_error=failed)
+
+    def decide(self, code, source, terminal, respond, timer):
+        # Ordered worker thread (or the Tk thread without an AsyncDatabase): no widgets here
+        today = date.today().toordinal()
+        try:
+            user_id, outcome, info = access.check_code(self.db, code, today)
+        except Exception:
+            if respond:
+                respond(None)  # keep the turnstile closed
+            raise
+        timer.mark("lookup")
+        latency_ms = None
+        if respond:
+            latency_ms = respond(outcome)
+            timer.mark("relay")
+        if self.event_writer:
+            self.event_writer.record(user_id, outcome, source, terminal or self.terminal, latency_ms=latency_ms)
+        return code, user_id, outcome, info, today, timer
+
+    def show_decision(self, decision):
+        code, user_id, outcome, info, today, timer = decision
+        if info:
+            # info structure: 0:name, 1:end_date ordinal, 2:frozen, 3:plan id
+            name, end_ord = info[0], info[1]
+            end_date_str = date.fromordinal(end_ord).isoformat() if end_ord else ""
             
-            if is_frozen:
+            if outcome == OUTCOME_FROZEN:
                 self.status_label.configure(text="MEMBRESÍA CONGELADA", text_color="orange")
                 self.info_label.configure(text=f"Usuario: {name}")
                 logging.info(f"Access DENIED (Frozen) for user: {user_id} ({name})")
-            elif end_date >= datetime.now():
-                days_left = (end_date - datetime.now()).days
+            elif outcome == OUTCOME_GRANTED:
+                days_left = end_ord - today
                 self.status_label.configure(text="ACCESO CONCEDIDO", text_color="green")
-                self.info_label.configure(text=f"Bienvenido, {name}\nVence en {days_left + 1} días ({end_date_str})")
+                self.info_label.configure(text=f"Bienvenido, {name}\nVence en {days_left} días ({end_date_str})")
                 logging.info(f"Access GRANTED for user: {user_id} ({name})")
+            elif outcome == OUTCOME_OUT_OF_HOURS:
+                self.status_label.configure(text="FUERA DE HORARIO", text_color="orange")
+                self.info_label.configure(text=f"Usuario: {name}\nSu plan no permite el ingreso a esta hora")
+                logging.info(f"Access DENIED (OutOfHours) for user: {user_id} ({name})")
+            elif outcome == OUTCOME_REVOKED:
+                self.status_label.configure(text="TARJETA ANULADA", text_color="red")
+                self.info_label.configure(text=f"Usuario: {name}\nEsta tarjeta fue dada de baja")
+                logging.warning(f"Access DENIED (Revoked card {code}) for user: {user_id} ({name})")
+            elif outcome == OUTCOME_NO_VISITS:
+                self.status_label.configure(text="SIN VISITAS DISPONIBLES", text_color="orange")
+                self.info_label.configure(text=f"Usuario: {name}\nYa usó todas las visitas de su plan")
+                logging.info(f"Access DENIED (NoVisits) for user: {user_id} ({name})")
             else:
                 self.status_label.configure(text="MEMBRESÍA VENCIDA", text_color="red")
                 self.info_label.configure(text=f"Usuario: {name}\nVenció el {end_date_str}")
@@ -65,13 +152,15 @@ class AccessFrame(ctk.CTkFrame):
             self.status_label.configure(text="USUARIO NO ENCONTRADO", text_color="red")
             self.info_label.configure(text="")
             logging.warning(f"Access DENIED (NotFound) for ID: {user_id}")
-            
-        self.entry_id.delete(0, 'end')
+
+        timer.mark("ui")
+        timer.finish(outcome)
 
 class RegisterFrame(ctk.CTkFrame):
-    def __init__(self, master, db: DatabaseManager):
+    def __init__(self, master, db: DatabaseManager, adb: AsyncDatabase):
         super().__init__(master)
         self.db = db
+        self.adb = adb
 
         self.label_title = ctk.CTkLabel(self, text="Registrar Nuevo Miembro", font=("Roboto", 32, "bold"))
         self.label_title.pack(pady=30)
@@ -96,7 +185,7 @@ class RegisterFrame(ctk.CTkFrame):
         
         # DatePicker for Registration Date
         ctk.CTkLabel(self.form_frame, text="Fecha de Inicio:", anchor="w", font=("Roboto", 16)).pack(pady=(10,0), padx=5, anchor="w")
-        self.date_reg = DateEntry(self.form_frame, width=30, background='darkblue',
+        self.date_reg = date_entry(self.form_frame, width=30, background='darkblue',
                                   foreground='white', borderwidth=2, date_pattern='y-mm-dd', font=("Roboto", 14))
         self.date_reg.pack(pady=10)
 
@@ -114,14 +203,27 @@ class RegisterFrame(ctk.CTkFrame):
         reg_date_str = reg_date_obj.strftime("%Y-%m-%d")
         
         # Default 1 month expiry from picked date
+        from dateutil.relativedelta import relativedelta
         end_date_str = (reg_date_obj + relativedelta(months=1)).strftime("%Y-%m-%d")
 
         if not uid or not name:
             messagebox.showerror("Error", "El ID y Nombre son obligatorios")
             return
 
-        success = self.db.add_member(uid, name, age, addr, phone, reg_date_str, end_date_str)
-        if success:
+        self.btn_register.configure(state="disabled", text="Registrando...")
+        future = self.adb.add_member(uid, name, age, addr, phone, reg_date_str, end_date_str)
+        self.adb.then(future, self, lambda success: self.finish_register(name, success),
+                      on_error=lambda e: self.finish_register(name, False, e))
+
+    def finish_register(self, name, success, error=None):
+        self.btn_register.configure(state="normal", text="Registrar Miembro")
+        if isinstance(error, ValueError):
+            # The ID is a card UID, so scans of it would open that card's member
+            messagebox.showerror("Error", "El ID coincide con una tarjeta registrada")
+        elif error:
+            logging.error(f"Failed to register member {name}: {error}")
+            messagebox.showerror("Error", f"No se pudo registrar: {error}")
+        elif success:
             messagebox.showinfo("Éxito", f"Miembro {name} registrado correctamente")
             self.clear_form()
         else:
@@ -134,10 +236,223 @@ class RegisterFrame(ctk.CTkFrame):
         self.entry_address.delete(0, 'end')
         self.entry_phone.delete(0, 'end')
 
+class VirtualMemberList(ctk.CTkFrame):
+    """Scrollable member list that only builds widgets for the visible rows.
+
+    A fixed pool of row widgets is recycled while scrolling and the data is
+    fetched from the database in pages, so render time and memory do not
+    depend on how many members there are. Pages load on the database
+    workers; their rows show a placeholder until they arrive.
+    """
+    ROW_HEIGHT = 45
+    BUFFER_ROWS = 2
+    PAGE_SIZE = 100
+    MAX_CACHED_PAGES = 20
+    LOADING = ("", "Cargando...", "", None)
+    # Color code expiration
+    STATUS_STYLE = {
+        STATUS_ACTIVE: ("Activo", "green"),
+        STATUS_EXPIRED: ("Vencido", "red"),
+        STATUS_FROZEN: ("Congelado", "orange"),
+    }
+
+    def __init__(self, master, adb: AsyncDatabase, on_open):
+        super().__init__(master)
+        self.adb = adb
+        self.on_open = on_open
+        self.query = None
+        self.status = None
+        self.total = 0
+        self.top = 0
+        self.pages = {}
+        self.loading = set()
+        # Bumped for every new result set so late pages of an old one are dropped
+        self.results_id = 0
+        self.rows = []
+
+        # Headers
+        header_frame = ctk.CTkFrame(self, fg_color="transparent")
+        header_frame.pack(fill="x", padx=5, pady=2)
+        ctk.CTkLabel(header_frame, text="ID", width=100, anchor="w", font=("Roboto", 14, "bold")).pack(side="left", padx=5)
+        ctk.CTkLabel(header_frame, text="Nombre", width=250, anchor="w", font=("Roboto", 14, "bold")).pack(side="left", padx=5)
+        ctk.CTkLabel(header_frame, text="Vencimiento", width=150, anchor="w", font=("Roboto", 14, "bold")).pack(side="left", padx=5)
+        ctk.CTkLabel(header_frame, text="Estado", width=150, anchor="w", font=("Roboto", 14, "bold")).pack(side="left", padx=5)
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.pack(side="left", fill="both", expand=True)
+        self.body.bind("<Configure>", lambda event: self.render())
+
+        self.empty_label = ctk.CTkLabel(self.body, text="No se encontraron miembros.", font=("Roboto", 16))
+
+        # Wheel events are global in Tk; only react when the pointer is over this list
+        root = self.winfo_toplevel()
+        root.bind_all("<MouseWheel>", self.on_mousewheel, add="+")
+        root.bind_all("<Button-4>", self.on_mousewheel, add="+")
+        root.bind_all("<Button-5>", self.on_mousewheel, add="+")
+
+    def set_query(self, query, status=None):
+        """Points the list at a new result set and scrolls back to the top."""
+        query = query or None
+        self.adb.then(self.adb.count_members(query, status), self,
+                      lambda total: self.set_results(query, status, total, None))
+
+    def set_results(self, query, status, total, first_page):
+        """Shows a result set whose count (and optionally first page) was fetched elsewhere."""
+        self.query = query or None
+        self.status = status
+        self.results_id += 1
+        self.pages.clear()
+        self.loading.clear()
+        if first_page is not None:
+            self.pages[0] = first_page
+        self.total = total
+        self.top = 0
+        self.render()
+
+    def visible_count(self):
+        height = max(self.body.winfo_height(), self.ROW_HEIGHT)
+        return height // self.ROW_HEIGHT + 1
+
+    def get_row(self, index):
+        """Returns the member at index, None past the end, or LOADING while its page is fetched."""
+        page_no = index // self.PAGE_SIZE
+        page = self.pages.get(page_no)
+        if page is None:
+            self.load_page(page_no)
+            return self.LOADING if index < self.total else None
+        offset = index % self.PAGE_SIZE
+        return page[offset] if offset < len(page) else None
+
+    def load_page(self, page_no):
+        if page_no in self.loading:
+            return
+        self.loading.add(page_no)
+        results_id = self.results_id
+        future = self.adb.get_members_page(page_no * self.PAGE_SIZE, self.PAGE_SIZE, self.query, self.status)
+        self.adb.then(future, self, lambda page: self.page_loaded(results_id, page_no, page),
+                      on_error=lambda e: self.page_failed(results_id, page_no, e))
+
+    def page_loaded(self, results_id, page_no, page):
+        if results_id != self.results_id:
+            return
+        self.loading.discard(page_no)
+        if len(self.pages) >= self.MAX_CACHED_PAGES:
+            # Evict the page furthest from where we are
+            far = max(self.pages, key=lambda p: abs(p - page_no))
+            del self.pages[far]
+        self.pages[page_no] = page
+        self.render()
+
+    def page_failed(self, results_id, page_no, error):
+        # Left in the loading state; the next scroll or search retries it
+        logging.error(f"Loading member page {page_no} failed: {error}")
+        if results_id == self.results_id:
+            self.loading.discard(page_no)
+
+    def create_row(self):
+        row_frame = ctk.CTkFrame(self.body, height=self.ROW_HEIGHT - 10)
+        row_frame.member_id = None
+        row_frame.lbl_id = ctk.CTkLabel(row_frame, text="", width=100, anchor="w", font=("Roboto", 14))
+        row_frame.lbl_id.pack(side="left", padx=5)
+        row_frame.lbl_name = ctk.CTkLabel(row_frame, text="", width=250, anchor="w", font=("Roboto", 14))
+        row_frame.lbl_name.pack(side="left", padx=5)
+        row_frame.lbl_end = ctk.CTkLabel(row_frame, text="", width=150, anchor="w", font=("Roboto", 14))
+        row_frame.lbl_end.pack(side="left", padx=5)
+        row_frame.lbl_status = ctk.CTkLabel(row_frame, text="", width=150, anchor="w", font=("Roboto", 14, "bold"))
+        row_frame.lbl_status.pack(side="left", padx=5)
+        btn_edit = ctk.CTkButton(row_frame, text="Gestionar", width=120, height=35, font=("Roboto", 14), command=lambda r=row_frame: self.on_open(r.member_id))
+        btn_edit.pack(side="right", padx=10)
+        return row_frame
+
+    def fill_row(self, row_frame, member):
+        # member: id, name, end_date, status (already computed by the query)
+        if member is self.LOADING:
+            row_frame.member_id = None
+            row_frame.lbl_id.configure(text="")
+            row_frame.lbl_name.configure(text="Cargando...")
+            row_frame.lbl_end.configure(text="")
+            row_frame.lbl_status.configure(text="")
+            return
+        mid, name, end_date, status = member
+        row_frame.member_id = mid
+        status_text, color = self.STATUS_STYLE[status]
+
+        row_frame.lbl_id.configure(text=mid)
+        row_frame.lbl_name.configure(text=name)
+        row_frame.lbl_end.configure(text=end_date)
+        row_frame.lbl_status.configure(text=status_text, text_color=color)
+
+    def render(self):
+        visible = self.visible_count()
+        self.top = max(0, min(self.top, self.total - visible + 1))
+
+        if not self.total:
+            for row_frame in self.rows:
+                row_frame.place_forget()
+            self.empty_label.place(relx=0.5, y=20, anchor="n")
+            self.scrollbar.set(0, 1)
+            return
+        self.empty_label.place_forget()
+
+        # Grow the pool on demand, never per member
+        while len(self.rows) < visible + self.BUFFER_ROWS:
+            self.rows.append(self.create_row())
+
+        for slot, row_frame in enumerate(self.rows):
+            member = self.get_row(self.top + slot) if slot < visible else None
+            if member is None:
+                row_frame.place_forget()
+                continue
+            self.fill_row(row_frame, member)
+            row_frame.place(x=0, y=slot * self.ROW_HEIGHT, relwidth=1)
+
+        self.scrollbar.set(self.top / self.total, min(1.0, (self.top + visible) / self.total))
+
+    def scroll_to(self, index):
+        self.top = int(index)
+        self.render()
+
+    def on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.total)
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self.visible_count() - 1 if args[2] == "pages" else 1)
+            self.scroll_to(self.top + step)
+
+    def on_mousewheel(self, event):
+        widget = event.widget
+        while widget is not None and widget is not self:
+            widget = getattr(widget, "master", None)
+        if widget is None:
+            return
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.top - 3)
+        else:
+            self.scroll_to(self.top + 3)
+
 class MembersFrame(ctk.CTkFrame):
-    def __init__(self, master, db: DatabaseManager):
+    SEARCH_DELAY_MS = 250
+    STATUS_FILTERS = {
+        "Todos": None,
+        "Activos": STATUS_ACTIVE,
+        "Vencen en 7 días": STATUS_EXPIRING,
+        "Vencidos": STATUS_EXPIRED,
+        "Congelados": STATUS_FROZEN,
+    }
+
+    def __init__(self, master, db: DatabaseManager, adb: AsyncDatabase):
         super().__init__(master)
         self.db = db
+        self.adb = adb
+
+        # Live search: one background worker, newest keystroke wins
+        self.search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="member-search")
+        self.search_generation = 0
+        self.search_job = None
+        self.last_query = None
 
         # Top Bar (Search)
         self.top_bar = ctk.CTkFrame(self, fg_color="transparent")
@@ -145,6 +460,8 @@ class MembersFrame(ctk.CTkFrame):
         
         self.search_entry = ctk.CTkEntry(self.top_bar, placeholder_text="Buscar por Nombre o ID...", width=400, height=40, font=("Roboto", 16))
         self.search_entry.pack(side="left", padx=10)
+        self.search_entry.bind("<KeyRelease>", lambda event: self.schedule_search())
+        self.search_entry.bind("<Return>", lambda event: self.refresh_list())
         
         self.btn_search = ctk.CTkButton(self.top_bar, text="Buscar", width=120, height=40, font=("Roboto", 16, "bold"), command=self.refresh_list)
         self.btn_search.pack(side="left")
@@ -152,91 +469,122 @@ class MembersFrame(ctk.CTkFrame):
         self.btn_refresh = ctk.CTkButton(self.top_bar, text="Actualizar Lista", width=150, height=40, font=("Roboto", 16, "bold"), command=lambda: [self.search_entry.delete(0,'end'), self.refresh_list()])
         self.btn_refresh.pack(side="left", padx=10)
 
+        self.search_status = ctk.CTkLabel(self.top_bar, text="", text_color="gray", font=("Roboto", 14))
+        self.search_status.pack(side="left", padx=10)
+
+        # Status filter, answered by SQL (indexed is_frozen / end_ord)
+        self.filter_bar = ctk.CTkFrame(self, fg_color="transparent")
+        self.filter_bar.pack(fill="x", padx=10)
+        self.status_filter = ctk.CTkSegmentedButton(self.filter_bar, values=list(self.STATUS_FILTERS), font=("Roboto", 14), command=lambda value: self.refresh_list())
+        self.status_filter.set("Todos")
+        self.status_filter.pack(side="left", padx=10)
+        self.status_counts = ctk.CTkLabel(self.filter_bar, text="", text_color="gray", font=("Roboto", 14))
+        self.status_counts.pack(side="left", padx=10)
+
         # List Area
-        self.scroll_frame = ctk.CTkScrollableFrame(self, label_text="Lista de Miembros", label_font=("Roboto", 20, "bold"))
-        self.scroll_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.label_list = ctk.CTkLabel(self, text="Lista de Miembros", font=("Roboto", 20, "bold"))
+        self.label_list.pack(pady=(0, 5))
+        self.member_list = VirtualMemberList(self, self.adb, self.open_edit_window)
+        self.member_list.pack(fill="both", expand=True, padx=10, pady=10)
 
         self.refresh_list()
 
+    def schedule_search(self):
+        # Debounce: restart the timer on every keystroke that changes the text
+        if self.search_entry.get().strip() == self.last_query:
+            return
+        if self.search_job:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(self.SEARCH_DELAY_MS, self.refresh_list)
+
     def refresh_list(self):
-        # Clear current list
-        for widget in self.scroll_frame.winfo_children():
-            widget.destroy()
+        """Runs the current search on the worker thread; only the newest result is drawn."""
+        if self.search_job:
+            self.after_cancel(self.search_job)
+            self.search_job = None
 
-        query = self.search_entry.get()
-        if query:
-            members = self.db.search_members(query)
-        else:
-            members = self.db.get_all_members()
+        query = self.search_entry.get().strip()
+        status = self.STATUS_FILTERS[self.status_filter.get()]
+        self.last_query = query
+        self.search_generation += 1
+        generation = self.search_generation
+        self.search_status.configure(text="Buscando...")
+        self.search_executor.submit(self.run_search, generation, query, status)
 
-        if not members:
-            ctk.CTkLabel(self.scroll_frame, text="No se encontraron miembros.", font=("Roboto", 16)).pack(pady=20)
+    def run_search(self, generation, query, status):
+        # Worker thread: a newer search interrupts this one mid-query
+        is_stale = lambda: generation != self.search_generation
+        if is_stale():
             return
+        try:
+            with self.db.cancel_when(is_stale):
+                total = self.db.count_members(query, status)
+                first_page = self.db.get_members_page(0, self.member_list.PAGE_SIZE, query, status)
+                counts = self.db.count_by_status()
+        except Exception as e:
+            # An interrupted search raises too (OperationalError); only a current one is reported
+            if not is_stale():
+                logging.error(f"Member search failed for '{query}': {e}")
+                self.after(0, lambda: self.search_failed(generation))
+            return
+        self.after(0, lambda: self.apply_search(generation, query, status, total, first_page, counts))
 
-        # Headers
-        header_frame = ctk.CTkFrame(self.scroll_frame, fg_color="transparent")
-        header_frame.pack(fill="x", pady=2)
-        ctk.CTkLabel(header_frame, text="ID", width=100, anchor="w", font=("Roboto", 14, "bold")).pack(side="left", padx=5)
-        ctk.CTkLabel(header_frame, text="Nombre", width=250, anchor="w", font=("Roboto", 14, "bold")).pack(side="left", padx=5)
-        ctk.CTkLabel(header_frame, text="Vencimiento", width=150, anchor="w", font=("Roboto", 14, "bold")).pack(side="left", padx=5)
-        ctk.CTkLabel(header_frame, text="Estado", width=150, anchor="w", font=("Roboto", 14, "bold")).pack(side="left", padx=5)
-
-        for m in members:
-            # m: id, name, end_date, is_frozen
-            self.create_member_row(m)
-
-    def create_member_row(self, member):
-        mid, name, end_date, is_frozen = member
-        
-        row_frame = ctk.CTkFrame(self.scroll_frame)
-        row_frame.pack(fill="x", pady=5)
-        
-        ctk.CTkLabel(row_frame, text=mid, width=100, anchor="w", font=("Roboto", 14)).pack(side="left", padx=5)
-        ctk.CTkLabel(row_frame, text=name, width=250, anchor="w", font=("Roboto", 14)).pack(side="left", padx=5)
-        
-        # Color code expiration
-        dt_end = datetime.strptime(end_date, "%Y-%m-%d")
-        color = "black" # Default for Light Mode text
-        status_text = "Activo"
-        
-        if is_frozen:
-            color = "orange"
-            status_text = "Congelado"
-        elif dt_end < datetime.now():
-            color = "red"
-            status_text = "Vencido"
-        else:
-            color = "green"
-        
-        ctk.CTkLabel(row_frame, text=end_date, width=150, anchor="w", font=("Roboto", 14)).pack(side="left", padx=5)
-        ctk.CTkLabel(row_frame, text=status_text, width=150, anchor="w", text_color=color, font=("Roboto", 14, "bold")).pack(side="left", padx=5)
+    def search_failed(self, generation):
+        if generation == self.search_generation:
+            self.search_status.configure(text="Error al buscar")
 
-        btn_edit = ctk.CTkButton(row_frame, text="Gestionar", width=120, height=35, font=("Roboto", 14), command=lambda i=mid: self.open_edit_window(i))
-        btn_edit.pack(side="right", padx=10)
+    def apply_search(self, generation, query, status, total, first_page, counts):
+        if generation != self.search_generation:
+            return
+        self.search_status.configure(text=f"{total} resultados" if query or status else f"{total} miembros")
+        self.status_counts.configure(text=(
+            f"Activos: {counts[STATUS_ACTIVE]}  ·  Vencen pronto: {counts[STATUS_EXPIRING]}  ·  "
+            f"Vencidos: {counts[STATUS_EXPIRED]}  ·  Congelados: {counts[STATUS_FROZEN]}"))
+        self.member_list.set_results(query, status, total, first_page)
 
     def open_edit_window(self, user_id):
-        EditMemberWindow(self, self.db, user_id, self.refresh_list)
+        if user_id:
+            EditMemberWindow(self, self.adb, user_id, self.refresh_list)
 
 class EditMemberWindow(ctk.CTkToplevel):
-    def __init__(self, master, db, user_id, callback_refresh):
+    def __init__(self, master, adb: AsyncDatabase, user_id, callback_refresh):
         super().__init__(master)
-        self.db = db
+        self.adb = adb
         self.user_id = user_id
         self.callback = callback_refresh
+        self.member = None
+        self.plans = []
+        self.action_buttons = []
         self.title(f"Gestionar Miembro - {user_id}")
         self.geometry("600x750")
-        
-        self.member = self.db.get_member(user_id)
-        # member: 0:id, 1:name, 2:age, 3:addr, 4:phone, 5:reg_date, 6:end_date, 7:frozen, 8:frozen_date
 
-        self.label_title = ctk.CTkLabel(self, text=f"Editando: {self.member[1]}", font=("Roboto", 24, "bold"))
+        self.label_title = ctk.CTkLabel(self, text="Cargando...", font=("Roboto", 24, "bold"))
         self.label_title.pack(pady=20)
 
+        self.adb.then(self.adb.submit(self.load_member), self, self.show_member)
+
+    def load_member(self):
+        # Database worker
+        db = self.adb.db
+        return db.get_member(self.user_id), db.get_plans(), db.get_credentials(self.user_id)
+
+    def show_member(self, loaded):
+        member, self.plans, cards = loaded
+        if member is None:
+            messagebox.showerror("Error", "El miembro ya no existe")
+            self.callback()
+            self.destroy()
+            return
+        self.member = member
+        # member: 0:id, 1:name, 2:age, 3:addr, 4:phone, 5:reg_date, 6:end_date, 7:frozen, 8:frozen_date, 9:end_ord, 10:plan_id
+        self.label_title.configure(text=f"Editando: {self.member[1]}")
+
         # Tabs for Edit Info vs Membership Actions
         self.tabview = ctk.CTkTabview(self)
         self.tabview.pack(fill="both", expand=True, padx=20, pady=10)
         self.tabview.add("Información")
         self.tabview.add("Membresía")
+        self.tabview.add("Tarjetas")
 
         # --- INFO TAB ---
         self.entry_name = ctk.CTkEntry(self.tabview.tab("Información"), placeholder_text="Nombre", width=350, height=40, font=("Roboto", 16))
@@ -255,7 +603,7 @@ class EditMemberWindow(ctk.CTkToplevel):
         if self.member[4]: self.entry_phone.insert(0, self.member[4])
         self.entry_phone.pack(pady=10)
         
-        ctk.CTkButton(self.tabview.tab("Información"), text="Guardar Cambios", command=self.save_info, height=45, width=200, font=("Roboto", 16, "bold")).pack(pady=30)
+        self.add_action(ctk.CTkButton(self.tabview.tab("Información"), text="Guardar Cambios", command=self.save_info, height=45, width=200, font=("Roboto", 16, "bold"))).pack(pady=30)
 
         # --- MEMBERSHIP TAB ---
         self.mem_scroll = ctk.CTkScrollableFrame(self.tabview.tab("Membresía"))
@@ -264,13 +612,15 @@ class EditMemberWindow(ctk.CTkToplevel):
         status_text = "Estado: " + ("Congelado" if self.member[7] else "Activo")
         ctk.CTkLabel(self.mem_scroll, text=status_text, font=("Roboto", 18, "bold")).pack(pady=15)
         ctk.CTkLabel(self.mem_scroll, text=f"Vence: {self.member[6]}", font=("Roboto", 16)).pack(pady=5)
+        plan_name = next((plan[1] for plan in self.plans if plan[0] == self.member[10]), "Sin plan")
+        ctk.CTkLabel(self.mem_scroll, text=f"Plan: {plan_name}", font=("Roboto", 16)).pack(pady=5)
 
         # Manual Date Picker
         manual_frame = ctk.CTkFrame(self.mem_scroll)
         manual_frame.pack(fill="x", padx=10, pady=15)
         ctk.CTkLabel(manual_frame, text="Cambiar fecha manualmente:", font=("Roboto", 14)).pack(pady=5)
         
-        self.date_expiry = DateEntry(manual_frame, width=15, background='darkblue', foreground='white', borderwidth=2, date_pattern='y-mm-dd', font=("Roboto", 12))
+        self.date_expiry = date_entry(manual_frame, width=15, background='darkblue', foreground='white', borderwidth=2, date_pattern='y-mm-dd', font=("Roboto", 12))
         # Set date to current expiry
         try:
             curr_expiry = datetime.strptime(self.member[6], "%Y-%m-%d")
@@ -278,41 +628,64 @@ class EditMemberWindow(ctk.CTkToplevel):
         except:
             pass
         self.date_expiry.pack(pady=5)
-        ctk.CTkButton(manual_frame, text="Guardar Nueva Fecha", command=self.save_manual_date, font=("Roboto", 14)).pack(pady=5)
+        self.add_action(ctk.CTkButton(manual_frame, text="Guardar Nueva Fecha", command=self.save_manual_date, font=("Roboto", 14))).pack(pady=5)
 
-        # Extend Buttons
+        # Renewal Buttons: one per plan (Administración -> Planes)
         extend_frame = ctk.CTkFrame(self.mem_scroll)
         extend_frame.pack(fill="x", padx=10, pady=15)
-        ctk.CTkLabel(extend_frame, text="Extender Membresía", font=("Roboto", 16, "bold")).pack(pady=10)
-        
-        # Grid of buttons
-        # 1 week, 15 days, 1 month, 2 months, 3 months, 6 months, 1 year
-        buttons = [
-            ("1 Semana", relativedelta(weeks=1)),
-            ("15 Días", relativedelta(days=15)),
-            ("1 Mes", relativedelta(months=1)),
-            ("2 Meses", relativedelta(months=2)),
-            ("3 Meses", relativedelta(months=3)),
-            ("6 Meses", relativedelta(months=6)),
-            ("1 Año", relativedelta(years=1))
-        ]
+        ctk.CTkLabel(extend_frame, text="Renovar / Extender Membresía", font=("Roboto", 16, "bold")).pack(pady=10)
         
-        for text, delta in buttons:
-            ctk.CTkButton(extend_frame, text=f"+ {text}", height=40, font=("Roboto", 14), command=lambda d=delta: self.extend_membership(d)).pack(pady=5, padx=30, fill="x")
+        for plan in self.plans:
+            self.add_action(ctk.CTkButton(extend_frame, text=f"+ {plan[1]}", height=40, font=("Roboto", 14), command=lambda p=plan: self.extend_membership(p))).pack(pady=5, padx=30, fill="x")
 
         # Freeze
         freeze_text = "Descongelar" if self.member[7] else "Congelar"
         freeze_color = "green" if self.member[7] else "orange"
-        ctk.CTkButton(self.mem_scroll, text=freeze_text, fg_color=freeze_color, height=45, font=("Roboto", 16, "bold"), command=self.toggle_freeze).pack(pady=30)
+        self.add_action(ctk.CTkButton(self.mem_scroll, text=freeze_text, fg_color=freeze_color, height=45, font=("Roboto", 16, "bold"), command=self.toggle_freeze)).pack(pady=30)
 
         # Delete (Bottom of Membership Tab or Info Tab - putting it in Info Tab makes sense too, but user asked "in gestionar")
         # Let's put it at the very bottom of the window (outside tabs) or bottom of info tab.
         # User said "in gestionar", usually a dangerous action is distinct.
         # Let's put a separator and a red button in the Info tab at the bottom.
         
+        # --- CARDS TAB ---
+        cards_tab = self.tabview.tab("Tarjetas")
+        ctk.CTkLabel(cards_tab, text="Tarjetas / Llaveros del miembro", font=("Roboto", 18, "bold")).pack(pady=(15, 5))
+        self.cards_list = ctk.CTkScrollableFrame(cards_tab, height=250)
+        self.cards_list.pack(fill="x", padx=10, pady=5)
+        self.show_cards(cards)
+
+        self.entry_card_uid = ctk.CTkEntry(cards_tab, placeholder_text="UID de la tarjeta", width=350, height=40, font=("Roboto", 16))
+        self.entry_card_uid.pack(pady=(15, 5))
+        self.entry_card_label = ctk.CTkEntry(cards_tab, placeholder_text="Descripción (opcional, ej. Llavero azul)", width=350, height=40, font=("Roboto", 16))
+        self.entry_card_label.pack(pady=5)
+        self.add_action(ctk.CTkButton(cards_tab, text="Asignar Tarjeta", command=self.assign_card, height=40, width=200, font=("Roboto", 14, "bold"))).pack(pady=10)
+
         ctk.CTkLabel(self.tabview.tab("Información"), text="").pack(pady=10) # Spacer
-        ctk.CTkButton(self.tabview.tab("Información"), text="ELIMINAR USUARIO", height=45, font=("Roboto", 14, "bold"), fg_color="red", hover_color="darkred", command=self.delete_user).pack(pady=20)
+        self.add_action(ctk.CTkButton(self.tabview.tab("Información"), text="ELIMINAR USUARIO", height=45, font=("Roboto", 14, "bold"), fg_color="red", hover_color="darkred", command=self.delete_user)).pack(pady=20)
+
+    def add_action(self, button):
+        self.action_buttons.append(button)
+        return button
+
+    def run_action(self, future, message=None, title="Info"):
+        # Buttons stay disabled until the write is done; the window closes on success
+        for button in self.action_buttons:
+            button.configure(state="disabled")
+
+        def done(_):
+            if message:
+                messagebox.showinfo(title, message)
+            self.callback()
+            self.destroy()
 
+        def failed(error):
+            logging.error(f"Update of member {self.user_id} failed: {error}")
+            for button in self.action_buttons:
+                button.configure(state="normal")
+            messagebox.showerror("Error", f"No se pudo guardar: {error}")
+
+        self.adb.then(future, self, done, on_error=failed)
 
     def save_info(self):
         n = self.entry_name.get()
@@ -320,23 +693,20 @@ class EditMemberWindow(ctk.CTkToplevel):
         ad = self.entry_addr.get()
         p = self.entry_phone.get()
         
-        self.db.update_member(self.user_id, n, a, ad, p)
-        messagebox.showinfo("Info", "Datos actualizados")
-        self.callback()
-        self.destroy()
+        self.run_action(self.adb.update_member(self.user_id, n, a, ad, p), "Datos actualizados")
 
     def save_manual_date(self):
         new_date_obj = self.date_expiry.get_date()
         new_date_str = new_date_obj.strftime("%Y-%m-%d")
-        self.db.set_membership_expiry(self.user_id, new_date_str)
-        messagebox.showinfo("Info", f"Fecha actualizada a {new_date_str}")
-        self.callback()
-        self.destroy()
+        self.run_action(self.adb.set_membership_expiry(self.user_id, new_date_str), f"Fecha actualizada a {new_date_str}")
 
-    def extend_membership(self, delta):
+    def extend_membership(self, plan):
         # Calculate new date
-        # Logic: if expired, start from today + delta
-        # If not expired, start from current end date + delta
+        # Logic: if expired, start from today + the plan's duration
+        # If not expired, start from current end date + the plan's duration
+        from dateutil.relativedelta import relativedelta
+        plan_id, _, months, days, _ = plan
+        delta = relativedelta(months=months, days=days)
         current_end_str = self.member[6]
         current_end = datetime.strptime(current_end_str, "%Y-%m-%d")
         now = datetime.now()
@@ -349,120 +719,776 @@ class EditMemberWindow(ctk.CTkToplevel):
         new_end = base_date + delta
         new_end_str = new_end.strftime("%Y-%m-%d")
         
-        self.db.set_membership_expiry(self.user_id, new_end_str)
-        messagebox.showinfo("Info", f"Membresía extendida hasta {new_end_str}")
-        self.callback()
-        self.destroy()
+        self.run_action(self.adb.set_membership_expiry(self.user_id, new_end_str, plan_id), f"Membresía extendida hasta {new_end_str}")
 
     def toggle_freeze(self):
-        self.db.toggle_freeze(self.user_id)
-        self.callback()
-        self.destroy()
+        self.run_action(self.adb.toggle_freeze(self.user_id))
+
+    def show_cards(self, cards):
+        for child in self.cards_list.winfo_children():
+            child.destroy()
+        if not cards:
+            ctk.CTkLabel(self.cards_list, text="Sin tarjetas: se ingresa con el documento", text_color="gray").pack(pady=10)
+        # cards: (uid, label, is_revoked, assigned_date, revoked_date)
+        for uid, label, is_revoked, assigned, revoked in cards:
+            row = ctk.CTkFrame(self.cards_list)
+            row.pack(fill="x", pady=2)
+            state = f"Anulada el {revoked[:10]}" if is_revoked else f"Activa desde {(assigned or '')[:10]}"
+            text = f"{uid}  {label}\n{state}" if label else f"{uid}\n{state}"
+            ctk.CTkLabel(row, text=text, justify="left", text_color="gray" if is_revoked else None).pack(side="left", padx=10)
+            ctk.CTkButton(row, text="Eliminar", width=80, fg_color="gray40", hover_color="gray30",
+                          command=lambda u=uid: self.card_action(self.adb.delete_credential(u))).pack(side="right", padx=5, pady=5)
+            if is_revoked:
+                ctk.CTkButton(row, text="Reactivar", width=90, fg_color="green",
+                              command=lambda u=uid, l=label: self.card_action(self.adb.assign_credential(u, self.user_id, l))).pack(side="right", padx=5)
+            else:
+                ctk.CTkButton(row, text="Anular", width=90, fg_color="red", hover_color="darkred",
+                              command=lambda u=uid: self.card_action(self.adb.revoke_credential(u))).pack(side="right", padx=5)
+
+    def card_action(self, future):
+        # Card changes apply to the next scan; the window stays open with the list reloaded
+        def failed(error):
+            logging.error(f"Card update for member {self.user_id} failed: {error}")
+            messagebox.showerror("Error", f"No se pudo guardar: {error}")
+        self.adb.then(future, self, lambda _: self.refresh_cards(), on_error=failed)
+
+    def refresh_cards(self):
+        self.adb.then(self.adb.get_credentials(self.user_id), self, self.show_cards)
+
+    def assign_card(self):
+        uid = self.entry_card_uid.get().strip()
+        if not uid:
+            messagebox.showwarning("Atención", "Ingrese el UID de la tarjeta")
+            return
+        label = self.entry_card_label.get()
+
+        def checked(owner):
+            # A card may not carry another member's ID: scans of it would no longer reach them
+            if owner and owner[0] != self.user_id:
+                messagebox.showerror("Error", f"El UID {uid} es el ID del miembro {owner[1]}")
+                return
+            self.adb.then(self.adb.resolve_credential(uid), self, confirmed)
+
+        def confirmed(current):
+            # current: (member_id, is_revoked) if the card is already known
+            if current and current[0] != self.user_id and not messagebox.askyesno(
+                    "Reasignar Tarjeta", f"La tarjeta {uid} pertenece al miembro {current[0]}.\n¿Reasignarla a {self.member[1]}?"):
+                return
+            self.entry_card_uid.delete(0, 'end')
+            self.entry_card_label.delete(0, 'end')
+            self.card_action(self.adb.assign_credential(uid, self.user_id, label))
+
+        self.adb.then(self.adb.get_member(uid), self, checked)
 
     def delete_user(self):
         if messagebox.askyesno("Confirmar Eliminación", f"¿Estás seguro de que deseas eliminar a {self.member[1]}?\nEsta acción no se puede deshacer."):
-            self.db.delete_member(self.user_id)
-            messagebox.showinfo("Eliminado", "Usuario eliminado correctamente.")
-            self.callback()
-            self.destroy()
+            self.run_action(self.adb.delete_member(self.user_id), "Usuario eliminado correctamente.", title="Eliminado")
 
 class AdminFrame(ctk.CTkFrame):
-    def __init__(self, master, db: DatabaseManager, serial_mgr: SerialManager, reload_callback):
+    BAUD_RATES = ["9600", "19200", "38400", "57600", "115200"]
+    STATS_REFRESH_MS = 1000
+
+    def __init__(self, master, db: DatabaseManager, adb: AsyncDatabase, serial_hub: SerialHub, reload_callback):
         super().__init__(master)
         self.db = db
-        self.serial_mgr = serial_mgr
+        self.adb = adb
+        self.serial_hub = serial_hub
         self.reload_callback = reload_callback
+        # after() ids of the polling loops of the visible tab
+        self.port_stats_job = None
+        self.metrics_job = None
 
         self.label_title = ctk.CTkLabel(self, text="Administración y Configuración", font=("Roboto", 32, "bold"))
         self.label_title.pack(pady=30)
         
-        self.tabview = ctk.CTkTabview(self)
+        self.tabview = ctk.CTkTabview(self, command=self.on_tab_change)
         self.tabview.pack(fill="both", expand=True, padx=20, pady=10)
         self.tabview.add("General")
         self.tabview.add("Conexión Serial")
+        self.tabview.add("Importar / Exportar")
+        self.tabview.add("Estadísticas")
+        self.tabview.add("Operaciones Masivas")
+        self.tabview.add("Planes")
+        self.tabview.add("Rendimiento")
 
         # --- GENERAL ---
         self.gen_frame = self.tabview.tab("General")
         
         ctk.CTkLabel(self.gen_frame, text="Nombre del Gimnasio:", font=("Roboto", 16)).pack(pady=(20, 5))
         self.entry_gym_name = ctk.CTkEntry(self.gen_frame, width=400, height=40, font=("Roboto", 16))
-        
-        curr_name = self.db.get_config("gym_name", "GymBase")
-        self.entry_gym_name.insert(0, curr_name)
         self.entry_gym_name.pack(pady=5)
+
+        ctk.CTkLabel(self.gen_frame, text="Nombre de esta Terminal:", font=("Roboto", 16)).pack(pady=(20, 5))
+        self.entry_terminal = ctk.CTkEntry(self.gen_frame, width=400, height=40, font=("Roboto", 16))
+        self.entry_terminal.pack(pady=5)
+
+        ctk.CTkLabel(self.gen_frame, text="Sincronizar con (host:puerto, opcional):", font=("Roboto", 16)).pack(pady=(20, 5))
+        self.entry_sync_peer = ctk.CTkEntry(self.gen_frame, width=400, height=40, font=("Roboto", 16))
+        self.entry_sync_peer.pack(pady=5)
         
-        ctk.CTkButton(self.gen_frame, text="Guardar General", command=self.save_general, height=45, width=200, font=("Roboto", 16, "bold")).pack(pady=30)
+        self.btn_save_general = ctk.CTkButton(self.gen_frame, text="Guardar General", command=self.save_general, height=45, width=200, font=("Roboto", 16, "bold"), state="disabled")
+        self.btn_save_general.pack(pady=30)
 
         # --- SERIAL ---
         self.serial_frame = self.tabview.tab("Conexión Serial")
 
-        ctk.CTkLabel(self.serial_frame, text="Configuración del Puerto Serial (Teclado)", font=("Roboto", 18, "bold")).pack(pady=20)
+        ctk.CTkLabel(self.serial_frame, text="Lectores Seriales (Teclados / Molinetes)", font=("Roboto", 18, "bold")).pack(pady=(20, 10))
 
-        ctk.CTkLabel(self.serial_frame, text="Puerto:", font=("Roboto", 16)).pack(pady=(10, 5))
-        self.combo_port = ctk.CTkComboBox(self.serial_frame, width=300, height=35, font=("Roboto", 14))
-        self.refresh_ports()
-        self.combo_port.pack(pady=5)
-        
-        ctk.CTkButton(self.serial_frame, text="Refrescar Puertos", command=self.refresh_ports, width=150).pack(pady=5)
+        # One row per reader: port, baud rate, terminal name
+        self.port_rows = []
+        self.available_ports = []
+        self.ports_list = ctk.CTkScrollableFrame(self.serial_frame, height=160)
+        self.ports_list.pack(fill="x", padx=20, pady=5)
 
-        ctk.CTkLabel(self.serial_frame, text="Baud Rate:", font=("Roboto", 16)).pack(pady=(20, 5))
-        self.combo_baud = ctk.CTkComboBox(self.serial_frame, values=["9600", "19200", "38400", "57600", "115200"], width=300, height=35, font=("Roboto", 14))
-        
-        curr_baud = self.db.get_config("serial_baud", "9600")
-        self.combo_baud.set(curr_baud)
-        self.combo_baud.pack(pady=5)
+        serial_buttons = ctk.CTkFrame(self.serial_frame, fg_color="transparent")
+        serial_buttons.pack(pady=5)
+        ctk.CTkButton(serial_buttons, text="Agregar Puerto", command=self.add_port_row, width=150).pack(side="left", padx=5)
+        ctk.CTkButton(serial_buttons, text="Refrescar Puertos", command=self.refresh_ports, width=150).pack(side="left", padx=5)
+
+        self.refresh_ports()
 
-        self.btn_save_serial = ctk.CTkButton(self.serial_frame, text="Guardar y Conectar", command=self.save_serial, height=45, width=220, font=("Roboto", 16, "bold"))
-        self.btn_save_serial.pack(pady=30)
+        self.btn_save_serial = ctk.CTkButton(self.serial_frame, text="Guardar y Conectar", command=self.save_serial, height=45, width=220, font=("Roboto", 16, "bold"), state="disabled")
+        self.btn_save_serial.pack(pady=20)
         
         self.status_conn = ctk.CTkLabel(self.serial_frame, text="Estado: Desconectado", font=("Roboto", 16, "bold"), text_color="red")
-        self.status_conn.pack(pady=10)
+        self.status_conn.pack(pady=5)
+
+        self.label_port_stats = ctk.CTkLabel(self.serial_frame, text="", font=("Courier", 13), justify="left")
+        self.label_port_stats.pack(pady=5)
         
         self.update_status()
 
-    def refresh_ports(self):
-        ports = [p.device for p in serial.tools.list_ports.comports()]
-        if not ports:
-            ports = ["No se detectaron puertos"]
-        self.combo_port.configure(values=ports)
-        
-        # Select current if exists
-        curr_port = self.db.get_config("serial_port", "")
-        if curr_port and curr_port in ports:
-            self.combo_port.set(curr_port)
+        # --- IMPORT / EXPORT ---
+        self.io_frame = self.tabview.tab("Importar / Exportar")
+
+        ctk.CTkLabel(self.io_frame, text="Importación y Exportación de Miembros", font=("Roboto", 18, "bold")).pack(pady=20)
+        ctk.CTkLabel(self.io_frame, text="Formatos: CSV, JSON o JSON Lines (columnas: id, name, age, address, phone,\nregistration_date, membership_end_date, is_frozen, frozen_date)", font=("Roboto", 14)).pack(pady=5)
+
+        self.btn_import = ctk.CTkButton(self.io_frame, text="Importar Archivo", command=self.import_members, height=45, width=220, font=("Roboto", 16, "bold"))
+        self.btn_import.pack(pady=10)
+        self.btn_export = ctk.CTkButton(self.io_frame, text="Exportar Miembros", command=self.export_members, height=45, width=220, font=("Roboto", 16, "bold"))
+        self.btn_export.pack(pady=10)
+
+        self.io_progress = ctk.CTkProgressBar(self.io_frame, width=400)
+        self.io_progress.set(0)
+        self.io_progress.pack(pady=15)
+        self.io_status = ctk.CTkLabel(self.io_frame, text="", font=("Roboto", 14))
+        self.io_status.pack(pady=5)
+
+        # --- STATISTICS ---
+        self.stats_frame = self.tabview.tab("Estadísticas")
+
+        stats_bar = ctk.CTkFrame(self.stats_frame, fg_color="transparent")
+        stats_bar.pack(fill="x", pady=10)
+        ctk.CTkButton(stats_bar, text="Actualizar", command=self.refresh_stats, width=150).pack(side="left", padx=10)
+        ctk.CTkButton(stats_bar, text="Reconstruir Resúmenes", command=self.rebuild_stats, width=200, fg_color="gray40", hover_color="gray30").pack(side="left", padx=10)
+
+        self.stats_summary = ctk.CTkLabel(self.stats_frame, text="", font=("Roboto", 16), justify="left")
+        self.stats_summary.pack(pady=10)
+
+        ctk.CTkLabel(self.stats_frame, text="Horas pico (últimas 4 semanas)", font=("Roboto", 16, "bold")).pack(pady=(10, 5))
+        heatmap_frame = ctk.CTkFrame(self.stats_frame, fg_color="transparent")
+        heatmap_frame.pack(pady=5)
+        for hour in range(24):
+            ctk.CTkLabel(heatmap_frame, text=f"{hour}", width=26, font=("Roboto", 10)).grid(row=0, column=hour + 1)
+        self.heatmap_cells = []
+        for weekday, day_name in enumerate(["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]):
+            ctk.CTkLabel(heatmap_frame, text=day_name, width=40, font=("Roboto", 12)).grid(row=weekday + 1, column=0)
+            row_cells = []
+            for hour in range(24):
+                cell = ctk.CTkLabel(heatmap_frame, text="", width=26, height=22, corner_radius=3, fg_color="gray90")
+                cell.grid(row=weekday + 1, column=hour + 1, padx=1, pady=1)
+                row_cells.append(cell)
+            self.heatmap_cells.append(row_cells)
+
+        # --- BULK OPERATIONS ---
+        self.bulk_frame = self.tabview.tab("Operaciones Masivas")
+
+        ctk.CTkLabel(self.bulk_frame, text="Operaciones sobre Múltiples Miembros", font=("Roboto", 18, "bold")).pack(pady=15)
+
+        ctk.CTkLabel(self.bulk_frame, text="Aplicar a:", font=("Roboto", 16)).pack(pady=(5, 5))
+        self.bulk_target = ctk.CTkSegmentedButton(self.bulk_frame, values=list(self.BULK_TARGETS), font=("Roboto", 14), command=lambda value: self.on_bulk_change())
+        self.bulk_target.set("Activos")
+        self.bulk_target.pack(pady=5)
+        self.bulk_ids = ctk.CTkEntry(self.bulk_frame, placeholder_text="IDs separados por coma o espacio", width=500, height=35, font=("Roboto", 14))
+
+        ctk.CTkLabel(self.bulk_frame, text="Operación:", font=("Roboto", 16)).pack(pady=(15, 5))
+        self.bulk_operation = ctk.CTkComboBox(self.bulk_frame, values=list(self.BULK_OPERATIONS), width=300, height=35, font=("Roboto", 14), command=lambda value: self.on_bulk_change())
+        self.bulk_operation.set("Extender")
+        self.bulk_operation.pack(pady=5)
+
+        self.bulk_params = ctk.CTkFrame(self.bulk_frame, fg_color="transparent")
+        self.bulk_params.pack(pady=5)
+        self.bulk_extension = ctk.CTkComboBox(self.bulk_params, values=[text for text, _ in extension_options()], width=200, height=35, font=("Roboto", 14), command=lambda value: self.on_bulk_change())
+        self.bulk_extension.set("1 Semana")
+        self.bulk_date = date_entry(self.bulk_params, width=15, background='darkblue', foreground='white', borderwidth=2, date_pattern='y-mm-dd', font=("Roboto", 12))
+
+        bulk_buttons = ctk.CTkFrame(self.bulk_frame, fg_color="transparent")
+        bulk_buttons.pack(pady=15)
+        ctk.CTkButton(bulk_buttons, text="Vista Previa", command=self.preview_bulk, width=150, height=40, font=("Roboto", 16)).pack(side="left", padx=10)
+        self.btn_bulk_apply = ctk.CTkButton(bulk_buttons, text="Aplicar", command=self.apply_bulk, width=150, height=40, font=("Roboto", 16, "bold"), fg_color="orange", hover_color="darkorange")
+        self.btn_bulk_apply.pack(side="left", padx=10)
+
+        self.bulk_status = ctk.CTkLabel(self.bulk_frame, text="", font=("Roboto", 16))
+        self.bulk_status.pack(pady=10)
+        self.on_bulk_change()
+
+        # --- PLANS ---
+        self.plans_frame = self.tabview.tab("Planes")
+        self.editing_plan = None
+
+        ctk.CTkLabel(self.plans_frame, text="Planes de Membresía", font=("Roboto", 18, "bold")).pack(pady=15)
+        self.plans_list = ctk.CTkScrollableFrame(self.plans_frame, height=120)
+        self.plans_list.pack(fill="x", padx=20, pady=5)
+
+        plan_form = ctk.CTkFrame(self.plans_frame, fg_color="transparent")
+        plan_form.pack(pady=10)
+        self.plan_entries = {}
+        for row, (key, label, placeholder) in enumerate((
+                ("name", "Nombre:", "ej. Mañanas de semana"),
+                ("months", "Meses:", "0"),
+                ("days", "Días:", "0"),
+                ("hours", "Horario:", "06:00-12:00, 18:00-22:00 (vacío: todo el día)"),
+                ("visits", "Visitas por período:", "vacío: ilimitadas"),
+                ("grace_days", "Días de gracia:", "0"))):
+            ctk.CTkLabel(plan_form, text=label, font=("Roboto", 14)).grid(row=row, column=0, sticky="e", padx=5, pady=3)
+            entry = ctk.CTkEntry(plan_form, placeholder_text=placeholder, width=380, font=("Roboto", 14))
+            entry.grid(row=row, column=1, sticky="w", padx=5, pady=3)
+            self.plan_entries[key] = entry
+        weekdays_frame = ctk.CTkFrame(plan_form, fg_color="transparent")
+        weekdays_frame.grid(row=6, column=1, sticky="w", pady=3)
+        ctk.CTkLabel(plan_form, text="Días permitidos:", font=("Roboto", 14)).grid(row=6, column=0, sticky="e", padx=5)
+        self.plan_weekdays = []
+        for day_name in ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]:
+            check = ctk.CTkCheckBox(weekdays_frame, text=day_name, width=55)
+            check.pack(side="left")
+            self.plan_weekdays.append(check)
+
+        plan_buttons = ctk.CTkFrame(self.plans_frame, fg_color="transparent")
+        plan_buttons.pack(pady=10)
+        ctk.CTkButton(plan_buttons, text="Nuevo Plan", command=lambda: self.edit_plan(None), width=150).pack(side="left", padx=10)
+        self.btn_save_plan = ctk.CTkButton(plan_buttons, text="Guardar Plan", command=self.save_plan, width=150, font=("Roboto", 14, "bold"))
+        self.btn_save_plan.pack(side="left", padx=10)
+        self.btn_delete_plan = ctk.CTkButton(plan_buttons, text="Eliminar Plan", command=self.delete_plan, width=150, fg_color="red", hover_color="darkred")
+        self.btn_delete_plan.pack(side="left", padx=10)
+        self.edit_plan(None)
+
+        # Settings arrive from the database workers; saving is enabled once they are shown
+        self.adb.then(self.adb.submit(self.load_settings), self, self.show_settings)
+
+        # --- PERFORMANCE ---
+        self.perf_frame = self.tabview.tab("Rendimiento")
+
+        ctk.CTkLabel(self.perf_frame, text="Tiempos por Etapa de Acceso (ms)", font=("Roboto", 18, "bold")).pack(pady=15)
+        self.label_perf = ctk.CTkLabel(self.perf_frame, text="", font=("Courier", 13), justify="left")
+        self.label_perf.pack(pady=5)
+
+        perf_buttons = ctk.CTkFrame(self.perf_frame, fg_color="transparent")
+        perf_buttons.pack(pady=15)
+        ctk.CTkButton(perf_buttons, text="Exportar Métricas", command=self.export_metrics, width=180).pack(side="left", padx=10)
+        ctk.CTkButton(perf_buttons, text="Reiniciar", command=self.reset_metrics, width=150, fg_color="gray40", hover_color="gray30").pack(side="left", padx=10)
+
+    BULK_TARGETS = {
+        "Activos": STATUS_ACTIVE,
+        "Vencidos": STATUS_EXPIRED,
+        "Congelados": STATUS_FROZEN,
+        "Todos": None,
+        "Lista de IDs": "ids",
+    }
+    BULK_OPERATIONS = {
+        "Extender": "extend",
+        "Congelar": "freeze",
+        "Descongelar (compensar días)": "unfreeze",
+        "Fijar vencimiento": "set_expiry",
+    }
+
+    def on_bulk_change(self):
+        # Show only the inputs the selected target/operation needs
+        if self.bulk_target.get() == "Lista de IDs":
+            self.bulk_ids.pack(pady=5, after=self.bulk_target)
         else:
-            self.combo_port.set(ports[0])
+            self.bulk_ids.pack_forget()
+        operation = self.BULK_OPERATIONS[self.bulk_operation.get()]
+        self.bulk_extension.pack_forget()
+        self.bulk_date.pack_forget()
+        if operation == "extend":
+            self.bulk_extension.pack()
+        elif operation == "set_expiry":
+            self.bulk_date.pack()
+        self.bulk_status.configure(text="")
+
+    def bulk_request(self):
+        # Read the form on the Tk thread: (operation, argument, ids, status)
+        target = self.BULK_TARGETS[self.bulk_target.get()]
+        ids, status = None, None
+        if target == "ids":
+            ids = [i for i in self.bulk_ids.get().replace(",", " ").split() if i]
+        else:
+            status = target
+
+        operation = self.BULK_OPERATIONS[self.bulk_operation.get()]
+        argument = None
+        if operation == "extend":
+            argument = dict(extension_options())[self.bulk_extension.get()]
+        elif operation == "set_expiry":
+            argument = self.bulk_date.get_date().strftime("%Y-%m-%d")
+        return operation, argument, ids, status
+
+    def run_bulk(self, request, dry_run):
+        operation, argument, ids, status = request
+        if operation == "extend":
+            return self.db.bulk_extend(argument, ids, status, dry_run)
+        if operation == "freeze":
+            return self.db.bulk_freeze(ids, status, dry_run)
+        if operation == "unfreeze":
+            return self.db.bulk_unfreeze(ids, status, dry_run)
+        return self.db.bulk_set_expiry(argument, ids, status, dry_run)
+
+    def preview_bulk(self):
+        self.bulk_status.configure(text="Calculando...", text_color="gray")
+        self.adb.then(self.adb.submit(self.run_bulk, self.bulk_request(), True), self,
+                      lambda count: self.bulk_status.configure(text=f"Vista previa: se modificarán {count} miembros", text_color="gray"))
+
+    def apply_bulk(self):
+        request = self.bulk_request()
+        self.btn_bulk_apply.configure(state="disabled")
+        self.bulk_status.configure(text="Calculando...", text_color="gray")
+        self.adb.then(self.adb.submit(self.run_bulk, request, True), self, lambda count: self.confirm_bulk(request, count),
+                      on_error=self.bulk_failed)
+
+    def confirm_bulk(self, request, count):
+        if not count:
+            self.btn_bulk_apply.configure(state="normal")
+            self.bulk_status.configure(text="Ningún miembro coincide", text_color="gray")
+            return
+        description = f"{self.bulk_operation.get()} ({self.bulk_target.get()})"
+        if not messagebox.askyesno("Confirmar", f"¿Aplicar '{description}' a {count} miembros?"):
+            self.btn_bulk_apply.configure(state="normal")
+            self.bulk_status.configure(text="")
+            return
+
+        def applied(changed):
+            self.btn_bulk_apply.configure(state="normal")
+            self.bulk_status.configure(text=f"Operación aplicada a {changed} miembros", text_color="green")
+
+        self.bulk_status.configure(text="Aplicando...", text_color="gray")
+        self.adb.then(self.adb.submit(self.run_bulk, request, False), self, applied, on_error=self.bulk_failed)
+
+    def bulk_failed(self, error):
+        logging.error(f"Bulk operation failed: {error}")
+        self.btn_bulk_apply.configure(state="normal")
+        self.bulk_status.configure(text=f"Error: {error}", text_color="red")
+
+    def on_tab_change(self):
+        self.stop_polling()
+        if self.tabview.get() == "Estadísticas":
+            self.refresh_stats()
+        elif self.tabview.get() == "Conexión Serial":
+            self.refresh_port_stats()
+        elif self.tabview.get() == "Planes":
+            self.refresh_plans()
+        elif self.tabview.get() == "Rendimiento":
+            self.refresh_metrics()
+
+    def stop_polling(self):
+        # Every tab change restarts the loop of the tab shown; never leave one running behind
+        if self.port_stats_job:
+            self.after_cancel(self.port_stats_job)
+            self.port_stats_job = None
+        if self.metrics_job:
+            self.after_cancel(self.metrics_job)
+            self.metrics_job = None
+
+    def refresh_plans(self):
+        self.adb.then(self.adb.get_plans(), self, self.show_plans)
+
+    def show_plans(self, rows):
+        for child in self.plans_list.winfo_children():
+            child.destroy()
+        for plan in rows:
+            plan_id, name, months, days, rules = plan
+            rules = json.loads(rules)
+            details = [f"{months} meses" if months else "", f"{days} días" if days else ""]
+            if rules.get("hours"):
+                details.append(plans.format_hours(rules["hours"]))
+            if rules.get("weekdays"):
+                details.append(" ".join(["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"][d] for d in rules["weekdays"]))
+            if rules.get("visits"):
+                details.append(f"{rules['visits']} visitas")
+            if rules.get("grace_days"):
+                details.append(f"{rules['grace_days']} días de gracia")
+            ctk.CTkButton(self.plans_list, text=f"{name}  ({', '.join(filter(None, details))})", anchor="w",
+                          fg_color="transparent", text_color=("gray10", "gray90"), hover_color=("gray80", "gray30"),
+                          command=lambda p=plan: self.edit_plan(p)).pack(fill="x")
+
+    def edit_plan(self, plan):
+        # Fills the form with plan (None: an empty form for a new plan)
+        self.editing_plan = plan
+        rules = json.loads(plan[4]) if plan else {}
+        values = {
+            "name": plan[1] if plan else "",
+            "months": str(plan[2]) if plan else "",
+            "days": str(plan[3]) if plan else "",
+            "hours": plans.format_hours(rules.get("hours", [])),
+            "visits": str(rules.get("visits", "")),
+            "grace_days": str(rules.get("grace_days", "")),
+        }
+        for key, entry in self.plan_entries.items():
+            entry.delete(0, "end")
+            if values[key]:
+                entry.insert(0, values[key])
+        weekdays = rules.get("weekdays", range(7))
+        for day, check in enumerate(self.plan_weekdays):
+            if day in weekdays:
+                check.select()
+            else:
+                check.deselect()
+        self.btn_delete_plan.configure(state="normal" if plan else "disabled")
+
+    def save_plan(self):
+        values = {key: entry.get().strip() for key, entry in self.plan_entries.items()}
+        if not values["name"]:
+            messagebox.showerror("Error", "El plan necesita un nombre")
+            return
+        try:
+            months, days = int(values["months"] or 0), int(values["days"] or 0)
+            rules = plans.validate_rules({
+                "hours": plans.parse_hours(values["hours"]),
+                "weekdays": [day for day, check in enumerate(self.plan_weekdays) if check.get()],
+                "visits": int(values["visits"]) if values["visits"] else None,
+                "grace_days": int(values["grace_days"] or 0),
+            })
+        except ValueError as e:
+            messagebox.showerror("Error", f"Regla inválida: {e}")
+            return
+        plan_id = self.editing_plan[0] if self.editing_plan else None
+
+        def saved(_):
+            self.btn_save_plan.configure(state="normal")
+            messagebox.showinfo("Guardado", f"Plan {values['name']} guardado")
+            self.edit_plan(None)
+            self.refresh_plans()
+
+        def failed(error):
+            self.btn_save_plan.configure(state="normal")
+            if isinstance(error, sqlite3.IntegrityError):
+                messagebox.showerror("Error", f"Ya existe un plan llamado {values['name']}")
+            else:
+                logging.error(f"Saving plan {values['name']} failed: {error}")
+                messagebox.showerror("Error", f"No se pudo guardar: {error}")
+
+        self.btn_save_plan.configure(state="disabled")
+        self.adb.then(self.adb.save_plan(values["name"], months, days, rules, plan_id), self, saved, on_error=failed)
+
+    def delete_plan(self):
+        if not self.editing_plan:
+            return
+        plan_id, name = self.editing_plan[:2]
+        if not messagebox.askyesno("Confirmar", f"¿Eliminar el plan {name}?\nSus miembros conservan la fecha de vencimiento, sin las restricciones del plan."):
+            return
+        self.adb.then(self.adb.delete_plan(plan_id), self, lambda _: (self.edit_plan(None), self.refresh_plans()))
+
+    def refresh_stats(self):
+        def load():
+            # Reports only read the rollup tables
+            visits = self.db.report("daily_visits", days=7)
+            heatmap = self.db.report("peak_hours", days=28)
+            visited, current = self.db.report("active_member_ratio")
+            lost, previous = self.db.report("churn")
+            return visits, heatmap, visited, current, lost, previous
+
+        self.stats_summary.configure(text="Cargando...")
+        self.adb.then(self.adb.submit(load), self, lambda stats: self.show_stats(*stats))
+
+    def show_stats(self, visits, heatmap, visited, current, lost, previous):
+        today = date.today().isoformat()
+        today_visits = next((v[1] for v in visits if v[0] == today), 0)
+        week_visits = sum(v[1] for v in visits)
+        active_pct = 100 * visited / current if current else 0
+        churn_pct = 100 * lost / previous if previous else 0
+        self.stats_summary.configure(text=(
+            f"Visitas hoy: {today_visits}    Últimos 7 días: {week_visits}\n"
+            f"Miembros activos que asistieron (30 días): {visited} de {current} ({active_pct:.0f}%)\n"
+            f"Abandono (no volvieron en 30 días): {lost} de {previous} ({churn_pct:.0f}%)"))
+
+        peak = max(max(row) for row in heatmap) or 1
+        for weekday, row in enumerate(heatmap):
+            for hour, count in enumerate(row):
+                # White -> blue by share of the busiest hour
+                level = int(255 - 180 * count / peak)
+                self.heatmap_cells[weekday][hour].configure(fg_color=f"#{level:02x}{level:02x}ff" if count else "gray90")
+
+    def rebuild_stats(self):
+        def failed(error):
+            logging.error(f"Rollup rebuild failed: {error}")
+            self.refresh_stats()
+
+        self.stats_summary.configure(text="Reconstruyendo resúmenes...")
+        self.adb.then(self.adb.rebuild_rollups(), self, lambda _: self.refresh_stats(), on_error=failed)
+
+    def set_io_busy(self, busy):
+        state = "disabled" if busy else "normal"
+        self.btn_import.configure(state=state)
+        self.btn_export.configure(state=state)
+
+    def import_members(self):
+        path = filedialog.askopenfilename(title="Importar Miembros", filetypes=[("CSV / JSON", "*.csv *.json *.jsonl"), ("Todos", "*.*")])
+        if not path:
+            return
+
+        def on_progress(done, total):
+            self.after(0, lambda: [self.io_progress.set(done / total if total else 0),
+                                   self.io_status.configure(text=f"Procesadas {done} de {total} filas...")])
+
+        def worker():
+            # A thread of its own, not the AsyncDatabase pool: a large file would hold a worker for minutes
+            try:
+                report = member_io.import_members(self.db, path, progress=on_progress)
+            except Exception as e:
+                logging.error(f"Import failed for {path}: {e}")
+                message = f"Error al importar: {e}"
+                self.after(0, lambda: self.finish_io(message, error=True))
+                return
+            finally:
+                self.db.close_thread_connection()
+            summary = f"Importados {report.imported} de {report.total} miembros."
+            if report.errors:
+                errors_path = path + ".errores.csv"
+                report.write_errors(errors_path)
+                summary += f"\n{len(report.errors)} filas con errores (ver {errors_path})"
+            self.after(0, lambda: self.finish_io(summary))
+
+        self.set_io_busy(True)
+        self.io_progress.set(0)
+        self.io_status.configure(text="Importando...")
+        threading.Thread(target=worker, daemon=True).start()
+
+    def export_members(self):
+        path = filedialog.asksaveasfilename(title="Exportar Miembros", defaultextension=".csv", filetypes=[("CSV", "*.csv"), ("JSON", "*.json"), ("JSON Lines", "*.jsonl")])
+        if not path:
+            return
+
+        def on_progress(done):
+            self.after(0, lambda: self.io_status.configure(text=f"Exportadas {done} filas..."))
+
+        def worker():
+            try:
+                count = member_io.export_members(self.db, path, progress=on_progress)
+            except Exception as e:
+                logging.error(f"Export failed for {path}: {e}")
+                message = f"Error al exportar: {e}"
+                self.after(0, lambda: self.finish_io(message, error=True))
+                return
+            finally:
+                self.db.close_thread_connection()
+            self.after(0, lambda: self.finish_io(f"Exportados {count} miembros a {path}"))
+
+        self.set_io_busy(True)
+        self.io_status.configure(text="Exportando...")
+        threading.Thread(target=worker, daemon=True).start()
+
+    def finish_io(self, message, error=False):
+        self.set_io_busy(False)
+        self.io_progress.set(0 if error else 1)
+        self.io_status.configure(text=message)
+        if error:
+            messagebox.showerror("Error", message)
+        else:
+            messagebox.showinfo("Completado", message)
+
+    def refresh_ports(self):
+        # Enumerating ports can take seconds on some systems; keep it off the Tk thread
+        def worker():
+            import serial.tools.list_ports
+            ports = [p.device for p in serial.tools.list_ports.comports()]
+            self.after(0, lambda: self.show_ports(ports))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def show_ports(self, ports):
+        self.available_ports = ports
+        for row in self.port_rows:
+            row["port"].configure(values=self.available_ports)
+
+    def add_port_row(self, port="", baud=9600, terminal="", pulse_ms=0, ack=False):
+        frame = ctk.CTkFrame(self.ports_list, fg_color="transparent")
+        frame.pack(fill="x", pady=2)
+        combo_port = ctk.CTkComboBox(frame, values=self.available_ports, width=220, font=("Roboto", 14))
+        combo_port.set(port or (self.available_ports[0] if self.available_ports else ""))
+        combo_port.pack(side="left", padx=5)
+        combo_baud = ctk.CTkComboBox(frame, values=self.BAUD_RATES, width=110, font=("Roboto", 14))
+        combo_baud.set(str(baud))
+        combo_baud.pack(side="left", padx=5)
+        entry_terminal = ctk.CTkEntry(frame, placeholder_text="Terminal (ej. Entrada 1)", width=200, font=("Roboto", 14))
+        if terminal:
+            entry_terminal.insert(0, terminal)
+        entry_terminal.pack(side="left", padx=5)
+        entry_pulse = ctk.CTkEntry(frame, placeholder_text="Pulso ms", width=90, font=("Roboto", 14))
+        if pulse_ms:
+            entry_pulse.insert(0, str(pulse_ms))
+        entry_pulse.pack(side="left", padx=5)
+        check_ack = ctk.CTkCheckBox(frame, text="ACK", width=60)
+        if ack:
+            check_ack.select()
+        check_ack.pack(side="left", padx=5)
+        row = {"frame": frame, "port": combo_port, "baud": combo_baud, "terminal": entry_terminal,
+               "pulse": entry_pulse, "ack": check_ack}
+        ctk.CTkButton(frame, text="Quitar", width=70, fg_color="red", hover_color="darkred",
+                      command=lambda: self.remove_port_row(row)).pack(side="left", padx=5)
+        self.port_rows.append(row)
+
+    def remove_port_row(self, row):
+        row["frame"].destroy()
+        self.port_rows.remove(row)
+
+    def load_settings(self):
+        # Database worker
+        return (self.db.get_config("gym_name", "GymBase"),
+                self.db.get_config("terminal_name", socket.gethostname()),
+                self.db.get_config("sync_peer", "") or "",
+                load_port_config(self.db))
+
+    def show_settings(self, settings):
+        gym_name, terminal, sync_peer, port_specs = settings
+        for entry, value in ((self.entry_gym_name, gym_name), (self.entry_terminal, terminal), (self.entry_sync_peer, sync_peer)):
+            entry.delete(0, "end")
+            entry.insert(0, value)
+        for spec in port_specs:
+            self.add_port_row(spec["port"], spec["baud"], spec["terminal"], spec["pulse_ms"], spec["ack"])
+        self.btn_save_general.configure(state="normal")
+        self.btn_save_serial.configure(state="normal")
 
     def save_general(self):
-        name = self.entry_gym_name.get()
-        self.db.set_config("gym_name", name)
-        messagebox.showinfo("Guardado", "Configuración guardada")
-        self.reload_callback() # Refresh titles and such
+        settings = {
+            "gym_name": self.entry_gym_name.get(),
+            "terminal_name": self.entry_terminal.get().strip() or socket.gethostname(),
+            "sync_peer": self.entry_sync_peer.get().strip(),
+        }
+
+        def save():
+            for key, value in settings.items():
+                self.db.set_config(key, value)
+
+        def saved(_):
+            self.btn_save_general.configure(state="normal")
+            messagebox.showinfo("Guardado", "Configuración guardada")
+            self.reload_callback() # Refresh titles and such
+
+        def failed(error):
+            self.btn_save_general.configure(state="normal")
+            logging.error(f"Saving settings failed: {error}")
+            messagebox.showerror("Error", f"No se pudo guardar: {error}")
+
+        self.btn_save_general.configure(state="disabled")
+        self.adb.then(self.adb.submit(save), self, saved, on_error=failed)
 
     def save_serial(self):
-        port = self.combo_port.get()
-        baud = self.combo_baud.get()
-        
-        if port == "No se detectaron puertos":
-            messagebox.showerror("Error", "Seleccione un puerto válido")
+        specs = []
+        for row in self.port_rows:
+            port = row["port"].get().strip()
+            baud = row["baud"].get().strip()
+            pulse = row["pulse"].get().strip() or "0"
+            if not port:
+                continue
+            if not baud.isdigit():
+                messagebox.showerror("Error", f"Baud rate inválido para {port}")
+                return
+            if not pulse.isdigit():
+                messagebox.showerror("Error", f"Pulso inválido para {port}")
+                return
+            specs.append({"port": port, "baud": int(baud), "terminal": row["terminal"].get().strip() or port,
+                          "pulse_ms": int(pulse), "ack": bool(row["ack"].get())})
+
+        ports = [spec["port"] for spec in specs]
+        if len(set(ports)) != len(ports):
+            messagebox.showerror("Error", "Hay puertos repetidos")
             return
 
-        self.db.set_config("serial_port", port)
-        self.db.set_config("serial_baud", baud)
-        
-        # Restart serial
-        self.serial_mgr.stop()
-        self.serial_mgr.port = port
-        self.serial_mgr.baudrate = int(baud)
-        if self.serial_mgr.start():
+        self.btn_save_serial.configure(state="disabled")
+        self.adb.then(self.adb.submit(save_port_config, self.db, specs), self, lambda _: self.connect_serial(specs),
+                      on_error=lambda e: [self.btn_save_serial.configure(state="normal"),
+                                          messagebox.showerror("Error", f"No se pudo guardar: {e}")])
+
+    def connect_serial(self, specs):
+        self.btn_save_serial.configure(state="normal")
+        # Restart serial with the new port list
+        self.serial_hub.configure(specs)
+        if not specs:
+            self.serial_hub.stop()
+        elif self.serial_hub.start():
             messagebox.showinfo("Éxito", "Conexión Serial Iniciada")
         else:
-            messagebox.showerror("Error", "No se pudo conectar al puerto")
+            messagebox.showerror("Error", "No se pudo conectar a ningún puerto")
             
         self.update_status()
 
     def update_status(self):
-        if self.serial_mgr.running:
-            self.status_conn.configure(text=f"Estado: CONECTADO ({self.serial_mgr.port})", text_color="green")
+        if self.serial_hub.running:
+            connected = [p.terminal for p in self.serial_hub.ports.values() if p.conn]
+            self.status_conn.configure(text=f"Estado: CONECTADO ({len(connected)}/{len(self.serial_hub.ports)}: {', '.join(connected)})",
+                                       text_color="green" if connected else "orange")
         else:
             self.status_conn.configure(text="Estado: DESCONECTADO", text_color="red")
+
+    def refresh_port_stats(self):
+        # Polls the hub counters while the serial tab is visible
+        self.port_stats_job = None
+        if self.tabview.get() != "Conexión Serial" or not self.winfo_exists():
+            return
+        lines = [f"{'Terminal':<16}{'Puerto':<16}{'Tramas':>8}{'Tramas/s':>10}{'Desp. prom':>12}{'Desp. máx':>11}"
+                 f"{'Relé prom':>11}{'Relé máx':>10}{'Reint.':>8}{'Sin ACK':>9}"]
+        for s in self.serial_hub.stats():
+            lines.append(f"{s['terminal'][:15]:<16}{s['port'][-15:]:<16}{s['frames']:>8}{s['frames_per_s']:>10.1f}"
+                         f"{s['dispatch_avg_ms']:>10.2f}ms{s['dispatch_max_ms']:>9.2f}ms"
+                         f"{s['relay_avg_ms']:>9.2f}ms{s['relay_max_ms']:>8.2f}ms{s['retries']:>8}{s['ack_failures']:>9}")
+        self.label_port_stats.configure(text="\n".join(lines) if len(lines) > 1 else "")
+        self.update_status()
+        self.port_stats_job = self.after(self.STATS_REFRESH_MS, self.refresh_port_stats)
+
+    STAGE_LABELS = {
+        "serial": "Lectura serial",
+        "queue": "Cola (after)",
+        "lookup": "Consulta",
+        "relay": "Relé molinete",
+        "ui": "Pantalla",
+        "record": "Registro",
+        "total": "Total",
+    }
+
+    def refresh_metrics(self):
+        # Polls the in-memory histograms while the performance tab is visible
+        self.metrics_job = None
+        if self.tabview.get() != "Rendimiento" or not self.winfo_exists():
+            return
+        self.show_metrics()
+        self.metrics_job = self.after(self.STATS_REFRESH_MS, self.refresh_metrics)
+
+    def show_metrics(self):
+        histograms, counters = METRICS.snapshot()
+        lines = [f"{'Etapa':<16}{'Muestras':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'Máx':>10}"]
+        for name, s in histograms.items():
+            lines.append(f"{self.STAGE_LABELS.get(name, name)[:15]:<16}{s['count']:>10}{s['p50_ms']:>10.2f}"
+                         f"{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+        if counters:
+            lines.append("")
+            lines.extend(f"{name:<26}{value:>10}" for name, value in counters.items())
+        lines.append("")
+        lines.append(f"Desde {METRICS.started:%Y-%m-%d %H:%M:%S}; accesos de más de {METRICS.slow_ms} ms se registran en el log")
+        self.label_perf.configure(text="\n".join(lines))
+
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(title="Exportar Métricas", defaultextension=".txt",
+                                            initialfile=f"gymbase-metrics-{datetime.now():%Y%m%d-%H%M}.txt",
+                                            filetypes=[("Texto", "*.txt")])
+        if not path:
+            return
+        try:
+            METRICS.write(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"No se pudo exportar: {e}")
+            return
+        messagebox.showinfo("Completado", f"Métricas exportadas a {path}")
+
+    def reset_metrics(self):
+        METRICS.reset()
+        self.show_metrics()